@@ -6,22 +6,50 @@
 """
 
 import os
+import re
 import sys
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
 
+import profiling
+from batch_pool import run_tasks, print_summary, default_jobs, submit_captured, warm_up
+from cut_lines import row_variance, find_cut, DEFAULT_TOLERANCE_RATIO
+from export_to_pdf import resample_to_dpi
+from output_cache import OutputCache
+from folder_watch import FolderWatcher
 
+
+@profiling.profiled
 def split_image_to_pdf(input_path, output_pdf, num_columns=3, 
-                       orientation='landscape', margin=10, overlap=50, column_gap=5):
+                       orientation='landscape', margin=10, overlap=50, column_gap=5,
+                       max_pages_per_file=0, smart_cut=False, cut_tolerance=None,
+                       target_dpi=None, progress=None):
     """
     将长图分割并转换成多列 A4 PDF - 零信息丢失版本（增强重叠算法）
+    
+    不限制分段数量，任意高度的图片都会完整输出；列段在绘制时才裁剪，内存只占用一页。
+    max_pages_per_file 大于 0 时，超过该页数的输出拆分为 _part1.pdf、_part2.pdf ...
+    smart_cut 为 True 时把切线移到 cut_tolerance 像素（默认列高的 20%）以内的空白行上，
+    切在空白行的两段之间不再重叠
+    target_dpi 不为空时，有效打印 DPI 超过该值的列段先缩小再嵌入
+    progress 不为空时，每画完一个列段调用 progress(已完成列段数, 总列段数)，返回 False 时中止转换
+    
+    返回：成功时为实际生成的 PDF 文件列表，失败或取消时为 False
     """
     try:
         # 打开图片
-        img = Image.open(input_path)
+        with profiling.stage('decode'):
+            img = Image.open(input_path)
+            img.load()
         img_width, img_height = img.size
         print(f"  原图尺寸: {img_width} x {img_height} 像素")
         
@@ -36,9 +64,9 @@ def split_image_to_pdf(input_path, output_pdf, num_columns=3,
         # 每列宽度（点）
         column_width_pts = available_width / num_columns
         
-        # 计算每列应包含的图片高度（像素）
+        # 计算每列应包含的图片高度（像素），至少 1 像素，保证分段一定向前推进
         scale_for_width = column_width_pts / (img_width * 72 / 96)
-        base_column_height_px = int(available_height / scale_for_width / 72 * 96)
+        base_column_height_px = max(1, int(available_height / scale_for_width / 72 * 96))
         
         # 计算实际需要的净列高（减去重叠）
         net_column_height = base_column_height_px - overlap
@@ -51,7 +79,21 @@ def split_image_to_pdf(input_path, output_pdf, num_columns=3,
         
         print(f"  分列参数: 列高{base_column_height_px}px, 重叠{overlap}px")
         
+        # 有效打印 DPI：图片宽度铺满列宽时每英寸的像素数
+        effective_dpi = img_width / (column_width_pts / 72)
+        if target_dpi and effective_dpi > target_dpi:
+            print(f"  有效DPI {effective_dpi:.0f}，嵌入前缩小到 {target_dpi} DPI")
+        
+        # 按内容切分：逐行计算亮度方差，用于寻找空白行
+        variance = None
+        if smart_cut:
+            with profiling.stage('analyze'):
+                variance = row_variance(img)
+            if cut_tolerance is None:
+                cut_tolerance = int(base_column_height_px * DEFAULT_TOLERANCE_RATIO)
+        
         # 重新设计重叠算法：第一列的最后N像素和第二列的开头N像素重合
+        # 这里只计算位置，不裁剪图片
         segments = []
         current_y = 0
         segment_index = 0
@@ -60,12 +102,18 @@ def split_image_to_pdf(input_path, output_pdf, num_columns=3,
             # 计算当前段的结束位置
             segment_end = min(current_y + base_column_height_px, img_height)
             
-            # 裁剪图片段
-            img_segment = img.crop((0, current_y, img_width, segment_end))
+            # 下一段的开始位置：当前段结束位置向前回退重叠像素
+            # 这样确保第一列的最后overlap像素和第二列的开头overlap像素重合
+            next_start = segment_end - overlap
+            
+            # 切线落在空白行上时不需要重叠
+            if variance is not None and segment_end < img_height:
+                cut = find_cut(variance, segment_end, max(current_y + 1, segment_end - cut_tolerance))
+                if cut is not None:
+                    segment_end = next_start = cut
             
             # 添加段信息
             segments.append({
-                'image': img_segment,
                 'start_y': current_y,
                 'end_y': segment_end,
                 'height': segment_end - current_y
@@ -77,53 +125,26 @@ def split_image_to_pdf(input_path, output_pdf, num_columns=3,
             if segment_end >= img_height:
                 break
             
-            # 计算下一段的开始位置：当前段结束位置向前回退重叠像素
-            # 这样确保第一列的最后overlap像素和第二列的开头overlap像素重合
-            next_start = segment_end - overlap
-            
-            # 防止下一段开始位置不合理
-            if next_start <= current_y:
-                # 如果重叠太大导致下一段开始位置不合理，调整
-                next_start = current_y + (base_column_height_px - overlap)
-                if next_start >= img_height:
-                    break
-            
+            # 净列高至少为 1，下一段一定在当前段之后开始，循环必然结束
             current_y = next_start
             segment_index += 1
-            
-            # 防止无限循环
-            if segment_index > 50:  # 降低安全限制
-                print("  警告：分段数量过多，停止分段")
-                break
         
         # 验证重叠性（新的重叠逻辑）
         overlap_check_passed = True
-        overlap_details = []
         
         if len(segments) > 1:
             for i in range(1, len(segments)):
                 prev_end = segments[i-1]['end_y'] 
                 curr_start = segments[i]['start_y']
                 actual_overlap = prev_end - curr_start
-                overlap_details.append(f"段{i}-{i+1}: 重叠{actual_overlap}px")
                 
-                if actual_overlap < overlap:
+                # 切在空白行上的两段之间没有重叠，不会丢失内容
+                if actual_overlap < overlap and not (variance is not None and actual_overlap == 0):
                     print(f"  警告：段{i}与段{i+1}间重叠不足({actual_overlap}px < {overlap}px)")
                     overlap_check_passed = False
         
         # 检查完整覆盖
         coverage_check = segments[-1]['end_y'] >= img_height if segments else False
-        if not coverage_check:
-            print(f"  调整最后一段以完整覆盖图片")
-            if segments:
-                # 重新裁剪最后一段
-                last_start = segments[-1]['start_y']
-                segments[-1] = {
-                    'image': img.crop((0, last_start, img_width, img_height)),
-                    'start_y': last_start,
-                    'end_y': img_height,
-                    'height': img_height - last_start
-                }
         
         # 计算页数
         total_pages = (len(segments) + num_columns - 1) // num_columns
@@ -132,55 +153,82 @@ def split_image_to_pdf(input_path, output_pdf, num_columns=3,
         overlap_status = "✓" if overlap_check_passed else "⚠"
         print(f"  分成: {len(segments)}段, {total_pages}页, 覆盖:{coverage_range} {overlap_status}")
         
-        # 创建PDF
-        c = canvas.Canvas(str(output_pdf), pagesize=page_size)
+        # 按页数拆分输出文件
+        output_pdf = Path(output_pdf)
+        if max_pages_per_file and total_pages > max_pages_per_file:
+            pages_per_file = max_pages_per_file
+            num_parts = (total_pages + pages_per_file - 1) // pages_per_file
+            output_files = [output_pdf.with_name(f"{output_pdf.stem}_part{part}{output_pdf.suffix}")
+                            for part in range(1, num_parts + 1)]
+        else:
+            pages_per_file = total_pages
+            output_files = [output_pdf]
         
-        # 按页面排列列段
-        for page_start in range(0, len(segments), num_columns):
-            page_segments = segments[page_start:page_start + num_columns]
+        segments_per_file = pages_per_file * num_columns
+        segments_done = 0
+        for part_idx, part_pdf in enumerate(output_files):
+            part_segments = segments[part_idx * segments_per_file:(part_idx + 1) * segments_per_file]
             
-            for col_idx, seg_info in enumerate(page_segments):
-                segment = seg_info['image']
-                
-                # 保存临时图片
-                global_idx = page_start + col_idx
-                temp_path = output_pdf.parent / f"temp_seg_{global_idx}.png"
-                segment.save(temp_path, dpi=(96, 96))
-                
-                # 计算在PDF中的位置
-                x_pos = margin * mm + col_idx * (column_width_pts + column_gap * mm)
-                
-                # 计算显示尺寸（保持宽高比，适应列宽）
-                display_width = column_width_pts
-                display_height = (segment.height / img_width) * display_width
-                
-                # 确保不超过可用高度
-                if display_height > available_height:
-                    display_height = available_height
-                    display_width = (img_width / segment.height) * display_height
-                
-                # Y位置：从页面顶部开始
-                y_pos = page_height - margin * mm - display_height
+            # 每个文件单独创建并保存，已完成的部分不再占用内存
+            c = canvas.Canvas(str(part_pdf), pagesize=page_size)
+            
+            # 按页面排列列段
+            for page_start in range(0, len(part_segments), num_columns):
+                page_segments = part_segments[page_start:page_start + num_columns]
                 
-                # 绘制图片
-                c.drawImage(str(temp_path), x_pos, y_pos, 
-                           width=display_width, height=display_height,
-                           preserveAspectRatio=True)
+                for col_idx, seg_info in enumerate(page_segments):
+                    # 绘制时才裁剪，本页画完即释放
+                    with profiling.stage('crop'):
+                        segment = img.crop((0, seg_info['start_y'], img_width, seg_info['end_y']))
+                    
+                    # 计算在PDF中的位置
+                    x_pos = margin * mm + col_idx * (column_width_pts + column_gap * mm)
+                    
+                    # 计算显示尺寸（保持宽高比，适应列宽）
+                    display_width = column_width_pts
+                    display_height = (segment.height / img_width) * display_width
+                    
+                    # 确保不超过可用高度
+                    if display_height > available_height:
+                        display_height = available_height
+                        display_width = (img_width / segment.height) * display_height
+                    
+                    # Y位置：从页面顶部开始
+                    y_pos = page_height - margin * mm - display_height
+                    
+                    if target_dpi:
+                        with profiling.stage('resample'):
+                            segment = resample_to_dpi(segment, display_width, target_dpi)
+                    
+                    # 绘制图片（直接传入内存中的裁剪结果，不经过临时文件）
+                    with profiling.stage('draw'):
+                        c.drawImage(ImageReader(segment), x_pos, y_pos, 
+                                   width=display_width, height=display_height,
+                                   preserveAspectRatio=True)
+                    
+                    segments_done += 1
+                    if progress is not None and progress(segments_done, len(segments)) is False:
+                        print("  ⏹️  已取消")
+                        return False
                 
-                # 删除临时文件
-                temp_path.unlink(missing_ok=True)
+                # 如果还有更多段，添加新页
+                if page_start + num_columns < len(part_segments):
+                    c.showPage()
+            
+            # 保存PDF
+            with profiling.stage('save', output=part_pdf):
+                c.save()
             
-            # 如果还有更多段，添加新页
-            if page_start + num_columns < len(segments):
-                c.showPage()
+            if len(output_files) > 1:
+                print(f"  已保存分卷 {part_idx + 1}/{len(output_files)}: {part_pdf.name}")
         
-        # 保存PDF
-        c.save()
+        # 上次运行留下的多余分卷（这次分卷更少或没有拆分）不再属于本次输出
+        remove_stale_parts(output_pdf, len(output_files) if len(output_files) > 1 else 0)
         
         # 最终状态
         final_status = "零信息丢失" if (overlap_check_passed and coverage_check) else "增强覆盖"
-        print(f"  ✅ 成功生成: {output_pdf.name} ({final_status})")
-        return True
+        print(f"  ✅ 成功生成: {output_files[0].name if len(output_files) == 1 else f'{len(output_files)} 个分卷'} ({final_status})")
+        return output_files
         
     except Exception as e:
         print(f"  ❌ 错误: {str(e)}")
@@ -189,7 +237,103 @@ def split_image_to_pdf(input_path, output_pdf, num_columns=3,
         return False
 
 
+def remove_stale_parts(output_pdf, num_parts):
+    """删除编号大于 num_parts 的 _partN 分卷（num_parts 为 0 时删除全部分卷）"""
+    output_pdf = Path(output_pdf)
+    pattern = re.compile(re.escape(output_pdf.stem) + r'_part(\d+)' + re.escape(output_pdf.suffix))
+    # 文件名可能含有 [ * ? 等通配符，需要转义
+    parts = output_pdf.parent.glob(f"{glob.escape(output_pdf.stem)}_part*{glob.escape(output_pdf.suffix)}")
+    for part_pdf in sorted(parts):
+        match = pattern.fullmatch(part_pdf.name)
+        if match and int(match.group(1)) > num_parts:
+            part_pdf.unlink()
+            print(f"  🗑️  已删除上次多余的分卷: {part_pdf.name}")
+
+
+def watch_folder(watcher, output_dir, params, jobs):
+    """
+    持续监视文件夹，新增或修改的图片写入完成后立即转换
+    
+    watcher 应在扫描现有图片之前创建，处理现有图片期间新增的文件也会被发现。
+    进程池在开始监视前启动并预先导入本模块，之后每个文件不再付出启动和导入的开销。
+    按 Ctrl+C 停止。
+    """
+    cache = OutputCache(output_dir)
+    folder = watcher.folder
+    running = {}  # Future -> (原图, 输出PDF, 提交时间)
+    modified = set()  # 转换期间又被修改的文件，完成后重新处理
+    
+    print(f"👀 正在监视: {folder}（{'inotify' if watcher.backend.name == 'inotify' else '定时扫描'}，"
+          f"{jobs} 个进程），按 Ctrl+C 停止")
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        warm_up(executor, jobs, 'batch_convert')
+        try:
+            while True:
+                for img_file in watcher.wait(0.5):
+                    if any(img_file == item[0] for item in running.values()):
+                        modified.add(img_file)
+                        continue
+                    output_pdf = output_dir / f"{img_file.stem}_打印.pdf"
+                    if cache.is_fresh(img_file, output_pdf, params):
+                        continue
+                    print(f"📥 检测到: {img_file.name}")
+                    future = submit_captured(executor, split_image_to_pdf, (img_file, output_pdf), params)
+                    running[future] = (img_file, output_pdf, time.monotonic())
+                
+                for future in [f for f in running if f.done()]:
+                    img_file, output_pdf, started = running.pop(future)
+                    try:
+                        files, output, _ = future.result()
+                    except Exception as e:
+                        files, output = False, f"  ❌ 错误: {str(e)}\n"
+                    print(output, end='')
+                    if files:
+                        cache.record(img_file, output_pdf, params, files)
+                        print(f"✅ {img_file.name} 完成，用时 {time.monotonic() - started:.1f} 秒")
+                    else:
+                        cache.forget(output_pdf)
+                        print(f"❌ {img_file.name} 转换失败")
+                    cache.save()
+                    
+                    if img_file in modified:
+                        modified.discard(img_file)
+                        watcher.add(img_file)
+        except KeyboardInterrupt:
+            print("\n已停止监视")
+        finally:
+            watcher.close()
+
+
 def main():
+    parser = argparse.ArgumentParser(description='批量处理当前目录的所有图片，转换成PDF')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并行进程数（默认: CPU 核数）')
+    parser.add_argument('--max-pages-per-file', type=int, default=0,
+                        help='每个 PDF 最多页数，超过时拆分为 _part1.pdf、_part2.pdf ...（默认: 不拆分）')
+    parser.add_argument('--smart-cut', action='store_true',
+                        help='按内容切分：把切线移到附近的空白行，避免切断文字（需要 numpy）')
+    parser.add_argument('--target-dpi', type=int, default=None,
+                        help='目标打印DPI，超过时先缩小再嵌入，减小PDF体积（建议 300，默认: 不缩小）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略缓存，全部重新生成（默认跳过原图和参数都没变的文件）')
+    parser.add_argument('--watch', action='store_true',
+                        help='处理完现有图片后持续监视当前目录，新图片写入完成后自动转换（Ctrl+C 停止）')
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help='监视模式下文件多少秒内不再变化才开始转换（默认: 1）')
+    parser.add_argument('-c', '--columns', type=int, default=None,
+                        help='每页列数，指定后不再询问（监视模式默认: 3）')
+    parser.add_argument('--overlap', type=int, default=None,
+                        help='列重叠像素，指定后不再询问（监视模式默认: 50）')
+    parser.add_argument('--column-gap', type=float, default=None,
+                        help='列间隔(mm)，指定后不再询问（监视模式默认: 5）')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只读取图片文件头，预估每个文件的页数和 PDF 大小，不实际转换（不询问参数，未指定的用默认值）')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start(args, 'batch_convert')
+    jobs = args.jobs or default_jobs()
+    
     print("=" * 70)
     print("长图转PDF打印工具 - 批量处理模式")
     print("=" * 70)
@@ -206,12 +350,18 @@ def main():
     print(f"当前目录: {current_dir}")
     print()
     
-    # 查找所有图片文件
     image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+    
+    # 监视模式下先开始监视再扫描，处理现有图片期间放入的新图片不会漏掉
+    watcher = None
+    if args.watch and not args.dry_run:
+        watcher = FolderWatcher(current_dir, image_extensions, args.settle)
+    
+    # 查找所有图片文件
     image_files = [f for f in current_dir.iterdir() 
                    if f.is_file() and f.suffix.lower() in image_extensions]
     
-    if not image_files:
+    if not image_files and not args.watch:
         print("❌ 未找到任何图片文件！")
         print()
         print("支持的格式: JPG, PNG, BMP, GIF, WebP")
@@ -223,19 +373,29 @@ def main():
         print(f"  - {img.name}")
     print()
     
-    # 询问参数
-    print("请设置参数（直接按回车使用默认值）:")
-    print()
+    # 询问参数（命令行已指定的、以及监视模式下不再询问）
+    num_columns, overlap, column_gap = args.columns, args.overlap, args.column_gap
+    if args.watch or args.dry_run:
+        num_columns = 3 if num_columns is None else num_columns
+        overlap = 50 if overlap is None else overlap
+        column_gap = 5 if column_gap is None else column_gap
+    
+    if None in (num_columns, overlap, column_gap):
+        print("请设置参数（直接按回车使用默认值）:")
+        print()
     
     try:
-        columns_input = input("每页列数 (默认: 3): ").strip()
-        num_columns = int(columns_input) if columns_input else 3
+        if num_columns is None:
+            columns_input = input("每页列数 (默认: 3): ").strip()
+            num_columns = int(columns_input) if columns_input else 3
         
-        overlap_input = input("列重叠像素 (默认: 50): ").strip()
-        overlap = int(overlap_input) if overlap_input else 50
+        if overlap is None:
+            overlap_input = input("列重叠像素 (默认: 50): ").strip()
+            overlap = int(overlap_input) if overlap_input else 50
         
-        gap_input = input("列间隔(mm) (默认: 5): ").strip()
-        column_gap = float(gap_input) if gap_input else 5
+        if column_gap is None:
+            gap_input = input("列间隔(mm) (默认: 5): ").strip()
+            column_gap = float(gap_input) if gap_input else 5
         
     except ValueError:
         print("⚠️  输入无效，使用默认值")
@@ -243,6 +403,24 @@ def main():
         overlap = 50
         column_gap = 5
     
+    if args.dry_run:
+        from dry_run import plan_files, print_plan
+        
+        plans, elapsed = plan_files(
+            image_files,
+            num_columns=num_columns,
+            orientation='landscape',
+            margin=10,
+            overlap=overlap,
+            column_gap=column_gap,
+            target_dpi=args.target_dpi,
+            max_pages_per_file=args.max_pages_per_file
+        )
+        print_plan(plans, elapsed)
+        if args.smart_cut:
+            print("⚠️  按内容切分需要解码像素，预估按未切分计算")
+        return
+    
     print()
     print("=" * 70)
     print("开始处理...")
@@ -253,32 +431,61 @@ def main():
     output_dir = current_dir / "PDF输出"
     output_dir.mkdir(exist_ok=True)
     
-    # 批量处理
-    success_count = 0
-    for idx, img_file in enumerate(image_files, 1):
-        print(f"[{idx}/{len(image_files)}] 处理: {img_file.name}")
-        
+    # 转换参数，同时作为缓存清单中的参数记录
+    params = {
+        'num_columns': num_columns,
+        'orientation': 'landscape',
+        'margin': 10,
+        'overlap': overlap,
+        'column_gap': column_gap,
+        'max_pages_per_file': args.max_pages_per_file,
+        'smart_cut': args.smart_cut,
+        'target_dpi': args.target_dpi
+    }
+    cache = OutputCache(output_dir)
+    
+    # 批量处理（多进程并行，输出按文件顺序打印），原图和参数都没变的跳过
+    tasks = []
+    pending = []  # [(原图, 输出PDF), ...]
+    for img_file in image_files:
         output_pdf = output_dir / f"{img_file.stem}_打印.pdf"
-        
-        if split_image_to_pdf(
-            img_file,
-            output_pdf,
-            num_columns=num_columns,
-            orientation='landscape',
-            margin=10,
-            overlap=overlap,
-            column_gap=column_gap
-        ):
-            success_count += 1
-        
+        if not args.force and cache.is_fresh(img_file, output_pdf, params):
+            continue
+        pending.append((img_file, output_pdf))
+        tasks.append(((img_file, output_pdf), params))
+    
+    skipped = len(image_files) - len(pending)
+    if skipped:
+        print(f"⏭️  跳过 {skipped} 个已转换且未变化的文件（使用 --force 全部重新生成）")
         print()
     
+    results = run_tasks(
+        split_image_to_pdf,
+        tasks,
+        jobs,
+        before_each=lambda i: print(f"[{i + 1}/{len(pending)}] 处理: {pending[i][0].name}"),
+        after_each=lambda i, ok: print()
+    )
+    success_count = sum(1 for ok in results if ok)
+    
+    for (img_file, output_pdf), files in zip(pending, results):
+        if files:
+            cache.record(img_file, output_pdf, params, files)
+        else:
+            cache.forget(output_pdf)
+    cache.save()
+    
     print("=" * 70)
-    print(f"✅ 处理完成！成功: {success_count}/{len(image_files)}")
+    print(f"✅ 处理完成！成功: {success_count}/{len(pending)}，跳过: {skipped}")
+    print_summary([img_file.name for img_file, _ in pending], results)
     print(f"📁 输出目录: {output_dir.absolute()}")
     print("=" * 70)
     print()
     
+    if watcher is not None:
+        watch_folder(watcher, output_dir, params, jobs)
+        return
+    
     # 询问是否打开输出目录
     open_folder = input("是否打开输出目录? (Y/n): ").strip().lower()
     if open_folder != 'n':
@@ -296,6 +503,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包成 exe 后，子进程需要这一步才能正常启动
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception as e:
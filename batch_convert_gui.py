@@ -5,23 +5,98 @@
 带有专业界面，支持文件选择和参数配置
 """
 
+import io
 import os
 import sys
+import time
+import base64
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 from pathlib import Path
+import queue
 import threading
-from PIL import Image
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from conversion_engine import ConversionEngine, ProgressTracker
+from dry_run import plan_files, summarize, format_size
+from thumbnail_cache import ThumbnailCache, THUMB_WIDTH, THUMB_HEIGHT
+from layout_preview import load_source, preview_layout, PREVIEW_PAGES
+
+
+# 设置预览中逐个列出的文件数
+PREVIEW_FILES = 10
+# 转换期间刷新进度的间隔（毫秒）
+POLL_INTERVAL_MS = 100
+# 超过这么多秒没有新进度时在进度窗口中提示
+STALL_WARNING_S = 30
+# 扫描文件夹时每批送回界面的文件数，以及界面取结果的间隔（毫秒）
+SCAN_BATCH_SIZE = 500
+SCAN_POLL_MS = 50
+# 转换前读取文件信息时每批送回界面的文件数
+PLAN_BATCH_SIZE = 50
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp'}
+FILE_INFO_TEXT = "支持格式: PNG, JPG, JPEG, BMP, GIF, WebP"
+
+# 缩略图：后台生成线程数、内存中保留的数量、滚动后预取可见行的延迟（毫秒）
+THUMB_WORKERS = min(4, os.cpu_count() or 1)
+THUMB_MEMORY_ITEMS = 500
+THUMB_PREFETCH_DELAY_MS = 150
+# 修改设置后等待这么久（毫秒）没有新的修改再重画布局预览
+LAYOUT_PREVIEW_DELAY_MS = 60
+
+
+def scan_images(folder, extensions=IMAGE_EXTENSIONS, recursive=False, batch_size=SCAN_BATCH_SIZE):
+    """
+    用 os.scandir 查找文件夹中的图片，按批返回路径列表
+    
+    每个文件夹内按文件名排序；recursive 为 True 时包含子文件夹（不跟随符号链接）
+    """
+    pending = [folder]
+    batch = []
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    if os.path.splitext(entry.name)[1].lower() in extensions:
+                        batch.append(entry.path)
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+            except OSError:
+                pass
+        # 倒序入栈，子文件夹按名称顺序处理
+        pending.extend(reversed(subdirs))
+    
+    if batch:
+        yield batch
+
+
+def format_duration(seconds):
+    """把秒数格式化成 分:秒 或 时:分:秒"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
 
 
 class LongImageToPDFGUI:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("长图转PDF工具 v2.0")
-        self.root.geometry("800x600")
+        self.root.geometry("800x680")
         self.root.minsize(700, 500)
         
         # 设置图标和样式
@@ -32,6 +107,25 @@ class LongImageToPDFGUI:
             
         # 变量
         self.selected_files = []
+        self.selected_set = set()  # 与 selected_files 相同，用于快速去重
+        self.recursive = tk.BooleanVar(value=False)
+        self.scan_queue = None  # 正在扫描文件夹时不为空
+        
+        # 缩略图：磁盘缓存 + 内存中最近用过的 PNG 数据，后台线程池生成
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumb_executor = ThreadPoolExecutor(max_workers=THUMB_WORKERS)
+        self.thumb_results = queue.Queue()
+        self.thumb_data = OrderedDict()  # 路径 -> PNG 数据
+        self.thumb_pending = set()
+        self.thumb_prefetch_job = None
+        self.preview_path = None
+        self.preview_photo = None
+        
+        # 布局预览：缩小副本只解码一次，(路径, 图片, 原图尺寸)
+        self.layout_source = None
+        self.layout_loading = None
+        self.layout_job = None
+        self.layout_photo = None
         self.output_dir = tk.StringVar(value="")
         self.num_columns = tk.IntVar(value=3)
         self.overlap = tk.IntVar(value=50)
@@ -39,6 +133,12 @@ class LongImageToPDFGUI:
         self.dpi = tk.IntVar(value=300)
         self.orientation = tk.StringVar(value="landscape")
         self.margin = tk.DoubleVar(value=10.0)
+        self.max_pages_per_file = tk.IntVar(value=0)
+        self.smart_cut = tk.BooleanVar(value=False)
+        self.engine = None  # 正在进行的转换
+        self.plan_queue = None  # 转换前正在后台读取文件信息时不为空
+        self.plan_cancel = threading.Event()
+        self.estimate_window = None  # 设置预览窗口
         
         self.setup_ui()
         self.center_window()
@@ -58,6 +158,7 @@ class LongImageToPDFGUI:
         # 创建Notebook（选项卡）
         notebook = ttk.Notebook(main_frame)
         notebook.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        notebook.bind('<<NotebookTabChanged>>', self.schedule_layout_preview)
         main_frame.columnconfigure(0, weight=1)
         main_frame.rowconfigure(1, weight=1)
         
@@ -96,7 +197,7 @@ class LongImageToPDFGUI:
         """设置文件选择选项卡"""
         # 文件选择区域
         file_label = ttk.Label(self.file_frame, text="选择要转换的图片文件:", font=("Microsoft YaHei", 10, "bold"))
-        file_label.grid(row=0, column=0, columnspan=3, sticky=tk.W, pady=(0, 10))
+        file_label.grid(row=0, column=0, columnspan=4, sticky=tk.W, pady=(0, 10))
         
         # 文件选择按钮
         select_btn = ttk.Button(self.file_frame, text="选择文件", command=self.select_files)
@@ -108,9 +209,12 @@ class LongImageToPDFGUI:
         add_folder_btn = ttk.Button(self.file_frame, text="添加文件夹", command=self.add_folder)
         add_folder_btn.grid(row=1, column=2, padx=(5, 0))
         
+        ttk.Checkbutton(self.file_frame, text="包含子文件夹",
+                        variable=self.recursive).grid(row=1, column=3, padx=(10, 0))
+        
         # 文件列表
         list_frame = ttk.LabelFrame(self.file_frame, text="已选择的文件", padding="5")
-        list_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
+        list_frame.grid(row=2, column=0, columnspan=4, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
         self.file_frame.columnconfigure(0, weight=1)
         self.file_frame.rowconfigure(2, weight=1)
         
@@ -122,21 +226,37 @@ class LongImageToPDFGUI:
         
         self.file_listbox = tk.Listbox(list_container, selectmode=tk.EXTENDED)
         scrollbar = ttk.Scrollbar(list_container, orient=tk.VERTICAL, command=self.file_listbox.yview)
-        self.file_listbox.configure(yscrollcommand=scrollbar.set)
+        
+        def on_scroll(first, last):
+            # 列表滚动或内容变化后，预先生成可见行的缩略图
+            scrollbar.set(first, last)
+            self.schedule_thumbnail_prefetch()
+        
+        self.file_listbox.configure(yscrollcommand=on_scroll)
+        self.file_listbox.bind('<<ListboxSelect>>', self.on_file_select)
         
         self.file_listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         list_container.columnconfigure(0, weight=1)
         list_container.rowconfigure(0, weight=1)
         
+        # 缩略图预览（长截图显示顶部一段）
+        preview_frame = ttk.Frame(list_container, width=THUMB_WIDTH + 10, height=THUMB_HEIGHT + 40)
+        preview_frame.grid(row=0, column=2, sticky=(tk.N, tk.S), padx=(10, 0))
+        preview_frame.pack_propagate(False)
+        self.preview_label = ttk.Label(preview_frame, text="选中文件后\n显示缩略图", anchor=tk.CENTER,
+                                       foreground="gray", justify=tk.CENTER)
+        self.preview_label.pack(fill=tk.BOTH, expand=True)
+        self.preview_caption = ttk.Label(preview_frame, text="", foreground="gray", anchor=tk.CENTER)
+        self.preview_caption.pack(fill=tk.X)
+        
         # 删除选中文件按钮
         remove_btn = ttk.Button(list_frame, text="删除选中", command=self.remove_selected)
         remove_btn.grid(row=1, column=0, pady=(5, 0), sticky=tk.W)
         
-        # 文件信息显示
-        info_label = ttk.Label(list_frame, text="支持格式: PNG, JPG, JPEG, BMP, GIF, WebP", 
-                              foreground="gray")
-        info_label.grid(row=2, column=0, pady=(5, 0), sticky=tk.W)
+        # 文件信息显示（扫描文件夹时显示进度）
+        self.file_status_label = ttk.Label(list_frame, text=FILE_INFO_TEXT, foreground="gray")
+        self.file_status_label.grid(row=2, column=0, pady=(5, 0), sticky=tk.W)
         
     def setup_settings_tab(self):
         """设置转换设置选项卡"""
@@ -160,6 +280,9 @@ class LongImageToPDFGUI:
         gap_spin.grid(row=2, column=1, sticky=tk.W, pady=(5, 0))
         ttk.Label(column_frame, text="毫米", foreground="gray").grid(row=2, column=2, sticky=tk.W, padx=(5, 0), pady=(5, 0))
         
+        ttk.Checkbutton(column_frame, text="按内容切分（切线移到空白行，避免切断文字）",
+                        variable=self.smart_cut).grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
         # 页面设置
         page_frame = ttk.LabelFrame(self.settings_frame, text="页面设置", padding="10")
         page_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -178,6 +301,25 @@ class LongImageToPDFGUI:
         margin_spin.grid(row=1, column=1, sticky=tk.W, pady=(5, 0))
         ttk.Label(page_frame, text="毫米", foreground="gray").grid(row=1, column=2, sticky=tk.W, padx=(5, 0), pady=(5, 0))
         
+        ttk.Label(page_frame, text="每个PDF最多页数:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(5, 0))
+        pages_spin = ttk.Spinbox(page_frame, from_=0, to=1000, textvariable=self.max_pages_per_file, width=10)
+        pages_spin.grid(row=2, column=1, sticky=tk.W, pady=(5, 0))
+        ttk.Label(page_frame, text="页（0=不拆分，超过时拆成 _part1、_part2…）", foreground="gray").grid(row=2, column=2, sticky=tk.W, padx=(5, 0), pady=(5, 0))
+        
+        # 布局预览：修改上面的参数后自动重画
+        preview_frame = ttk.LabelFrame(self.settings_frame, text="布局预览", padding="10")
+        preview_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.settings_frame.rowconfigure(2, weight=1)
+        
+        self.layout_label = ttk.Label(preview_frame, text="", anchor=tk.CENTER)
+        self.layout_label.pack(fill=tk.BOTH, expand=True)
+        self.layout_caption = ttk.Label(preview_frame, text="", foreground="gray")
+        self.layout_caption.pack(fill=tk.X, pady=(5, 0))
+        
+        for var in (self.num_columns, self.overlap, self.column_gap, self.orientation, self.margin,
+                    self.smart_cut):
+            var.trace_add('write', self.schedule_layout_preview)
+        
     def setup_output_tab(self):
         """设置输出设置选项卡"""
         # 输出目录
@@ -223,7 +365,7 @@ class LongImageToPDFGUI:
 • 列重叠: 列与列之间重叠的像素数，避免内容被切断
 • 列间隔: 合并时列与列之间的间距
 • 页面方向: 横向适合多列布局，纵向适合少列布局
-• DPI设置: 150适合屏幕查看，300适合打印
+• DPI设置: 高于该DPI的图片会先缩小再写入PDF，150适合屏幕查看，300适合打印
 
 使用技巧:
 • 文字多的截图建议3-4列，重叠50-100像素
@@ -258,42 +400,93 @@ class LongImageToPDFGUI:
             filetypes=filetypes
         )
         
-        for file in files:
-            if file not in self.selected_files:
-                self.selected_files.append(file)
-                self.file_listbox.insert(tk.END, Path(file).name)
-                
-        self.update_file_count()
+        self.add_paths(files)
+        
+    def add_paths(self, paths):
+        """把路径加入文件列表（跳过已有的），一次性插入列表框，返回新增的数量"""
+        new_paths = []
+        for path in paths:
+            path = os.path.normpath(path)
+            if path not in self.selected_set:
+                self.selected_set.add(path)
+                new_paths.append(path)
+        
+        if new_paths:
+            self.selected_files.extend(new_paths)
+            self.file_listbox.insert(tk.END, *[os.path.basename(path) for path in new_paths])
+            self.update_file_count()
+        return len(new_paths)
         
     def add_folder(self):
-        """添加文件夹中的所有图片"""
+        """添加文件夹中的所有图片（在后台线程中扫描，不阻塞界面）"""
+        if self.scan_queue is not None:
+            messagebox.showinfo("提示", "正在扫描文件夹，请稍候")
+            return
+        
         folder = filedialog.askdirectory(title="选择包含图片的文件夹")
         if not folder:
             return
-            
-        folder_path = Path(folder)
-        image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp'}
         
-        image_files = [f for f in folder_path.iterdir() 
-                      if f.is_file() and f.suffix.lower() in image_extensions]
+        self.scan_queue = queue.Queue()
+        self.scan_found = 0
+        self.scan_added = 0
+        thread = threading.Thread(target=self.scan_folder,
+                                  args=(folder, self.recursive.get(), self.scan_queue))
+        thread.daemon = True
+        thread.start()
+        self.root.after(SCAN_POLL_MS, self.poll_scan)
+        
+    def scan_folder(self, folder, recursive, results):
+        """后台线程：扫描文件夹，按批放入队列，结束时放入 None"""
+        try:
+            for batch in scan_images(folder, IMAGE_EXTENSIONS, recursive):
+                results.put(batch)
+        except Exception as e:
+            results.put(e)
+        results.put(None)
+        
+    def poll_scan(self):
+        """取出扫描结果加入列表（界面线程中定时执行）"""
+        finished = False
+        error = None
+        while True:
+            try:
+                item = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                break
+            if isinstance(item, Exception):
+                error = item
+                continue
+            self.scan_found += len(item)
+            self.scan_added += self.add_paths(item)
+        
+        if not finished:
+            self.file_status_label.config(text=f"正在扫描文件夹... 已找到 {self.scan_found} 个图片")
+            self.root.after(SCAN_POLL_MS, self.poll_scan)
+            return
         
-        if not image_files:
+        self.scan_queue = None
+        self.file_status_label.config(text=FILE_INFO_TEXT)
+        if error is not None:
+            messagebox.showerror("错误", f"扫描文件夹时出错: {error}")
+        elif not self.scan_found:
             messagebox.showinfo("提示", "所选文件夹中没有找到图片文件")
-            return
-            
-        for img_file in image_files:
-            file_path = str(img_file)
-            if file_path not in self.selected_files:
-                self.selected_files.append(file_path)
-                self.file_listbox.insert(tk.END, img_file.name)
-                
-        self.update_file_count()
-        messagebox.showinfo("完成", f"添加了 {len(image_files)} 个图片文件")
+        else:
+            skipped = self.scan_found - self.scan_added
+            message = f"添加了 {self.scan_added} 个图片文件"
+            if skipped:
+                message += f"（{skipped} 个已在列表中）"
+            messagebox.showinfo("完成", message)
         
     def clear_files(self):
         """清空文件列表"""
         self.selected_files.clear()
+        self.selected_set.clear()
         self.file_listbox.delete(0, tk.END)
+        self.clear_preview()
         self.update_file_count()
         
     def remove_selected(self):
@@ -301,14 +494,179 @@ class LongImageToPDFGUI:
         selected_indices = self.file_listbox.curselection()
         if not selected_indices:
             return
+        
+        selected = set(selected_indices)
+        for index in selected:
+            self.selected_set.discard(self.selected_files[index])
+        self.selected_files = [path for index, path in enumerate(self.selected_files)
+                               if index not in selected]
+        
+        # 连续的选中项一次删除，从后往前删，避免索引变化
+        runs = []
+        for index in sorted(selected):
+            if runs and index == runs[-1][1] + 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+        for first, last in reversed(runs):
+            self.file_listbox.delete(first, last)
             
-        # 从后往前删除，避免索引变化
-        for index in reversed(selected_indices):
-            self.file_listbox.delete(index)
-            self.selected_files.pop(index)
-            
+        if self.preview_path not in self.selected_set:
+            self.clear_preview()
         self.update_file_count()
         
+    def on_file_select(self, event=None):
+        """显示最近选中的文件的缩略图"""
+        selection = self.file_listbox.curselection()
+        if not selection:
+            return
+        # 多选时显示光标所在的那一项
+        active = self.file_listbox.index(tk.ACTIVE)
+        index = active if active in selection else selection[-1]
+        self.show_preview(self.selected_files[index])
+        
+    def show_preview(self, path):
+        """在预览区显示缩略图，还没有生成时先显示“加载中”"""
+        self.preview_path = path
+        self.preview_caption.config(text=os.path.basename(path))
+        data = self.thumb_data.get(path)
+        if data is None:
+            self.preview_photo = None
+            self.preview_label.config(image='', text="加载中...")
+            self.request_thumbnail(path)
+            return
+        if isinstance(data, Exception):
+            self.preview_photo = None
+            self.preview_label.config(image='', text=f"无法预览\n{data}")
+            return
+        self.thumb_data.move_to_end(path)
+        self.preview_photo = tk.PhotoImage(data=base64.b64encode(data))
+        self.preview_label.config(image=self.preview_photo, text='')
+        
+    def clear_preview(self):
+        """清空预览区"""
+        self.preview_path = None
+        self.preview_photo = None
+        self.preview_label.config(image='', text="选中文件后\n显示缩略图")
+        self.preview_caption.config(text='')
+        
+    def request_thumbnail(self, path):
+        """在后台线程池中读取或生成缩略图"""
+        if path in self.thumb_data or path in self.thumb_pending:
+            return
+        if not self.thumb_pending:
+            self.root.after(SCAN_POLL_MS, self.poll_thumbnails)
+        self.thumb_pending.add(path)
+        self.thumb_executor.submit(self.load_thumbnail, path)
+        
+    def load_thumbnail(self, path):
+        """后台线程：读取缓存或生成缩略图，结果放入队列"""
+        try:
+            result = self.thumbnail_cache.load(path)
+        except Exception as e:
+            result = e
+        self.thumb_results.put((path, result))
+        
+    def poll_thumbnails(self):
+        """取出生成好的缩略图（界面线程中定时执行）"""
+        while True:
+            try:
+                path, result = self.thumb_results.get_nowait()
+            except queue.Empty:
+                break
+            self.thumb_pending.discard(path)
+            self.thumb_data[path] = result
+            if len(self.thumb_data) > THUMB_MEMORY_ITEMS:
+                self.thumb_data.popitem(last=False)
+            if path == self.preview_path:
+                self.show_preview(path)
+        if self.thumb_pending:
+            self.root.after(SCAN_POLL_MS, self.poll_thumbnails)
+            
+    def schedule_thumbnail_prefetch(self):
+        """滚动停下后再预取，避免快速滚动时提交大量任务"""
+        if self.thumb_prefetch_job is not None:
+            self.root.after_cancel(self.thumb_prefetch_job)
+        self.thumb_prefetch_job = self.root.after(THUMB_PREFETCH_DELAY_MS, self.prefetch_visible_thumbnails)
+        
+    def prefetch_visible_thumbnails(self):
+        """为列表中可见的行生成缩略图（写入磁盘缓存，之后选中时立即显示）"""
+        self.thumb_prefetch_job = None
+        if not self.selected_files:
+            return
+        first = self.file_listbox.nearest(0)
+        last = self.file_listbox.nearest(self.file_listbox.winfo_height())
+        for path in self.selected_files[first:last + 1]:
+            self.request_thumbnail(path)
+        
+    def schedule_layout_preview(self, *args):
+        """参数变化后延迟重画布局预览，连续点击 Spinbox 时只画最后一次"""
+        if self.layout_job is not None:
+            self.root.after_cancel(self.layout_job)
+        self.layout_job = self.root.after(LAYOUT_PREVIEW_DELAY_MS, self.update_layout_preview)
+        
+    def update_layout_preview(self):
+        """按当前参数重画布局预览（预览选中的文件，没有选中时预览第一个文件）"""
+        self.layout_job = None
+        path = self.preview_path or (self.selected_files[0] if self.selected_files else None)
+        if path is None:
+            self.show_layout_message("请先在“文件选择”中添加文件")
+            return
+        
+        if self.layout_source is None or self.layout_source[0] != path:
+            # 缩小副本在后台线程中解码，完成后再画
+            if self.layout_loading != path:
+                self.layout_loading = path
+                future = self.thumb_executor.submit(load_source, path)
+                self.root.after(SCAN_POLL_MS, self.poll_layout_source, path, future)
+            self.show_layout_message(f"正在读取 {os.path.basename(path)}...")
+            return
+        
+        _, source, size = self.layout_source
+        try:
+            params = self.conversion_params()
+        except tk.TclError:
+            # 正在输入，Spinbox 里暂时不是数字
+            return
+        try:
+            image, layout = preview_layout(source, size, params['num_columns'], params['orientation'],
+                                           params['margin'], params['overlap'], params['column_gap'])
+        except Exception as e:
+            self.show_layout_message(f"⚠️ {str(e)}")
+            return
+        
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', compress_level=1)
+        self.layout_photo = tk.PhotoImage(data=base64.b64encode(buffer.getvalue()))
+        self.layout_label.config(image=self.layout_photo, text='')
+        
+        shown = min(PREVIEW_PAGES, layout['total_pages'])
+        caption = (f"{os.path.basename(path)}：共 {layout['total_pages']} 页（显示前 {shown} 页），"
+                   f"有效打印 DPI {layout['effective_dpi']:.0f}")
+        if params['smart_cut']:
+            caption += "；按内容切分的切线在转换时确定，预览中未体现"
+        self.layout_caption.config(text=caption)
+        
+    def poll_layout_source(self, path, future):
+        """等待缩小副本解码完成"""
+        if not future.done():
+            self.root.after(SCAN_POLL_MS, self.poll_layout_source, path, future)
+            return
+        if self.layout_loading == path:
+            self.layout_loading = None
+        try:
+            source, size = future.result()
+        except Exception as e:
+            self.show_layout_message(f"❌ 无法读取 {os.path.basename(path)}: {str(e)}")
+            return
+        self.layout_source = (path, source, size)
+        self.update_layout_preview()
+        
+    def show_layout_message(self, message):
+        self.layout_photo = None
+        self.layout_label.config(image='', text=message)
+        self.layout_caption.config(text='')
+        
     def update_file_count(self):
         """更新文件数量显示"""
         count = len(self.selected_files)
@@ -321,10 +679,13 @@ class LongImageToPDFGUI:
             self.output_dir.set(directory)
             
     def preview_settings(self):
-        """预览当前设置"""
+        """预览当前设置（页数和大小的预估在后台线程中进行，完成后填入窗口）"""
         if not self.selected_files:
             messagebox.showwarning("警告", "请先选择要转换的文件")
             return
+        if self.estimate_window is not None and self.estimate_window.winfo_exists():
+            self.estimate_window.lift()
+            return
             
         settings_info = f"""转换设置预览:
 
@@ -338,15 +699,99 @@ class LongImageToPDFGUI:
 • 列间隔: {self.column_gap.get()} 毫米
 • 页面方向: {'横向' if self.orientation.get() == 'landscape' else '纵向'}
 • 页边距: {self.margin.get()} 毫米
+• 每个PDF最多页数: {self.max_pages_per_file.get() or '不拆分'}
+• 按内容切分: {'开启' if self.smart_cut.get() else '关闭'}
 • 打印质量: {self.dpi.get()} DPI"""
         
-        messagebox.showinfo("设置预览", settings_info)
+        window = tk.Toplevel(self.root)
+        window.title("设置预览")
+        window.transient(self.root)
+        window.resizable(False, False)
+        window.settings_info = settings_info
+        window.info_label = ttk.Label(window, text=settings_info + "\n\n预估结果:\n• 正在预估…",
+                                      justify=tk.LEFT)
+        window.info_label.pack(padx=20, pady=(15, 10))
+        ttk.Button(window, text="确定", command=window.destroy).pack(pady=(0, 15))
+        self.estimate_window = window
+        
+        # 只读取文件头预估页数和大小，不解码像素；文件很多时也不阻塞界面
+        plan_params = {
+            'num_columns': self.num_columns.get(),
+            'orientation': self.orientation.get(),
+            'margin': self.margin.get(),
+            'overlap': self.overlap.get(),
+            'column_gap': self.column_gap.get(),
+            'target_dpi': self.dpi.get(),
+            'max_pages_per_file': self.max_pages_per_file.get(),
+        }
+        files = list(self.selected_files)
+        results = queue.Queue()
+        cancel = threading.Event()
+        # 窗口关闭后停止预估
+        window.bind('<Destroy>', lambda event: cancel.set() if event.widget is window else None)
+        thread = threading.Thread(target=self.plan_conversion, args=(files, plan_params, results, cancel))
+        thread.daemon = True
+        thread.start()
+        self.root.after(SCAN_POLL_MS, self.poll_estimate, window, results, [], len(files),
+                        time.perf_counter())
+        
+    def poll_estimate(self, window, results, plans, total, started):
+        """取出预估结果，全部完成后填入设置预览窗口（界面线程中定时执行）"""
+        if not window.winfo_exists():
+            return
+        finished = False
+        while True:
+            try:
+                batch = results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                finished = True
+                break
+            plans.extend(batch)
+        
+        if not finished:
+            window.info_label.config(
+                text=f"{window.settings_info}\n\n预估结果:\n• 正在预估… {len(plans)}/{total}")
+            self.root.after(SCAN_POLL_MS, self.poll_estimate, window, results, plans, total, started)
+            return
+        
+        count, pages, size = summarize(plans)
+        settings_info = window.settings_info + f"""
+
+预估结果（{time.perf_counter() - started:.2f} 秒）:
+• 共 {pages} 页，预计约 {format_size(size)}"""
+        for plan in plans[:PREVIEW_FILES]:
+            if 'error' in plan:
+                settings_info += f"\n• {plan['name']}: 无法读取"
+            else:
+                settings_info += f"\n• {plan['name']}: {plan['pages']} 页，约 {format_size(plan['estimated_bytes'])}"
+        if len(plans) > PREVIEW_FILES:
+            settings_info += f"\n• ……另外 {len(plans) - PREVIEW_FILES} 个文件"
+        if len(plans) > count:
+            settings_info += f"\n⚠️ {len(plans) - count} 个文件无法读取"
+        window.info_label.config(text=settings_info)
+        
+    def conversion_params(self):
+        """当前界面上的转换参数（batch_convert.split_image_to_pdf 的关键字参数）"""
+        return {
+            'num_columns': self.num_columns.get(),
+            'orientation': self.orientation.get(),
+            'margin': self.margin.get(),
+            'overlap': self.overlap.get(),
+            'column_gap': self.column_gap.get(),
+            'max_pages_per_file': self.max_pages_per_file.get(),
+            'smart_cut': self.smart_cut.get(),
+            'target_dpi': self.dpi.get(),
+        }
         
     def start_conversion(self):
         """开始转换"""
         if not self.selected_files:
             messagebox.showwarning("警告", "请先选择要转换的文件")
             return
+        if self.engine is not None or self.plan_queue is not None:
+            return
             
         # 检查输出目录
         output_path = self.output_dir.get()
@@ -357,87 +802,241 @@ class LongImageToPDFGUI:
         # 创建输出目录
         Path(output_path).mkdir(parents=True, exist_ok=True)
         
-        # 在新线程中执行转换
-        self.conversion_thread = threading.Thread(target=self.convert_files)
-        self.conversion_thread.daemon = True
-        self.conversion_thread.start()
+        files = list(self.selected_files)
+        tasks = [(file_path, Path(output_path) / f"{Path(file_path).stem}_打印.pdf")
+                 for file_path in files]
+        params = self.conversion_params()
+        self.file_names = [Path(file_path).name for file_path in files]
+        
+        # 进度窗口在界面线程中创建，先在后台线程中只读文件头得到每个文件的像素数和页数
+        # （用于按像素加权计算进度），文件很多时也不阻塞界面；读完后再启动转换
+        self.progress_window = self.show_progress_window(self.file_names)
+        self.plan_queue = queue.Queue()
+        self.plan_cancel.clear()
+        self.plans = []
+        plan_params = {key: value for key, value in params.items() if key != 'smart_cut'}
+        thread = threading.Thread(target=self.plan_conversion,
+                                  args=(files, plan_params, self.plan_queue, self.plan_cancel))
+        thread.daemon = True
+        thread.start()
+        self.root.after(SCAN_POLL_MS, self.poll_planning, tasks, params)
+        
+    def plan_conversion(self, files, plan_params, results, cancel):
+        """后台线程：逐个读取文件头，按批放入队列，结束时放入 None（开始转换和设置预览共用）"""
+        for start in range(0, len(files), PLAN_BATCH_SIZE):
+            if cancel.is_set():
+                break
+            plans, _ = plan_files(files[start:start + PLAN_BATCH_SIZE], **plan_params)
+            results.put(plans)
+        results.put(None)
+        
+    def poll_planning(self, tasks, params):
+        """取出文件信息填入进度窗口，全部读完后启动转换（界面线程中定时执行）"""
+        window = self.progress_window
+        finished = False
+        while True:
+            try:
+                plans = self.plan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if plans is None:
+                finished = True
+                break
+            for plan in plans:
+                self.update_plan_row(len(self.plans), plan)
+                self.plans.append(plan)
+        
+        if not finished:
+            if window.winfo_exists():
+                window.status_label.config(text=f"正在读取图片信息... {len(self.plans)}/{len(tasks)}")
+            self.root.after(SCAN_POLL_MS, self.poll_planning, tasks, params)
+            return
         
-    def convert_files(self):
-        """转换文件（在后台线程中执行）"""
-        try:
-            total_files = len(self.selected_files)
-            success_count = 0
-            
-            # 显示进度窗口
-            progress_window = self.show_progress_window()
-            
-            for i, file_path in enumerate(self.selected_files, 1):
-                # 更新进度
-                progress_msg = f"正在处理 {i}/{total_files}: {Path(file_path).name}"
-                self.update_progress(progress_window, progress_msg, i / total_files * 100)
-                
-                # 转换文件
-                output_path = Path(self.output_dir.get()) / f"{Path(file_path).stem}_打印.pdf"
-                
-                if self.convert_single_file(file_path, output_path):
-                    success_count += 1
-                    
-            # 关闭进度窗口
-            progress_window.destroy()
-            
-            # 显示完成消息
-            self.root.after(0, lambda: self.show_completion_message(success_count, total_files))
+        self.plan_queue = None
+        if self.plan_cancel.is_set():
+            window.destroy()
+            return
+        
+        # 转换在进程池中进行，进度事件由 poll_conversion 定时取出
+        self.tracker = ProgressTracker(self.plans)
+        window.status_label.config(text="准备开始转换...")
+        self.engine = ConversionEngine(tasks, params)
+        self.root.after(POLL_INTERVAL_MS, self.poll_conversion)
+        
+    def poll_conversion(self):
+        """取出转换事件并刷新进度（界面线程中定时执行）"""
+        engine, tracker = self.engine, self.tracker
+        changed = set()
+        for event in engine.poll():
+            changed.add(tracker.update(event))
+        for index in changed:
+            self.update_file_row(index)
+        
+        if engine.finished:
+            self.finish_conversion()
+            return
+        
+        running = [index for index, status in enumerate(tracker.status) if status == 'running']
+        finished = sum(1 for status in tracker.status if status not in ('waiting', 'running'))
+        if engine.cancelled:
+            message = "正在取消，等待当前列段完成..."
+        elif running:
+            names = ', '.join(self.file_names[index] for index in running[:2])
+            more = f" 等 {len(running)} 个" if len(running) > 2 else ''
+            message = f"已完成 {finished}/{engine.total}，正在处理: {names}{more}"
+        else:
+            message = f"已完成 {finished}/{engine.total}"
+        self.update_progress(self.progress_window, message, tracker.percent())
+        self.root.after(POLL_INTERVAL_MS, self.poll_conversion)
+        
+    def cancel_conversion(self):
+        """取消正在进行的转换"""
+        if self.plan_queue is not None:
+            # 还在读取文件信息，转换尚未开始
+            self.plan_cancel.set()
+            self.progress_window.cancel_btn.config(state=tk.DISABLED)
+        elif self.engine is not None and not self.engine.cancelled:
+            self.engine.cancel()
+            self.progress_window.cancel_btn.config(state=tk.DISABLED)
             
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("错误", f"转换过程中发生错误: {str(e)}"))
+    def finish_conversion(self):
+        """全部文件结束后关闭进度窗口并显示结果"""
+        engine, tracker = self.engine, self.tracker
+        self.engine = None
+        self.progress_window.destroy()
+        success_count = tracker.status.count('done')
+        failed_files = [name for name, status in zip(self.file_names, tracker.status) if status == 'failed']
+        self.show_completion_message(success_count, engine.total, failed_files, engine.cancelled,
+                                     tracker.elapsed())
             
-    def show_progress_window(self):
-        """显示进度窗口"""
+    def show_progress_window(self, names):
+        """显示进度窗口：整体进度、吞吐量、剩余时间和每个文件的用时"""
         progress_window = tk.Toplevel(self.root)
         progress_window.title("转换进度")
-        progress_window.geometry("400x150")
-        progress_window.resizable(False, False)
+        progress_window.geometry("640x460")
+        progress_window.minsize(520, 360)
         progress_window.transient(self.root)
         progress_window.grab_set()
+        # 关闭窗口等同于取消
+        progress_window.protocol("WM_DELETE_WINDOW", self.cancel_conversion)
         
         # 居中显示
-        x = self.root.winfo_x() + (self.root.winfo_width() // 2) - 200
-        y = self.root.winfo_y() + (self.root.winfo_height() // 2) - 75
+        x = self.root.winfo_x() + (self.root.winfo_width() // 2) - 320
+        y = self.root.winfo_y() + (self.root.winfo_height() // 2) - 230
         progress_window.geometry(f"+{x}+{y}")
         
         # 进度标签
-        progress_window.status_label = ttk.Label(progress_window, text="准备开始转换...")
-        progress_window.status_label.pack(pady=20)
+        progress_window.status_label = ttk.Label(progress_window, text="正在读取图片信息...")
+        progress_window.status_label.pack(pady=(15, 5))
         
-        # 进度条
-        progress_window.progress = ttk.Progressbar(progress_window, length=300, mode='determinate')
-        progress_window.progress.pack(pady=10)
+        # 进度条（按像素数加权）
+        progress_window.progress = ttk.Progressbar(progress_window, length=560, mode='determinate')
+        progress_window.progress.pack(pady=5)
         
-        # 百分比标签
+        # 百分比、用时、剩余时间和吞吐量
         progress_window.percent_label = ttk.Label(progress_window, text="0%")
         progress_window.percent_label.pack()
+        progress_window.stats_label = ttk.Label(progress_window, text="", foreground="gray")
+        progress_window.stats_label.pack(pady=(2, 5))
+        
+        # 每个文件的状态和用时
+        table_frame = ttk.Frame(progress_window)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        columns = ('file', 'pixels', 'pages', 'status', 'time', 'stage')
+        table = ttk.Treeview(table_frame, columns=columns, show='headings', height=10)
+        for column, title, width, anchor in (
+            ('file', '文件', 200, tk.W),
+            ('pixels', '像素(MP)', 70, tk.E),
+            ('pages', '页数', 50, tk.E),
+            ('status', '状态', 80, tk.CENTER),
+            ('time', '用时', 60, tk.E),
+            ('stage', '主要耗时', 90, tk.CENTER),
+        ):
+            table.heading(column, text=title)
+            table.column(column, width=width, anchor=anchor, stretch=(column == 'file'))
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 像素数和页数在读取文件信息后由 update_plan_row 填入
+        for index, name in enumerate(names):
+            table.insert('', tk.END, iid=str(index), values=(name, '', '', '等待', '', ''))
+        progress_window.table = table
+        
+        # 取消按钮
+        progress_window.cancel_btn = ttk.Button(progress_window, text="取消", command=self.cancel_conversion)
+        progress_window.cancel_btn.pack(pady=10)
         
         return progress_window
         
+    def update_plan_row(self, index, plan):
+        """在文件表格中填入读取到的像素数和页数"""
+        window = self.progress_window
+        if not (window and window.winfo_exists()):
+            return
+        pixels = f"{plan['width'] * plan['height'] / 1e6:.1f}" if 'error' not in plan else '?'
+        window.table.set(str(index), 'pixels', pixels)
+        window.table.set(str(index), 'pages', plan.get('pages', '?'))
+        
+    def update_file_row(self, index):
+        """刷新文件表格中的一行"""
+        window, tracker = self.progress_window, self.tracker
+        if not (window and window.winfo_exists()):
+            return
+        status = tracker.status[index]
+        if status == 'running':
+            text = f"转换中 {tracker.fraction[index] * 100:.0f}%"
+        else:
+            text = {'waiting': '等待', 'done': '✅ 完成', 'failed': '❌ 失败', 'cancelled': '⏹️ 已取消'}[status]
+        wall_s = tracker.wall_s[index]
+        main_stage = tracker.main_stage(index)
+        table = window.table
+        table.set(str(index), 'status', text)
+        table.set(str(index), 'time', f"{wall_s:.1f}s" if wall_s is not None else '')
+        table.set(str(index), 'stage', f"{main_stage[0]} {main_stage[1] * 100:.0f}%" if main_stage else '')
+        if status == 'running':
+            table.see(str(index))
+        
     def update_progress(self, window, message, percent):
-        """更新进度"""
-        self.root.after(0, lambda: self._update_progress_ui(window, message, percent))
-        
-    def _update_progress_ui(self, window, message, percent):
-        """更新进度UI（在主线程中调用）"""
-        if window and window.winfo_exists():
-            window.status_label.config(text=message)
-            window.progress.config(value=percent)
-            window.percent_label.config(text=f"{percent:.1f}%")
-            window.update()
+        """更新进度（在界面线程中调用）"""
+        if not (window and window.winfo_exists()):
+            return
+        tracker = self.tracker
+        window.status_label.config(text=message)
+        window.progress.config(value=percent)
+        window.percent_label.config(text=f"{percent:.1f}%")
+        
+        eta = tracker.eta()
+        stats = (f"已用时 {format_duration(tracker.elapsed())}"
+                 f"  ·  剩余约 {format_duration(eta) if eta is not None else '--:--'}"
+                 f"  ·  {tracker.megapixels_per_s():.1f} MP/s"
+                 f"  ·  {tracker.pages_per_s():.2f} 页/s")
+        # 长时间没有新进度时提示，区分卡住和处理慢
+        if tracker.idle() >= STALL_WARNING_S:
+            stats += f"\n⚠️ 已 {tracker.idle():.0f} 秒没有新进度"
+        else:
+            share = tracker.stage_share()
+            if share:
+                stats += "\n阶段耗时: " + "  ".join(f"{name} {value * 100:.0f}%" for name, value in share[:4])
+        window.stats_label.config(text=stats)
             
-    def show_completion_message(self, success_count, total_files):
+    def show_completion_message(self, success_count, total_files, failed_files=(), cancelled=False,
+                                elapsed=None):
         """显示完成消息"""
-        if success_count == total_files:
-            message = f"✅ 转换完成！\n成功转换了 {success_count} 个文件"
+        took = f"\n用时 {format_duration(elapsed)}" if elapsed is not None else ''
+        if cancelled:
+            message = f"⏹️ 已取消！\n成功转换了 {success_count}/{total_files} 个文件{took}"
+            messagebox.showinfo("已取消", message)
+        elif success_count == total_files:
+            message = f"✅ 转换完成！\n成功转换了 {success_count} 个文件{took}"
             messagebox.showinfo("转换完成", message)
         else:
-            message = f"⚠️ 转换完成！\n成功: {success_count}/{total_files}"
+            message = f"⚠️ 转换完成！\n成功: {success_count}/{total_files}{took}"
+            if failed_files:
+                message += "\n\n失败的文件:\n" + "\n".join(failed_files[:10])
+                if len(failed_files) > 10:
+                    message += f"\n……共 {len(failed_files)} 个"
             messagebox.showwarning("部分成功", message)
             
         # 询问是否打开输出目录
@@ -447,221 +1046,18 @@ class LongImageToPDFGUI:
             except Exception:
                 pass
                 
-    def convert_single_file(self, input_path, output_path):
-        """转换单个文件"""
-        try:
-            return split_image_to_pdf(
-                input_path=input_path,
-                output_pdf=output_path,
-                num_columns=self.num_columns.get(),
-                orientation=self.orientation.get(),
-                margin=self.margin.get(),
-                overlap=self.overlap.get(),
-                column_gap=self.column_gap.get()
-            )
-        except Exception as e:
-            print(f"转换文件 {input_path} 时出错: {e}")
-            return False
-            
     def run(self):
         """运行应用程序"""
         self.root.mainloop()
-
-
-def split_image_to_pdf(input_path, output_pdf, num_columns=3, 
-                       orientation='landscape', margin=10, overlap=50, column_gap=5):
-    """
-    将长图分割并转换成多列 A4 PDF - 零信息丢失版本（增强重叠算法）
-    """
-    try:
-        # 打开图片
-        img = Image.open(input_path)
-        img_width, img_height = img.size
-        
-        # 计算最优布局
-        page_size = landscape(A4) if orientation == 'landscape' else A4
-        page_width, page_height = page_size
-        
-        # 可用区域（减去边距和列间隔）
-        available_width = page_width - (2 * margin * mm) - ((num_columns - 1) * column_gap * mm)
-        available_height = page_height - (2 * margin * mm)
-        
-        # 每列宽度（点）
-        column_width_pts = available_width / num_columns
-        
-        # 计算每列应包含的图片高度（像素）
-        scale_for_width = column_width_pts / (img_width * 72 / 96)
-        base_column_height_px = int(available_height / scale_for_width / 72 * 96)
-        
-        print(f"基础列高: {base_column_height_px}px, 重叠: {overlap}px")
-        
-        # 计算实际需要的净列高（减去重叠）
-        net_column_height = base_column_height_px - overlap
-        
-        # 如果净高度太小，调整参数
-        if net_column_height <= 0:
-            print(f"警告：重叠像素({overlap})过大，自动调整为列高的1/3")
-            overlap = base_column_height_px // 3
-            net_column_height = base_column_height_px - overlap
-        
-        print(f"调整后 - 列高: {base_column_height_px}px, 重叠: {overlap}px")
-        
-        # 重新设计重叠算法：第一列的最后N像素和第二列的开头N像素重合
-        segments = []
-        current_y = 0
-        segment_index = 0
-        
-        while current_y < img_height:
-            # 计算当前段的结束位置
-            segment_end = min(current_y + base_column_height_px, img_height)
-            
-            print(f"段 {segment_index + 1}: Y {current_y} -> {segment_end} (高度: {segment_end - current_y}px)")
-            
-            # 裁剪图片段并保存
-            img_segment = img.crop((0, current_y, img_width, segment_end))
-            
-            # 添加段信息（同时保存图片对象和坐标）
-            segments.append({
-                'image': img_segment,
-                'start': current_y,
-                'end': segment_end,
-                'height': segment_end - current_y,
-                'index': segment_index
-            })
-            
-            # 如果已经到达图片末尾，结束
-            if segment_end >= img_height:
-                break
-            
-            # 计算下一段的开始位置：当前段结束位置向前回退重叠像素
-            next_start = segment_end - overlap
-            
-            # 防止下一段开始位置不合理
-            if next_start <= current_y:
-                # 如果重叠太大导致下一段开始位置不合理，调整
-                next_start = current_y + (base_column_height_px - overlap)
-                if next_start >= img_height:
-                    break
-            
-            current_y = next_start
-            segment_index += 1
-            
-            # 防止无限循环
-            if segment_index > 100:  # 安全限制
-                print("警告：分段数量过多，可能存在算法问题")
-                break
-        
-        # 验证覆盖完整性和重叠性
-        print(f"\n分段验证:")
-        for i, seg in enumerate(segments):
-            print(f"  段{i+1}: {seg['start']}-{seg['end']}px (高度: {seg['height']}px)")
-            if i > 0:
-                prev_seg = segments[i-1]
-                overlap_amount = prev_seg['end'] - seg['start']
-                if overlap_amount > 0:
-                    print(f"    与前一段重叠: {overlap_amount}px ✓")
-                else:
-                    print(f"    警告: 与前一段无重叠，可能丢失信息！")
-        
-        # 检查是否完全覆盖
-        if segments:
-            first_start = segments[0]['start']
-            last_end = segments[-1]['end']
-            print(f"\n覆盖检查: 原图0-{img_height}px, 实际{first_start}-{last_end}px")
-            
-            if first_start > 0:
-                print(f"警告：图片开头 0-{first_start}px 未覆盖")
-            if last_end < img_height:
-                print(f"警告：图片末尾 {last_end}-{img_height}px 未覆盖，调整最后一段")
-                segments[-1]['end'] = img_height
-                segments[-1]['height'] = img_height - segments[-1]['start']
-        
-        # 计算需要多少页
-        pages_needed = (len(segments) + num_columns - 1) // num_columns
-        
-        # 创建PDF
-        c = canvas.Canvas(str(output_pdf), pagesize=page_size)
-        
-        segment_index = 0
-        for page in range(pages_needed):
-            page_has_content = False
-            
-            # 处理当前页的列
-            for col in range(num_columns):
-                if segment_index >= len(segments):
-                    break
-                    
-                segment = segments[segment_index]
-                
-                # 直接使用已裁剪的图片段
-                img_segment = segment['image']
-                actual_height = img_segment.height
-                
-                # 保存为临时文件
-                temp_path = f"temp_segment_{segment_index}.png"
-                img_segment.save(temp_path, dpi=(96, 96))
-                
-                # 计算在PDF中的位置
-                x_pos = margin * mm + col * (column_width_pts + column_gap * mm)
-                
-                # 计算显示尺寸（保持宽高比，适应列宽）
-                display_width = column_width_pts
-                display_height = (actual_height / img_width) * display_width
-                
-                # 确保不超过可用高度
-                if display_height > available_height:
-                    display_height = available_height
-                    display_width = (img_width / actual_height) * display_height
-                
-                # Y位置：从页面顶部开始
-                y_pos = page_height - margin * mm - display_height
-                
-                # 在PDF中绘制图片
-                c.drawImage(temp_path, x_pos, y_pos, 
-                          width=display_width, height=display_height,
-                          preserveAspectRatio=True)
-                
-                print(f"段 {segment_index + 1}: 放置在第{page+1}页第{col+1}列")
-                
-                # 删除临时文件
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
-                
-                segment_index += 1
-                page_has_content = True
-                
-            # 如果当前页有内容且还有更多段，创建新页
-            if page_has_content and segment_index < len(segments):
-                c.showPage()
-        
-        c.save()
-        
-        # 最终验证
-        print(f"\n✅ 转换完成:")
-        print(f"   原图: {img_width}x{img_height}px")
-        print(f"   分段: {len(segments)}段")
-        print(f"   页数: {pages_needed}页")
-        print(f"   覆盖: 0-{segments[-1]['end']}px")
-        
-        if segments[-1]['end'] == img_height and len(segments) > 1:
-            # 检查相邻段重叠
-            min_overlap = min(segments[i-1]['end'] - segments[i]['start'] for i in range(1, len(segments)))
-            if min_overlap > 0:
-                print(f"   重叠: 最小{min_overlap}px ✓ 零信息丢失确认")
-            else:
-                print(f"   警告: 存在无重叠段，可能有信息丢失")
-        
-        return True
-        
-    except Exception as e:
-        print(f"转换错误: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        # 窗口关闭时停止还在进行的转换，丢弃未开始的缩略图任务
+        self.plan_cancel.set()
+        if self.engine is not None:
+            self.engine.cancel()
+        self.thumb_executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
+    # 打包成 exe 后，子进程需要这一步才能正常启动
+    multiprocessing.freeze_support()
     app = LongImageToPDFGUI()
-    app.run()
\ No newline at end of file
+    app.run()
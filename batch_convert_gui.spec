@@ -23,13 +23,13 @@ a = Analysis(
         'reportlab.lib.pagesizes',
         'reportlab.lib.units',
         'threading',
+        'numpy',  # 按内容切分（cut_lines）需要
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
     excludes=[
         'matplotlib',
-        'numpy',
         'scipy',
     ],
     win_no_prefer_redirects=False,
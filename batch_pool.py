@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量处理的进程池工具
+多个文件并行处理，每个文件的输出单独收集，按原始顺序打印
+"""
+
+import io
+import os
+import importlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+
+import profiling
+
+
+def default_jobs():
+    """默认并行数：CPU 核数"""
+    return os.cpu_count() or 1
+
+
+def _run_captured(func, args, kwargs, profile=None):
+    """在子进程中执行任务，收集其输出，返回 (结果, 输出文本, 性能记录)"""
+    if profile is not None:
+        profiling.enable(**profile)
+    buffer = io.StringIO()
+    with redirect_stdout(buffer), redirect_stderr(buffer):
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            traceback.print_exc()
+            result = False
+    return result, buffer.getvalue(), profiling.take_records()
+
+
+def submit_captured(executor, func, args, kwargs):
+    """
+    向进程池提交一个任务，输出单独收集
+    
+    返回 Future，结果为 (结果, 输出文本, 性能记录)
+    """
+    return executor.submit(_run_captured, func, args, kwargs, profiling.options())
+
+
+def _import_module(module):
+    importlib.import_module(module)
+
+
+def warm_up(executor, jobs, module):
+    """让进程池提前启动全部子进程并导入 module，之后的任务不再付出启动和导入的开销"""
+    futures = [executor.submit(_import_module, module) for _ in range(jobs)]
+    for future in futures:
+        future.result()
+
+
+def run_tasks(func, tasks, jobs=None, before_each=None, after_each=None):
+    """
+    依次或并行执行 func(*args, **kwargs)
+    
+    参数:
+        func: 模块级函数（需要能被子进程导入）
+        tasks: [(args, kwargs), ...]
+        jobs: 并行进程数，None 表示 CPU 核数，1 表示在当前进程中顺序执行
+        before_each: 打印每个任务输出之前调用 before_each(index)，用于打印标题
+        after_each: 打印每个任务输出之后调用 after_each(index, result)
+    
+    返回：与 tasks 顺序一致的结果列表
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    jobs = max(1, min(jobs, len(tasks) or 1))
+    
+    results = [None] * len(tasks)
+    
+    if jobs == 1:
+        # 单进程：直接执行，输出实时显示
+        for index, (args, kwargs) in enumerate(tasks):
+            if before_each:
+                before_each(index)
+            try:
+                results[index] = func(*args, **kwargs)
+            except Exception:
+                traceback.print_exc()
+                results[index] = False
+            if after_each:
+                after_each(index, results[index])
+        return results
+    
+    print(f"使用 {jobs} 个进程并行处理")
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # 主进程启用了性能统计时，子进程也统计，并把记录带回主进程
+        profile = profiling.options()
+        futures = [executor.submit(_run_captured, func, args, kwargs, profile)
+                   for args, kwargs in tasks]
+        
+        # 按提交顺序输出：前面的任务完成后，才打印后面已完成任务的输出
+        for index, future in enumerate(futures):
+            try:
+                result, output, records = future.result()
+            except Exception as e:
+                # 子进程异常退出等情况
+                result, output, records = False, f"❌ 错误: {str(e)}\n", []
+            profiling.add_records(records)
+            results[index] = result
+            if before_each:
+                before_each(index)
+            print(output, end='')
+            if after_each:
+                after_each(index, result)
+    
+    return results
+
+
+def print_summary(names, results):
+    """打印按原始顺序排列的失败文件列表"""
+    failed = [name for name, ok in zip(names, results) if not ok]
+    if failed:
+        print(f"\n❌ 失败 {len(failed)} 个文件:")
+        for name in failed:
+            print(f"  - {name}")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成用于性能测试的合成长截图（聊天记录样式）
+同样的规格总是生成同样的像素：随机数种子由图片名称决定
+"""
+
+import random
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+
+# (名称, 宽, 高, 格式, 模式)，quick 模式只使用高度不超过 QUICK_MAX_HEIGHT 的图片
+CORPUS = [
+    ('chat_750x2000_rgb.jpg', 750, 2000, 'JPEG', 'RGB'),
+    ('chat_1080x2000_rgba.png', 1080, 2000, 'PNG', 'RGBA'),
+    ('chat_535x10000_rgb.jpg', 535, 10000, 'JPEG', 'RGB'),
+    ('chat_1080x10000_rgb.png', 1080, 10000, 'PNG', 'RGB'),
+    ('chat_1080x30000_rgb.jpg', 1080, 30000, 'JPEG', 'RGB'),
+    ('chat_750x30000_rgba.png', 750, 30000, 'PNG', 'RGBA'),
+    ('chat_1080x60000_rgb.jpg', 1080, 60000, 'JPEG', 'RGB'),
+    ('chat_1080x100000_rgb.png', 1080, 100000, 'PNG', 'RGB'),
+]
+
+QUICK_MAX_HEIGHT = 10000
+
+# 微信聊天界面的配色
+BACKGROUND = (237, 237, 237)
+BUBBLE_LEFT = (255, 255, 255)
+BUBBLE_RIGHT = (149, 236, 105)
+TEXT = (25, 25, 25)
+TIMESTAMP = (178, 178, 178)
+
+
+def draw_chat(width, height, seed):
+    """
+    绘制聊天记录样式的长图：时间戳、左右交替的气泡（文字用深色横条表示）、偶尔出现的图片消息
+    """
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(img)
+    
+    unit = width / 1080  # 按 1080 宽的界面比例缩放
+    avatar = int(80 * unit)
+    line_height = int(46 * unit)
+    padding = int(24 * unit)
+    max_bubble = int(width * 0.62)
+    
+    y = int(40 * unit)
+    while y < height:
+        # 时间戳
+        if rng.random() < 0.15:
+            w = int(rng.randint(160, 260) * unit)
+            draw.rounded_rectangle(((width - w) // 2, y, (width + w) // 2, y + int(30 * unit)),
+                                   radius=int(6 * unit), fill=TIMESTAMP)
+            y += int(70 * unit)
+        
+        right = rng.random() < 0.5
+        bubble_color = BUBBLE_RIGHT if right else BUBBLE_LEFT
+        avatar_x = width - padding - avatar if right else padding
+        draw.rectangle((avatar_x, y, avatar_x + avatar, y + avatar),
+                       fill=tuple(rng.randint(60, 220) for _ in range(3)))
+        
+        if rng.random() < 0.08:
+            # 图片消息：渐变色块
+            w = int(rng.randint(300, 500) * unit)
+            h = int(rng.randint(300, 700) * unit)
+            block = Image.linear_gradient('L').resize((w, h)).convert('RGB')
+            block = Image.merge('RGB', [band.point(lambda v, k=k: (v * k) % 256)
+                                        for k, band in zip((1, 2, 3), block.split())])
+            x = avatar_x - padding - w if right else avatar_x + avatar + padding
+            img.paste(block, (x, y))
+            y += h + int(40 * unit)
+            continue
+        
+        # 文字消息：每个字由几笔随机的短横竖组成，压缩难度接近真实文字
+        lines = rng.choice((1, 1, 1, 2, 2, 3, 4, 6))
+        widths = [rng.randint(int(max_bubble * 0.25), max_bubble - 2 * padding) for _ in range(lines)]
+        bubble_w = max(widths) + 2 * padding
+        bubble_h = lines * line_height + 2 * padding
+        x0 = avatar_x - padding - bubble_w if right else avatar_x + avatar + padding
+        draw.rounded_rectangle((x0, y, x0 + bubble_w, y + bubble_h), radius=int(10 * unit),
+                               fill=bubble_color)
+        glyph = max(6, int(30 * unit))
+        stroke = max(1, int(3 * unit))
+        for i, w in enumerate(widths):
+            ty = y + padding + i * line_height + (line_height - glyph) // 2
+            for gx in range(x0 + padding, x0 + padding + w - glyph, glyph + stroke):
+                for _ in range(rng.randint(2, 4)):
+                    sx, sy = rng.randrange(glyph - stroke), rng.randrange(glyph - stroke)
+                    if rng.random() < 0.5:
+                        draw.rectangle((gx + sx, ty + sy, gx + glyph - 1, ty + sy + stroke), fill=TEXT)
+                    else:
+                        draw.rectangle((gx + sx, ty + sy, gx + sx + stroke, ty + glyph - 1), fill=TEXT)
+        y += max(bubble_h, avatar) + int(36 * unit)
+    
+    return img
+
+
+def build_corpus(corpus_dir, quick=False):
+    """
+    生成测试图片（已存在的跳过）
+    
+    返回：[(图片路径, 宽, 高, 格式, 模式), ...]
+    """
+    corpus_dir = Path(corpus_dir)
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    
+    entries = []
+    for name, width, height, fmt, mode in CORPUS:
+        if quick and height > QUICK_MAX_HEIGHT:
+            continue
+        path = corpus_dir / name
+        if not path.exists():
+            print(f"生成测试图片: {name}")
+            img = draw_chat(width, height, seed=name)
+            if mode == 'RGBA':
+                img.putalpha(255)
+            if fmt == 'JPEG':
+                img.save(path, quality=90)
+            else:
+                img.save(path, compress_level=6)
+            del img
+        entries.append((path, width, height, fmt, mode))
+    return entries
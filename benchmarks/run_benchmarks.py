@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+用合成的长截图分别测试 split_image_to_columns、两个 split_image_to_pdf 和 export_to_excel，
+统计吞吐量、耗时分位数、内存峰值和输出大小，每次运行保存一个结果文件，便于前后对比。
+每次测量都在新的子进程中进行，内存峰值互不影响。
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from corpus import build_corpus
+
+
+def _setup_columns(image, work_dir):
+    """export_to_excel 的输入：先把长图分成列图片（不计入耗时）"""
+    from split_long_image import split_image_to_columns
+    split_image_to_columns(str(image), work_dir / 'columns', 3)
+
+
+def _run_columns(image, work_dir):
+    from split_long_image import split_image_to_columns
+    split_image_to_columns(str(image), work_dir / 'out', 3)
+    return list((work_dir / 'out').iterdir())
+
+
+def _run_export_pdf(image, work_dir):
+    from export_to_pdf import split_image_to_pdf
+    output = work_dir / 'out.pdf'
+    split_image_to_pdf(str(image), str(output), 3)
+    return [output]
+
+
+def _run_batch_pdf(image, work_dir):
+    from batch_convert import split_image_to_pdf
+    output = work_dir / 'out.pdf'
+    split_image_to_pdf(image, output, 3)
+    return sorted(work_dir.glob('out*.pdf'))
+
+
+def _run_excel(image, work_dir):
+    from export_to_excel import export_to_excel
+    output = work_dir / 'out.xlsx'
+    export_to_excel(work_dir / 'columns', output, 3)
+    return [output]
+
+
+# 名称 -> (准备函数, 测量函数)
+TARGETS = {
+    'split_image_to_columns': (None, _run_columns),
+    'export_to_pdf.split_image_to_pdf': (None, _run_export_pdf),
+    'batch_convert.split_image_to_pdf': (None, _run_batch_pdf),
+    'export_to_excel': (_setup_columns, _run_excel),
+}
+
+
+def run_single(target, image, work_dir):
+    """子进程入口：执行一次测量，把结果以 JSON 打印到标准输出"""
+    from profiling import _peak_rss
+    
+    # 先导入模块，导入开销不计入测量
+    _, run = TARGETS[target]
+    for module in ('split_long_image', 'export_to_pdf', 'batch_convert', 'export_to_excel'):
+        __import__(module)
+    
+    work_dir = Path(work_dir)
+    baseline_rss = _peak_rss()
+    log = io.StringIO()
+    wall, cpu = time.perf_counter(), time.process_time()
+    with redirect_stdout(log):
+        outputs = run(Path(image), work_dir)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    
+    output_bytes = sum(path.stat().st_size for path in outputs if path.exists())
+    print(json.dumps({
+        'ok': output_bytes > 0 and '❌' not in log.getvalue(),
+        'wall_s': wall,
+        'cpu_s': cpu,
+        'rss_peak_bytes': _peak_rss(),
+        'rss_baseline_bytes': baseline_rss,
+        'output_bytes': output_bytes,
+    }))
+
+
+def percentile(values, p):
+    """最近秩法求分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def measure(target, entry, repeat):
+    """在子进程中重复测量 repeat 次，返回汇总结果"""
+    path, width, height, fmt, mode = entry
+    setup, _ = TARGETS[target]
+    
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='picutil-bench-') as tmp:
+        tmp = Path(tmp)
+        if setup is not None:
+            with redirect_stdout(io.StringIO()):
+                setup(path, tmp)
+        
+        for _ in range(repeat):
+            # 清掉上一次的输出，准备数据保留
+            for item in tmp.iterdir():
+                if item.name != 'columns':
+                    shutil.rmtree(item) if item.is_dir() else item.unlink()
+            
+            proc = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), '--single', target, str(path), str(tmp)],
+                capture_output=True, text=True, encoding='utf-8'
+            )
+            try:
+                runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (ValueError, IndexError):
+                runs.append({'ok': False, 'error': proc.stderr.strip()[-500:]})
+    
+    ok_runs = [run for run in runs if run.get('ok')]
+    result = {
+        'target': target,
+        'image': path.name,
+        'width': width,
+        'height': height,
+        'format': fmt,
+        'mode': mode,
+        'repeat': repeat,
+        'ok': len(ok_runs) == len(runs),
+        'runs': runs,
+    }
+    if ok_runs:
+        walls = [run['wall_s'] for run in ok_runs]
+        median = percentile(walls, 50)
+        result.update({
+            'wall_p50_s': median,
+            'wall_p90_s': percentile(walls, 90),
+            'wall_min_s': min(walls),
+            'wall_max_s': max(walls),
+            'cpu_p50_s': percentile([run['cpu_s'] for run in ok_runs], 50),
+            'megapixels_per_s': width * height / 1e6 / median if median else None,
+            'rss_peak_bytes': max(run['rss_peak_bytes'] or 0 for run in ok_runs),
+            'output_bytes': ok_runs[-1]['output_bytes'],
+        })
+    return result
+
+
+def environment():
+    """记录运行环境，便于判断两个结果文件是否可比"""
+    versions = {}
+    for module in ('PIL', 'reportlab', 'openpyxl', 'numpy'):
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    
+    commit = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        pass
+    
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions,
+    }
+
+
+def print_table(results, baseline=None):
+    """打印结果表格，有对比文件时显示耗时比例"""
+    previous = {}
+    if baseline:
+        previous = {(r['target'], r['image']): r for r in baseline['results']}
+    
+    print(f"\n{'目标':<34}{'图片':<28}{'p50(s)':>9}{'p90(s)':>9}{'MP/s':>8}{'内存MB':>9}{'输出KB':>10}"
+          + (f"{'对比':>8}" if baseline else ''))
+    for r in results:
+        if not r.get('wall_p50_s'):
+            print(f"{r['target']:<34}{r['image']:<28}  ❌ 失败")
+            continue
+        line = (f"{r['target']:<34}{r['image']:<28}{r['wall_p50_s']:>9.3f}{r['wall_p90_s']:>9.3f}"
+                f"{r['megapixels_per_s']:>8.1f}{r['rss_peak_bytes'] / 2**20:>9.0f}"
+                f"{r['output_bytes'] / 1024:>10.0f}")
+        old = previous.get((r['target'], r['image']))
+        if old and old.get('wall_p50_s'):
+            line += f"{r['wall_p50_s'] / old['wall_p50_s']:>7.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='用合成长截图测试各工具的性能',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 快速测试（只用高度不超过 10000 像素的图片）
+  python benchmarks/run_benchmarks.py --quick
+  
+  # 完整测试，每项重复 5 次
+  python benchmarks/run_benchmarks.py --repeat 5
+  
+  # 只测试 PDF，并与上一次结果对比
+  python benchmarks/run_benchmarks.py --targets export_to_pdf.split_image_to_pdf --compare benchmarks/results/上次.json
+        """
+    )
+    parser.add_argument('--quick', action='store_true',
+                        help='只使用较小的测试图片')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='每项重复次数（默认: 3）')
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS),
+                        help='要测试的函数（默认: 全部）')
+    parser.add_argument('--corpus-dir', default=str(BENCH_DIR / 'corpus'),
+                        help='测试图片目录（默认: benchmarks/corpus）')
+    parser.add_argument('--results-dir', default=str(BENCH_DIR / 'results'),
+                        help='结果保存目录（默认: benchmarks/results）')
+    parser.add_argument('--label', default=None,
+                        help='结果文件名附加的标签')
+    parser.add_argument('--compare', default=None,
+                        help='与之前的结果文件对比')
+    parser.add_argument('--single', nargs=3, metavar=('TARGET', 'IMAGE', 'WORK_DIR'),
+                        help=argparse.SUPPRESS)
+    
+    args = parser.parse_args()
+    
+    if args.single:
+        run_single(*args.single)
+        return
+    
+    corpus = build_corpus(args.corpus_dir, args.quick)
+    
+    results = []
+    for entry in corpus:
+        for target in args.targets:
+            print(f"测试: {target} - {entry[0].name}")
+            results.append(measure(target, entry, args.repeat))
+    
+    report = {
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'quick': args.quick,
+        'repeat': args.repeat,
+        'environment': environment(),
+        'results': results,
+    }
+    
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    name = time.strftime('%Y%m%d-%H%M%S') + (f"-{args.label}" if args.label else '')
+    output_file = results_dir / f"{name}.json"
+    output_file.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+    print_table(results, baseline)
+    print(f"\n✅ 结果已保存: {output_file}")
+    
+    if not all(r['ok'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
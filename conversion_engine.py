@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GUI 使用的后台转换引擎
+用进程池并行转换，子进程通过队列发回进度事件（开始、列段进度），界面线程定时取出事件刷新界面。
+取消时未开始的文件直接丢弃，正在转换的文件在画完当前列段后停止。
+"""
+
+import io
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+
+import profiling
+from batch_pool import default_jobs
+
+
+# 同一个文件两次列段进度事件的最小间隔（秒），避免大量小事件挤满队列
+PROGRESS_INTERVAL = 0.1
+
+# 子进程中的事件队列和取消标志（由进程池的 initializer 设置）
+_events = None
+_cancel = None
+
+
+def _init_worker(events, cancel):
+    global _events, _cancel
+    _events, _cancel = events, cancel
+    # 各阶段耗时随完成事件一起发回，开销可以忽略
+    profiling.enable()
+
+
+def _convert(index, input_path, output_pdf, params):
+    """
+    子进程中执行：转换一个文件，期间发送进度事件
+    
+    返回：(结果, 输出文本, 性能记录)，结果为 True/False，取消时为 None
+    """
+    from batch_convert import split_image_to_pdf
+    
+    if _cancel.is_set():
+        return None, '', None
+    _events.put(('start', index))
+    last_sent = 0.0
+    
+    def progress(done, total):
+        nonlocal last_sent
+        if _cancel.is_set():
+            return False
+        now = time.monotonic()
+        if done == total or now - last_sent >= PROGRESS_INTERVAL:
+            last_sent = now
+            _events.put(('progress', index, done, total))
+        return True
+    
+    buffer = io.StringIO()
+    with redirect_stdout(buffer), redirect_stderr(buffer):
+        ok = split_image_to_pdf(input_path, output_pdf, progress=progress, **params)
+    records = profiling.take_records()
+    record = records[-1] if records else None
+    if not ok and _cancel.is_set():
+        return None, buffer.getvalue(), record
+    return ok, buffer.getvalue(), record
+
+
+class ConversionEngine:
+    """
+    在后台进程池中转换一批文件
+    
+    用法:
+        engine = ConversionEngine([(原图, 输出PDF), ...], params)
+        # 在界面线程中定时调用
+        for event in engine.poll():
+            ...
+    
+    事件:
+        ('start', 序号)
+        ('progress', 序号, 已完成列段数, 总列段数)
+        ('done', 序号, 结果, 输出文本, 性能记录)
+            结果为 True/False，取消时为 None；性能记录是 profiling 的文件记录（含各阶段耗时），可能为 None
+    
+    进度事件和完成事件经不同的通道送达，同一个文件的进度事件可能晚于完成事件，应忽略。
+    """
+    
+    def __init__(self, tasks, params, jobs=None):
+        self.total = len(tasks)
+        self.remaining = len(tasks)
+        self.cancelled = False
+        self.jobs = max(1, min(jobs or default_jobs(), len(tasks) or 1))
+        self.events = multiprocessing.Queue()
+        self.cancel_event = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                            initargs=(self.events, self.cancel_event))
+        for index, (input_path, output_pdf) in enumerate(tasks):
+            future = self.executor.submit(_convert, index, str(input_path), str(output_pdf), params)
+            future.add_done_callback(lambda future, index=index: self._finished(index, future))
+    
+    def _finished(self, index, future):
+        """任务结束（完成、失败或被取消）时在主进程中调用"""
+        if future.cancelled():
+            result, output, record = None, '', None
+        else:
+            try:
+                result, output, record = future.result()
+            except Exception as e:
+                # 子进程异常退出等情况
+                result, output, record = False, f"❌ 错误: {str(e)}\n", None
+        self.events.put(('done', index, result, output, record))
+    
+    def poll(self):
+        """取出目前收到的全部事件（不阻塞）"""
+        events = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'done':
+                self.remaining -= 1
+            events.append(event)
+        if self.remaining == 0:
+            # 全部任务已结束，子进程都已空闲，等待它们退出很快
+            self.executor.shutdown()
+        return events
+    
+    @property
+    def finished(self):
+        return self.remaining == 0
+    
+    def cancel(self):
+        """取消：丢弃未开始的文件，正在转换的文件在当前列段画完后停止"""
+        self.cancelled = True
+        self.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 阶段名称（profiling 中的英文名 -> 界面显示）
+STAGE_NAMES = {
+    'decode': '解码',
+    'analyze': '分析',
+    'crop': '裁剪',
+    'resample': '缩放',
+    'draw': '绘制',
+    'save': '保存',
+}
+
+
+class ProgressTracker:
+    """
+    按像素数加权统计整体进度、吞吐量和剩余时间
+    
+    一张 80000 像素高的长图和几张短图混在一起时，按文件数计算的进度没有意义；
+    这里每个文件按像素数计权重，正在转换的文件按已完成列段的比例计入。
+    失败或取消的文件没有产出，从总量中去掉，不算作已处理，不影响吞吐量和剩余时间。
+    """
+    
+    def __init__(self, plans):
+        """plans: dry_run.plan_files 的结果（只读文件头得到的尺寸和页数），与任务顺序一致"""
+        pixels = [plan['width'] * plan['height'] if 'error' not in plan else None for plan in plans]
+        known = [value for value in pixels if value]
+        # 无法读取尺寸的文件按平均值计权重
+        average = sum(known) / len(known) if known else 1
+        self.pixels = [value or average for value in pixels]
+        self.pages = [plan.get('pages', 0) for plan in plans]
+        self.fraction = [0.0] * len(plans)
+        self.status = ['waiting'] * len(plans)  # waiting / running / done / failed / cancelled
+        self.wall_s = [None] * len(plans)
+        self.records = [None] * len(plans)
+        self.started = {}
+        self.start_time = time.monotonic()
+        self.last_progress = self.start_time
+    
+    def update(self, event):
+        """处理一个 ConversionEngine 事件，返回受影响的文件序号"""
+        kind, index = event[0], event[1]
+        now = time.monotonic()
+        if kind == 'start':
+            self.status[index] = 'running'
+            self.started[index] = now
+        elif kind == 'progress':
+            # 完成事件可能先到，已结束的文件不再更新
+            if self.status[index] != 'running':
+                return index
+            self.fraction[index] = event[2] / event[3]
+        elif kind == 'done':
+            result, record = event[2], event[4]
+            self.status[index] = 'done' if result else ('cancelled' if result is None else 'failed')
+            self.fraction[index] = 1.0 if result else 0.0
+            self.records[index] = record
+            if record is not None:
+                self.wall_s[index] = record['wall_s']
+            elif index in self.started:
+                self.wall_s[index] = now - self.started[index]
+        self.last_progress = now
+        return index
+    
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+    
+    def idle(self):
+        """距离上一次收到进度的秒数，用于判断转换是否卡住"""
+        return time.monotonic() - self.last_progress
+    
+    def total_pixels(self):
+        """需要处理的总像素数（不含失败和取消的文件）"""
+        return sum(pixels for pixels, status in zip(self.pixels, self.status)
+                   if status not in ('failed', 'cancelled'))
+    
+    def done_pixels(self):
+        return sum(pixels * fraction for pixels, fraction in zip(self.pixels, self.fraction))
+    
+    def percent(self):
+        return self.done_pixels() / (self.total_pixels() or 1) * 100
+    
+    def megapixels_per_s(self):
+        elapsed = self.elapsed()
+        return self.done_pixels() / 1e6 / elapsed if elapsed > 0 else 0.0
+    
+    def pages_per_s(self):
+        elapsed = self.elapsed()
+        pages = sum(pages * fraction for pages, fraction in zip(self.pages, self.fraction))
+        return pages / elapsed if elapsed > 0 else 0.0
+    
+    def eta(self):
+        """按目前的吞吐量估算的剩余秒数，还没有进度时返回 None"""
+        done = self.done_pixels()
+        if done <= 0:
+            return None
+        return (self.total_pixels() - done) / (done / self.elapsed())
+    
+    def main_stage(self, index):
+        """该文件耗时最多的阶段和占比，例如 ('绘制', 0.62)，没有记录时返回 None"""
+        record = self.records[index]
+        if not record or not record['stages'] or not record['wall_s']:
+            return None
+        name, stats = max(record['stages'].items(), key=lambda item: item[1]['wall_s'])
+        return STAGE_NAMES.get(name, name), stats['wall_s'] / record['wall_s']
+    
+    def stage_share(self):
+        """已完成文件中各阶段耗时的占比，按耗时从多到少排列"""
+        totals = {}
+        for record in self.records:
+            for name, stats in (record or {}).get('stages', {}).items():
+                totals[name] = totals.get(name, 0.0) + stats['wall_s']
+        total = sum(totals.values())
+        if not total:
+            return []
+        return [(STAGE_NAMES.get(name, name), value / total)
+                for name, value in sorted(totals.items(), key=lambda item: -item[1])]
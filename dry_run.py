@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换前预估
+只读取图片文件头（不解码像素），按 export_to_pdf.plan_layout 的布局计算
+每个文件的列段数、页数和大致的 PDF 大小，几百个文件也能在一秒内完成。
+"""
+
+import math
+import time
+from pathlib import Path
+from PIL import Image
+
+from export_to_pdf import plan_layout, jpeg_mcu_height
+
+
+# PDF 大小 ≈ 原图文件大小 × 嵌入的像素比例 × 系数
+# 系数按原图格式取经验值：重新压缩的 JPEG 解码后体积大得多，PNG 等无损格式接近原图的两倍多
+SIZE_FACTORS = {'JPEG': 6.0, 'MPO': 6.0}
+DEFAULT_SIZE_FACTOR = 2.5
+# JPEG 直通模式每页的额外开销（页面对象、裁剪路径等）
+PAGE_OVERHEAD_BYTES = 1500
+
+
+def plan_file(path, num_columns=3, orientation='landscape', margin=10, overlap=0, column_gap=3,
+              jpeg_passthrough=False, target_dpi=None, max_pages_per_file=0):
+    """
+    预估单个文件的转换结果（参数同 split_image_to_pdf）
+    
+    按内容切分需要解码像素，这里按未切分估算，结果是近似值。
+    
+    返回：dict，包含 name、width、height、format、segments（列段数）、pages、
+          files（max_pages_per_file 拆分后的文件数）、effective_dpi、estimated_bytes、passthrough
+    """
+    path = Path(path)
+    # Image.open 只读取文件头，不解码像素
+    with Image.open(path) as img:
+        width, height = img.size
+        image_format = img.format
+        mcu_height = jpeg_mcu_height(img) if jpeg_passthrough else None
+    file_size = path.stat().st_size
+    
+    layout = plan_layout(width, height, num_columns, orientation, margin, overlap, column_gap,
+                         mcu_height)
+    segments = layout['segments']
+    pages = layout['total_pages']
+    
+    if mcu_height:
+        # 直通模式整张 JPEG 只嵌入一次
+        estimated = file_size + pages * PAGE_OVERHEAD_BYTES
+    else:
+        # 重叠部分会重复嵌入
+        embedded_rows = sum(seg['end_y'] - seg['start_y'] for seg in segments)
+        estimated = file_size * embedded_rows / max(height, 1)
+        estimated *= SIZE_FACTORS.get(image_format, DEFAULT_SIZE_FACTOR)
+        if target_dpi and layout['effective_dpi'] > target_dpi and image_format in SIZE_FACTORS:
+            # 缩小后的图片更难压缩，体积不会按像素数成比例减少，这里按宽度比例估算；
+            # 无损原图缩小后会出现抗锯齿过渡色，体积往往不降反升，按不缩小估算
+            estimated *= target_dpi / layout['effective_dpi']
+    
+    files = 1
+    if max_pages_per_file and pages > max_pages_per_file:
+        files = math.ceil(pages / max_pages_per_file)
+    
+    return {
+        'name': path.name,
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'segments': len(segments),
+        'pages': pages,
+        'files': files,
+        'effective_dpi': layout['effective_dpi'],
+        'estimated_bytes': int(estimated),
+        'passthrough': bool(mcu_height),
+    }
+
+
+def plan_files(paths, **params):
+    """
+    预估多个文件，无法读取的文件记录 error 字段
+    
+    返回：(每个文件的结果列表, 用时秒数)
+    """
+    start = time.perf_counter()
+    plans = []
+    for path in paths:
+        try:
+            plans.append(plan_file(path, **params))
+        except Exception as e:
+            plans.append({'name': Path(path).name, 'error': str(e)})
+    return plans, time.perf_counter() - start
+
+
+def format_size(size):
+    """把字节数格式化成 KB / MB"""
+    if size >= 2**20:
+        return f"{size / 2**20:.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+def summarize(plans):
+    """汇总：(成功的文件数, 总页数, 预计总大小)"""
+    ok = [plan for plan in plans if 'error' not in plan]
+    return len(ok), sum(plan['pages'] for plan in ok), sum(plan['estimated_bytes'] for plan in ok)
+
+
+def print_plan(plans, elapsed):
+    """打印预估结果表格"""
+    print(f"{'文件':<36}{'尺寸':>14}{'列段':>7}{'页数':>7}{'有效DPI':>9}{'预计大小':>12}")
+    for plan in plans:
+        if 'error' in plan:
+            print(f"{plan['name']:<36}  ❌ 无法读取: {plan['error']}")
+            continue
+        size = f"{plan['width']}x{plan['height']}"
+        line = (f"{plan['name']:<36}{size:>14}{plan['segments']:>7}{plan['pages']:>7}"
+                f"{plan['effective_dpi']:>9.0f}{'约 ' + format_size(plan['estimated_bytes']):>12}")
+        if plan['files'] > 1:
+            line += f"  （拆分为 {plan['files']} 个文件）"
+        print(line)
+    
+    count, pages, size = summarize(plans)
+    print(f"\n📊 共 {count} 个文件，{pages} 页，预计约 {format_size(size)}（用时 {elapsed:.2f} 秒，未解码像素）")
+    failed = len(plans) - count
+    if failed:
+        print(f"⚠️  {failed} 个文件无法读取")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一次解码，同时生成所有输出：列图片、合并图片、多列 PDF、Excel
+每张原图只解码一次，分段位置只计算一次，各输出共用同一份像素数据
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+from split_long_image import (plan_columns, save_image, write_combined, output_format_for,
+                              OUTPUT_FORMATS, EFFORTS, MAX_DIMENSIONS)
+from export_to_pdf import split_image_to_pdf
+from export_to_excel import build_workbook, encode_for_cell, cell_display_size
+from batch_pool import run_tasks, print_summary, default_jobs
+
+
+OUTPUT_TYPES = ('columns', 'combined', 'pdf', 'xlsx')
+
+
+def export_image(input_path, output_dir, outputs=OUTPUT_TYPES, num_columns=3, overlap=0,
+                 dpi=300, column_gap=20, orientation='landscape', margin=10,
+                 pdf_column_gap=3, jpeg_passthrough=False, column_width=25, row_height=150,
+                 output_format='png', effort='default', threads=None):
+    """
+    处理单张长图，按 outputs 生成对应文件
+    
+    参数:
+        input_path: 输入图片路径
+        output_dir: 输出目录
+        outputs: 需要生成的输出，取值见 OUTPUT_TYPES
+        num_columns: 列数（列图片、合并图片、PDF 每页列数共用）
+        overlap: 列之间重叠的像素数
+        dpi: 列图片和合并图片的 DPI
+        column_gap: 合并图片时列之间的间隔（像素）
+        orientation: PDF 页面方向
+        margin: PDF 页边距（mm）
+        pdf_column_gap: PDF 列之间的间隔（mm）
+        jpeg_passthrough: PDF 使用 JPEG 直通模式
+        column_width, row_height: Excel 列宽（字符）和行高（磅），用于确定嵌入图片的大小
+        output_format, effort, threads: 列图片和合并图片的格式、压缩力度和编码线程数，同 split_long_image
+    
+    返回：(是否成功, 缩小到单元格尺寸的列图片 PNG 数据列表)，后者供 Excel 使用，未选择 xlsx 时为空
+    """
+    try:
+        input_path = Path(input_path)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        img = Image.open(input_path)
+        width, height = img.size
+        print(f"原图尺寸: {width} x {height} 像素")
+        
+        column_data = []
+        if {'columns', 'combined', 'xlsx'} & set(outputs):
+            # 只解码一次；只生成 PDF 时交给 split_image_to_pdf 决定，直通模式下完全不解码
+            with profiling.stage('decode'):
+                img.load()
+            
+            ranges = plan_columns(height, num_columns, overlap)
+            max_height = max(end_y - start_y for start_y, end_y in ranges)
+            total_width = width * num_columns + column_gap * (num_columns - 1)
+            column_format = output_format_for((width, max_height), output_format)
+            combined_format = output_format_for((total_width, max_height), output_format)
+            if output_format != 'png' and (column_format, combined_format) != (output_format, output_format):
+                print(f"⚠️  图片超过 {output_format.upper()} 的最大尺寸 {MAX_DIMENSIONS[output_format]} 像素，这些图片改存 PNG")
+            
+            # Excel 中各列按第一列的比例缩放，与 shrink_for_cells 相同
+            cell_row_height = row_height * (ranges[0][1] - ranges[0][0]) / width
+            
+            # PNG 合并图按条带写出；WebP/JPEG 编码器需要整张图，仍在内存中拼接
+            canvas = None
+            if 'combined' in outputs and combined_format != 'png':
+                canvas = Image.new('RGB', (total_width, max_height), (255, 255, 255))
+            
+            saves = []
+            threads = threads or min(num_columns + 1, default_jobs())
+            # 只生成 PNG 合并图时不需要逐列裁剪
+            crop_columns = bool({'columns', 'xlsx'} & set(outputs)) or canvas is not None
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                for i, (start_y, end_y) in enumerate(ranges if crop_columns else []):
+                    # 同时等待编码的列不超过线程数，内存中最多保留这么多列
+                    if 'columns' in outputs and i >= threads:
+                        saves[i - threads][0].result()
+                    
+                    with profiling.stage('crop'):
+                        column = img.crop((0, start_y, width, end_y))
+                    
+                    if 'columns' in outputs:
+                        output_path = output_dir / f"{input_path.stem}_列{i+1}{OUTPUT_FORMATS[column_format][0]}"
+                        saves.append((pool.submit(save_image, column, output_path, column_format, effort, dpi),
+                                      f"已保存: {output_path}"))
+                    
+                    if 'xlsx' in outputs:
+                        # 只保留单元格尺寸的小图：并行处理时要传回主进程，并且要保留到最后生成 Excel
+                        column_data.append(encode_for_cell(
+                            column, cell_display_size(column.size, cell_row_height, column_width),
+                            image_format='png'))
+                    
+                    if canvas is not None:
+                        with profiling.stage('combine'):
+                            canvas.paste(column, (i * (width + column_gap), 0))
+                    del column
+                
+                if 'combined' in outputs:
+                    combined_path = output_dir / f"{input_path.stem}_合并_{num_columns}列{OUTPUT_FORMATS[combined_format][0]}"
+                    if canvas is not None:
+                        future = pool.submit(save_image, canvas, combined_path, combined_format, effort, dpi)
+                        del canvas
+                    else:
+                        read_rows = lambda i, start_y, end_y: img.crop((0, start_y, width, end_y))
+                        future = pool.submit(write_combined, combined_path, read_rows, ranges, width,
+                                             column_gap, dpi, effort)
+                    saves.append((future, f"已保存合并版本: {combined_path}"))
+                
+                # 按顺序等待并报告，编码出错时在这里抛出
+                for future, message in saves:
+                    future.result()
+                    print(message)
+        
+        if 'pdf' in outputs:
+            output_pdf = output_dir / f"{input_path.stem}_多列打印.pdf"
+            if not split_image_to_pdf(
+                str(input_path),
+                str(output_pdf),
+                num_columns,
+                orientation,
+                margin,
+                overlap,
+                pdf_column_gap,
+                jpeg_passthrough,
+                image=img
+            ):
+                return False, []
+        
+        return True, column_data
+    
+    except Exception as e:
+        print(f"❌ 错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False, []
+
+
+def export_all(input_path, output_dir=None, outputs=OUTPUT_TYPES, num_columns=3, overlap=0,
+               dpi=300, column_gap=20, orientation='landscape', margin=10, pdf_column_gap=3,
+               jpeg_passthrough=False, column_width=25, row_height=150, page_break_rows=None,
+               jobs=None, output_format='png', effort='default', threads=None):
+    """
+    处理单个文件或目录中的所有图片，Excel 汇总成一个文件（打印预览.xlsx）
+    
+    参数同 export_image，另外:
+        column_width: Excel 列宽（字符）
+        row_height: Excel 行高（磅）
+        page_break_rows: Excel 每多少组图片插入分页符
+        jobs: 并行进程数，默认 CPU 核数，1 表示顺序处理
+        threads: 每个进程内的编码线程数，默认按 CPU 核数平均分给各进程
+    """
+    input_path = Path(input_path)
+    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+    
+    if input_path.is_dir():
+        image_files = sorted(f for f in input_path.iterdir()
+                             if f.is_file() and f.suffix.lower() in image_extensions)
+    else:
+        image_files = [input_path]
+    
+    if not image_files:
+        print(f"❌ 在目录 {input_path} 中未找到图片文件")
+        return False
+    
+    if output_dir is None:
+        base_dir = input_path if input_path.is_dir() else input_path.parent
+        output_dir = base_dir / "output"
+    output_dir = Path(output_dir)
+    
+    print(f"找到 {len(image_files)} 个图片文件，输出: {', '.join(outputs)}")
+    print("=" * 60)
+    
+    # 多个进程同时处理时，每个进程的编码线程数相应减少，避免线程数远超 CPU 核数
+    if threads is None:
+        processes = max(1, min(jobs or default_jobs(), len(image_files)))
+        threads = max(1, default_jobs() // processes)
+    
+    tasks = [((img_file, output_dir, outputs, num_columns, overlap, dpi, column_gap,
+               orientation, margin, pdf_column_gap, jpeg_passthrough, column_width, row_height,
+               output_format, effort, threads), {})
+             for img_file in image_files]
+    results = run_tasks(
+        export_image,
+        tasks,
+        jobs,
+        before_each=lambda i: print(f"\n处理: {image_files[i].name}"),
+        after_each=lambda i, result: print("=" * 60)
+    )
+    
+    success_count = 0
+    image_groups = []
+    for img_file, result in zip(image_files, results):
+        ok, column_data = result if result else (False, [])
+        if ok:
+            success_count += 1
+            if column_data:
+                image_groups.append((img_file.stem, column_data))
+    
+    if 'xlsx' in outputs and image_groups:
+        try:
+            wb = build_workbook(image_groups, num_columns, column_width, row_height,
+                                page_break_rows)
+            output_file = output_dir / "打印预览.xlsx"
+            wb.save(output_file)
+            print(f"\n已保存 Excel: {output_file}")
+        except Exception as e:
+            print(f"❌ Excel 导出失败: {str(e)}")
+            return False
+    
+    print(f"\n✅ 处理完成！成功处理 {success_count}/{len(image_files)} 个文件")
+    print(f"输出目录: {output_dir.absolute()}")
+    print_summary([f.name for f in image_files], [r and r[0] for r in results])
+    return success_count > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='一次解码，同时生成列图片、合并图片、多列 PDF 和 Excel',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 生成全部输出（列图片 + 合并图片 + PDF + Excel）
+  python export_all.py target.jpg
+  
+  # 批量处理文件夹，只生成 PDF 和 Excel
+  python export_all.py ./images/ --outputs pdf xlsx
+  
+  # 3列，重叠50像素，指定输出目录
+  python export_all.py target.jpg -c 3 --overlap 50 -o ./output
+  
+  # 列图片和合并图片输出无损 WebP；只要直通 PDF 时不解码原图
+  python export_all.py target.jpg --format webp
+  python export_all.py target.jpg --outputs pdf --jpeg-passthrough
+        """
+    )
+    
+    parser.add_argument('input', help='输入图片文件或目录')
+    parser.add_argument('-o', '--output', default=None,
+                        help='输出目录（默认: 输入所在目录下的 output）')
+    parser.add_argument('--outputs', nargs='+', choices=OUTPUT_TYPES, default=list(OUTPUT_TYPES),
+                        help='要生成的输出（默认: 全部）')
+    parser.add_argument('-c', '--columns', type=int, default=3,
+                        help='列数（默认: 3）')
+    parser.add_argument('--overlap', type=int, default=0,
+                        help='列之间重叠的像素数（默认: 0）')
+    parser.add_argument('-d', '--dpi', type=int, default=300,
+                        help='列图片DPI（默认: 300）')
+    parser.add_argument('--column-gap', type=int, default=20,
+                        help='合并图片时列之间的间隔像素（默认: 20）')
+    parser.add_argument('--orientation', choices=['landscape', 'portrait'], default='landscape',
+                        help='PDF 页面方向（默认: landscape）')
+    parser.add_argument('--margin', type=float, default=10,
+                        help='PDF 页边距（单位：mm），默认: 10')
+    parser.add_argument('--pdf-column-gap', type=float, default=3,
+                        help='PDF 列之间的间隔（单位：mm），默认: 3')
+    parser.add_argument('--jpeg-passthrough', action='store_true',
+                        help='PDF 使用 JPEG 直通模式（仅对 JPEG 输入生效）')
+    parser.add_argument('--column-width', type=float, default=25,
+                        help='Excel 列宽，单位：字符（默认: 25）')
+    parser.add_argument('--row-height', type=float, default=150,
+                        help='Excel 行高，单位：磅（默认: 150）')
+    parser.add_argument('--page-break', type=int, default=None,
+                        help='Excel 每多少组图片插入一个分页符（默认: 不插入）')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='批量处理时的并行进程数（默认: CPU 核数）')
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='png', dest='output_format',
+                        help='列图片和合并图片的格式：png、webp（无损）、jpeg（高质量有损）（默认: png）')
+    parser.add_argument('--effort', choices=EFFORTS, default='default',
+                        help='压缩力度：fast 速度优先，small 体积优先（默认: default）')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='每张图同时编码的线程数（默认: 按 CPU 核数平均分给各进程）')
+    
+    args = parser.parse_args()
+    
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"❌ 错误: 路径不存在: {args.input}")
+        sys.exit(1)
+    
+    success = export_all(
+        args.input,
+        args.output,
+        args.outputs,
+        args.columns,
+        args.overlap,
+        args.dpi,
+        args.column_gap,
+        args.orientation,
+        args.margin,
+        args.pdf_column_gap,
+        args.jpeg_passthrough,
+        args.column_width,
+        args.row_height,
+        args.page_break,
+        args.jobs,
+        output_format=args.output_format,
+        effort=args.effort,
+        threads=args.threads
+    )
+    
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,220 @@
 
 import os
 import sys
+from io import BytesIO
 from pathlib import Path
 import argparse
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as XLImage
 from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.pagebreak import Break
+from openpyxl.worksheet.worksheet import Worksheet
 from PIL import Image
 
+import profiling
+from split_long_image import plan_columns
 
+
+# 嵌入图片的默认打印分辨率；图片按单元格中的显示尺寸缩小到这个 DPI 再嵌入
+DEFAULT_DPI = 200
+# Excel 按 96 DPI 换算显示尺寸（像素）
+SCREEN_DPI = 96
+JPEG_QUALITY = 85
+# 直接从长图导出时支持的格式
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+# split_long_image.py 可能输出的列图片格式
+COLUMN_EXTENSIONS = ('.png', '.webp', '.jpg')
+
+
+def find_column_images(image_dir):
+    """目录中的列图片（*_列1.png、*_列2.webp 等），按文件名排序"""
+    return sorted(f for f in Path(image_dir).glob("*_列*")
+                  if f.suffix.lower() in COLUMN_EXTENSIONS)
+
+
+def _rewind(img_source):
+    """二进制流可能已被读过，从头开始读"""
+    if hasattr(img_source, 'seek') and not isinstance(img_source, Image.Image):
+        img_source.seek(0)
+
+
+def image_size(img_source):
+    """列图片的尺寸；文件和二进制流只读取文件头"""
+    if isinstance(img_source, Image.Image):
+        return img_source.size
+    _rewind(img_source)
+    with profiling.stage('read'), Image.open(img_source) as header:
+        size = header.size
+    _rewind(img_source)
+    return size
+
+
+def encode_for_cell(img_source, display_size, dpi=DEFAULT_DPI, image_format='jpeg'):
+    """
+    把列图片缩小到单元格显示尺寸对应的像素数并重新压缩
+    
+    参数:
+        img_source: 文件路径、二进制流或 PIL 图片
+        display_size: 单元格中的显示尺寸（宽, 高），单位为 96 DPI 像素
+        dpi: 打印分辨率，0 表示不缩小
+        image_format: 'jpeg' 或 'png'
+    
+    返回：图片数据的 BytesIO
+    """
+    if isinstance(img_source, Image.Image):
+        img = img_source
+    else:
+        with profiling.stage('read'), Image.open(img_source) as img:
+            img.load()
+    
+    if dpi:
+        target = (max(1, round(display_size[0] * dpi / SCREEN_DPI)),
+                  max(1, round(display_size[1] * dpi / SCREEN_DPI)))
+        if target[0] < img.width:
+            with profiling.stage('resample'):
+                img = img.resize(target, Image.LANCZOS, reducing_gap=3.0)
+    
+    buffer = BytesIO()
+    with profiling.stage('encode'):
+        if image_format == 'jpeg':
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # JPEG 没有透明通道，透明部分按白色处理
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        else:
+            img.save(buffer, format='PNG', optimize=True)
+    buffer.seek(0)
+    return buffer
+
+
+def cell_display_size(size, cell_row_height, column_width=25):
+    """
+    图片在单元格中的显示尺寸（保持宽高比缩放到单元格内）
+    
+    参数:
+        size: 图片尺寸（宽, 高）
+        cell_row_height: 所在行的行高（磅，按该组第一张图的宽高比计算）
+        column_width: 列宽（字符）
+    
+    返回：(宽, 高)，单位为 96 DPI 像素
+    """
+    width, height = size
+    # Excel 中的单位转换：列宽(字符) * 7 ≈ 像素
+    cell_width_px = column_width * 7
+    cell_height_px = cell_row_height * 1.33  # 磅转像素
+    
+    # 保持宽高比缩放
+    scale_w = cell_width_px / width
+    scale_h = cell_height_px / height
+    scale = min(scale_w, scale_h) * 0.95  # 0.95 留一点边距
+    return int(width * scale), int(height * scale)
+
+
+def shrink_for_cells(columns, column_width=25, row_height=150, dpi=DEFAULT_DPI):
+    """
+    把一组列图片缩小到 build_workbook 嵌入时的像素数，无损编码为 PNG
+    
+    在子进程中调用，只把缩小后的小图传回主进程，不必传递整列原图；
+    build_workbook 再处理这些小图时不会再缩小，只做最终的编码。
+    
+    返回：PNG 数据的 BytesIO 列表
+    """
+    cell_row_height = row_height * columns[0].height / columns[0].width
+    return [encode_for_cell(column, cell_display_size(column.size, cell_row_height, column_width),
+                            dpi, 'png')
+            for column in columns]
+
+
+def build_workbook(image_groups, num_columns=3, column_width=25, row_height=150,
+                   page_break_rows=None, verbose=True, dpi=DEFAULT_DPI, image_format='jpeg'):
+    """
+    创建打印用的工作簿，每组图片占一行，每页显示指定列数
+    
+    工作簿为只写模式，逐行写出；每张图片读入后立即缩小、重新压缩，
+    内存中只保留压缩后的小图，原图像素用完即释放。只写工作簿只能保存一次。
+    
+    参数:
+        image_groups: [(组名, [列图片, ...]), ...]，列图片可以是文件路径、
+                      PNG/JPEG 数据的二进制流（BytesIO）或 PIL 图片；
+                      可以是生成器，逐组生成时内存中只有当前一组
+        verbose: 是否打印处理过程
+        其余参数同 export_to_excel
+    
+    返回：openpyxl Workbook
+    """
+    # 创建 Excel 工作簿
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("打印预览")
+    
+    # 设置打印选项
+    ws.page_setup.orientation = Worksheet.ORIENTATION_LANDSCAPE  # 横向
+    ws.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = False
+    
+    # 设置页边距（单位：英寸）
+    ws.page_margins.left = 0.5
+    ws.page_margins.right = 0.5
+    ws.page_margins.top = 0.5
+    ws.page_margins.bottom = 0.5
+    
+    # 设置列宽
+    for col in range(1, num_columns + 1):
+        ws.column_dimensions[get_column_letter(col)].width = column_width
+    
+    current_row = 1
+    
+    # 处理每组图片
+    for idx, (base_name, images) in enumerate(image_groups):
+        if verbose:
+            print(f"\n处理: {base_name}")
+            print(f"  包含 {len(images)} 列")
+        
+        # 获取第一张图片的高度来计算行高
+        img_width, img_height = image_size(images[0])
+        
+        # 根据图片宽高比调整行高
+        aspect_ratio = img_height / img_width
+        calculated_row_height = row_height * aspect_ratio
+        
+        # 设置当前行的行高（只写模式下需在写出该行之前设置）
+        ws.row_dimensions[current_row].height = min(calculated_row_height, 800)
+        
+        # 插入图片到各列
+        for col_idx, img_source in enumerate(images[:num_columns], start=1):
+            display_size = cell_display_size(image_size(img_source), calculated_row_height,
+                                             column_width)
+            img = XLImage(encode_for_cell(img_source, display_size, dpi, image_format))
+            img.width, img.height = display_size
+            
+            # 插入图片到单元格
+            coordinate = f"{get_column_letter(col_idx)}{current_row}"
+            ws.add_image(img, coordinate)
+            
+            name = img_source.name if isinstance(img_source, Path) else f"{base_name} 第{col_idx}列"
+            if verbose:
+                print(f"  ✓ 已插入 {name} 到 {coordinate}")
+        
+        ws.append([])
+        current_row += 1
+        
+        # 插入分页符（每处理完一组图片后）
+        if page_break_rows and (idx + 1) % page_break_rows == 0:
+            ws.row_breaks.append(Break(id=current_row - 1))
+            if verbose:
+                print(f"  📄 已在第 {current_row - 1} 行后插入分页符")
+    
+    return wb
+
+
+@profiling.profiled
 def export_to_excel(image_dir, output_file=None, num_columns=3, column_width=25, 
-                    row_height=150, page_break_rows=None):
+                    row_height=150, page_break_rows=None, dpi=DEFAULT_DPI, image_format='jpeg'):
     """
     将分割好的列图片导入到 Excel，每页显示指定列数
     
@@ -26,12 +230,14 @@ def export_to_excel(image_dir, output_file=None, num_columns=3, column_width=25,
         column_width: Excel 列宽（单位：字符）
         row_height: Excel 行高（单位：磅）
         page_break_rows: 每多少行插入分页符（None=自动）
+        dpi: 嵌入图片的打印分辨率，图片缩小到单元格尺寸对应的像素数（0=不缩小）
+        image_format: 嵌入图片的格式，'jpeg' 或 'png'
     """
     try:
         image_dir = Path(image_dir)
         
         # 查找所有列图片（格式：*_列1.png, *_列2.png 等）
-        column_images = sorted([f for f in image_dir.glob("*_列*.png")])
+        column_images = find_column_images(image_dir)
         
         if not column_images:
             print(f"❌ 在目录 {image_dir} 中未找到列图片")
@@ -49,91 +255,95 @@ def export_to_excel(image_dir, output_file=None, num_columns=3, column_width=25,
         
         print(f"找到 {len(image_groups)} 张图片，共 {len(column_images)} 列")
         
-        # 创建 Excel 工作簿
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "打印预览"
+        wb = build_workbook(
+            [(base_name, sorted(images)) for base_name, images in sorted(image_groups.items())],
+            num_columns,
+            column_width,
+            row_height,
+            page_break_rows,
+            dpi=dpi,
+            image_format=image_format
+        )
         
-        # 设置打印选项
-        ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE  # 横向
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-        ws.page_setup.fitToWidth = 1
-        ws.page_setup.fitToHeight = False
+        save_workbook(wb, output_file or image_dir / "打印预览.xlsx")
+        return True
         
-        # 设置页边距（单位：英寸）
-        ws.page_margins.left = 0.5
-        ws.page_margins.right = 0.5
-        ws.page_margins.top = 0.5
-        ws.page_margins.bottom = 0.5
+    except Exception as e:
+        print(f"❌ 错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def find_long_images(input_path):
+    """长图文件本身，或目录中的所有图片（按文件名排序）"""
+    input_path = Path(input_path)
+    if input_path.is_file():
+        return [input_path]
+    return sorted(f for f in input_path.iterdir()
+                  if f.is_file() and f.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def split_groups(image_files, num_columns=3, overlap=0, max_width=None):
+    """
+    逐张解码长图，在内存中按 split_long_image 相同的方式分列
+    
+    生成 (组名, [列图片, ...])，供 build_workbook 使用；内存中只保留当前一张图的列。
+    max_width: 嵌入时最多需要的宽度（像素），JPEG 按 1/2~1/8 比例解码到不小于该宽度
+    """
+    for path in image_files:
+        with profiling.stage('decode'), Image.open(path) as img:
+            width, height = img.size
+            if max_width and img.format == 'JPEG' and width > max_width:
+                img.draft('RGB', (max_width, round(height * max_width / width)))
+            img.load()
+            # 列位置按原图计算，draft 缩小后按比例换算
+            ratio = img.height / height
+            with profiling.stage('crop'):
+                columns = [img.crop((0, round(start_y * ratio), img.width, round(end_y * ratio)))
+                           for start_y, end_y in plan_columns(height, num_columns, overlap)]
+        # 整张图的像素不再需要，先释放再交给调用方
+        del img
+        yield path.stem, columns
+
+
+@profiling.profiled
+def export_images_to_excel(input_path, output_file=None, num_columns=3, overlap=0, column_width=25,
+                           row_height=150, page_break_rows=None, dpi=DEFAULT_DPI, image_format='jpeg'):
+    """
+    直接把长图分列导出到 Excel，不生成中间的列图片文件
+    
+    参数:
+        input_path: 长图文件，或包含长图的目录
+        overlap: 列之间重叠的像素数（同 split_long_image.py）
+        其余参数同 export_to_excel，每张长图分成 num_columns 列占一行
+    """
+    try:
+        input_path = Path(input_path)
+        image_files = find_long_images(input_path)
         
-        # 设置列宽
-        for col in range(1, num_columns + 1):
-            ws.column_dimensions[get_column_letter(col)].width = column_width
+        if not image_files:
+            print(f"❌ 在目录 {input_path} 中未找到图片文件")
+            return False
         
-        current_row = 1
+        print(f"找到 {len(image_files)} 张长图，每张分成 {num_columns} 列（直接分列，不生成列图片）")
         
-        # 处理每组图片
-        for idx, (base_name, images) in enumerate(sorted(image_groups.items())):
-            print(f"\n处理: {base_name}")
-            print(f"  包含 {len(images)} 列")
-            
-            # 获取第一张图片的高度来计算行高
-            first_img = Image.open(images[0])
-            img_width, img_height = first_img.size
-            
-            # 根据图片宽高比调整行高
-            aspect_ratio = img_height / img_width
-            calculated_row_height = row_height * aspect_ratio
-            
-            # 设置当前行的行高
-            ws.row_dimensions[current_row].height = min(calculated_row_height, 800)
-            
-            # 插入图片到各列
-            for col_idx, img_path in enumerate(sorted(images)[:num_columns], start=1):
-                # 读取图片
-                img = XLImage(str(img_path))
-                
-                # 调整图片大小以适应单元格
-                # Excel 中的单位转换：列宽(字符) * 7 ≈ 像素
-                cell_width_px = column_width * 7
-                cell_height_px = calculated_row_height * 1.33  # 磅转像素
-                
-                # 保持宽高比缩放
-                scale_w = cell_width_px / img.width
-                scale_h = cell_height_px / img.height
-                scale = min(scale_w, scale_h) * 0.95  # 0.95 留一点边距
-                
-                img.width = int(img.width * scale)
-                img.height = int(img.height * scale)
-                
-                # 插入图片到单元格
-                cell = ws.cell(row=current_row, column=col_idx)
-                ws.add_image(img, cell.coordinate)
-                
-                print(f"  ✓ 已插入 {img_path.name} 到 {cell.coordinate}")
-            
-            current_row += 1
-            
-            # 插入分页符（每处理完一组图片后）
-            if page_break_rows and (idx + 1) % page_break_rows == 0:
-                ws.row_breaks.append(current_row - 1)
-                print(f"  📄 已在第 {current_row - 1} 行后插入分页符")
+        # 嵌入的图片不会宽于单元格，按此计算 JPEG 最少需要解码的宽度
+        max_width = round(column_width * 7 * dpi / SCREEN_DPI) if dpi else None
+        wb = build_workbook(
+            split_groups(image_files, num_columns, overlap, max_width),
+            num_columns,
+            column_width,
+            row_height,
+            page_break_rows,
+            dpi=dpi,
+            image_format=image_format
+        )
         
-        # 保存 Excel 文件
         if output_file is None:
-            output_file = image_dir / "打印预览.xlsx"
-        else:
-            output_file = Path(output_file)
-        
-        wb.save(output_file)
-        print(f"\n✅ 成功！Excel 文件已保存: {output_file.absolute()}")
-        print(f"\n📋 打印说明:")
-        print(f"  1. 打开 {output_file.name}")
-        print(f"  2. 文件 → 打印（⌘ + P）")
-        print(f"  3. 确认纸张方向为「横向」")
-        print(f"  4. 选择「适合页面」或「缩放到纸张大小」")
-        print(f"  5. 点击打印")
-        
+            directory = input_path.parent if input_path.is_file() else input_path
+            output_file = directory / "打印预览.xlsx"
+        save_workbook(wb, output_file)
         return True
         
     except Exception as e:
@@ -143,9 +353,23 @@ def export_to_excel(image_dir, output_file=None, num_columns=3, column_width=25,
         return False
 
 
+def save_workbook(wb, output_file):
+    """保存 Excel 文件并打印使用说明"""
+    output_file = Path(output_file)
+    with profiling.stage('save', output=output_file):
+        wb.save(output_file)
+    print(f"\n✅ 成功！Excel 文件已保存: {output_file.absolute()}")
+    print(f"\n📋 打印说明:")
+    print(f"  1. 打开 {output_file.name}")
+    print(f"  2. 文件 → 打印（⌘ + P）")
+    print(f"  3. 确认纸张方向为「横向」")
+    print(f"  4. 选择「适合页面」或「缩放到纸张大小」")
+    print(f"  5. 点击打印")
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description='将分割好的图片导出到 Excel，方便打印',
+        description='将分割好的图片（或直接将长图分列）导出到 Excel，方便打印',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 使用示例:
@@ -160,42 +384,70 @@ def main():
   
   # 每1组图片后插入分页符
   python export_to_excel.py output/ --page-break 1
+  
+  # 直接导出长图（内存中分列，不生成中间的列图片）
+  python export_to_excel.py images/ -c 3 --overlap 50
+  python export_to_excel.py 长截图.jpg -o 长截图.xlsx
+  
+  # 嵌入无损 PNG，按 300 DPI 缩小（默认 JPEG、200 DPI）
+  python export_to_excel.py output/ --image-format png --dpi 300
         """
     )
     
-    parser.add_argument('input_dir', help='包含分割列图片的目录（通常是 output/）')
+    parser.add_argument('input_dir',
+                        help='包含分割列图片（*_列N.png）的目录（通常是 output/）；'
+                             '也可以是长图文件或长图目录，此时直接在内存中分列')
     parser.add_argument('-o', '--output', default=None,
                         help='输出的 Excel 文件名（默认: 打印预览.xlsx）')
     parser.add_argument('-c', '--columns', type=int, default=3,
-                        help='每页显示的列数（默认: 3）')
+                        help='每页显示的列数，直接导出长图时也是每张图分成的列数（默认: 3）')
+    parser.add_argument('--overlap', type=int, default=0,
+                        help='直接导出长图时列之间重叠的像素数（默认: 0）')
     parser.add_argument('--column-width', type=float, default=25,
                         help='Excel 列宽，单位：字符（默认: 25）')
     parser.add_argument('--row-height', type=float, default=150,
                         help='Excel 行高，单位：磅（默认: 150）')
     parser.add_argument('--page-break', type=int, default=None,
                         help='每多少组图片插入一个分页符（默认: 不插入）')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                        help=f'嵌入图片的打印分辨率，按单元格尺寸缩小，0=保留原图像素（默认: {DEFAULT_DPI}）')
+    parser.add_argument('--image-format', choices=['jpeg', 'png'], default='jpeg',
+                        help='嵌入图片的格式（默认: jpeg）')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    profiling.start(args, 'export_to_excel')
     
-    # 检查输入目录
+    # 检查输入
     input_path = Path(args.input_dir)
     if not input_path.exists():
-        print(f"❌ 错误: 目录不存在: {args.input_dir}")
+        print(f"❌ 错误: 路径不存在: {args.input_dir}")
         sys.exit(1)
     
-    if not input_path.is_dir():
-        print(f"❌ 错误: {args.input_dir} 不是一个目录")
-        sys.exit(1)
-    
-    # 执行导出
-    success = export_to_excel(
-        args.input_dir,
-        args.output,
-        args.columns,
-        args.column_width,
-        args.row_height,
-        args.page_break
-    )
+    # 执行导出：目录中有列图片时按原方式导出，否则把输入当作长图直接分列
+    if input_path.is_dir() and find_column_images(input_path):
+        success = export_to_excel(
+            args.input_dir,
+            args.output,
+            args.columns,
+            args.column_width,
+            args.row_height,
+            args.page_break,
+            args.dpi,
+            args.image_format
+        )
+    else:
+        success = export_images_to_excel(
+            args.input_dir,
+            args.output,
+            args.columns,
+            args.overlap,
+            args.column_width,
+            args.row_height,
+            args.page_break,
+            args.dpi,
+            args.image_format
+        )
     
     if not success:
         sys.exit(1)
@@ -6,12 +6,24 @@
 
 import os
 import sys
+import hashlib
+from io import BytesIO
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 from PIL import Image
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfbase.pdfutils import readJPEGInfo
+
+import profiling
+from batch_pool import run_tasks, print_summary
+from output_cache import OutputCache
+from strip_reader import StripReader
+from cut_lines import row_variance, find_cut, DEFAULT_TOLERANCE_RATIO
 
 
 def calculate_optimal_layout(img_width, img_height, num_columns=3, 
@@ -57,8 +69,309 @@ def calculate_optimal_layout(img_width, img_height, num_columns=3,
     return column_width_pts, available_height, scale, column_height_px
 
 
+def jpeg_mcu_height(img):
+    """
+    返回 JPEG 图片一个 MCU 行的像素高度（8 或 16），非 JPEG 返回 None
+    
+    MCU 高度由亮度分量的垂直采样因子决定：4:2:0 为 16，4:4:4/4:2:2 为 8
+    """
+    if img.format != 'JPEG' or img.mode not in ('L', 'RGB', 'CMYK'):
+        return None
+    layers = getattr(img, 'layer', None) or []
+    max_v = max((layer[2] for layer in layers), default=1)
+    return 8 * max_v
+
+
+def resample_to_dpi(segment, display_width_pts, target_dpi, resample=Image.LANCZOS):
+    """
+    按在页面上的实际宽度把列段缩小到目标 DPI，已不超过目标 DPI 时原样返回
+    
+    先用 reduce 做整数倍缩小（按块平均，速度快），剩余的非整数部分再用 resample 滤镜缩放
+    """
+    if not target_dpi:
+        return segment
+    target_width = max(1, round(display_width_pts / 72 * target_dpi))
+    if segment.width <= target_width * 1.01:
+        return segment
+    
+    # reduce 和高质量缩放不支持调色板模式
+    if segment.mode in ('P', '1'):
+        segment = segment.convert('RGBA' if 'transparency' in segment.info else 'RGB')
+    
+    factor = segment.width // target_width
+    if factor >= 2:
+        segment = segment.reduce(factor)
+    if segment.width > target_width * 1.01:
+        target_height = max(1, round(segment.height * target_width / segment.width))
+        segment = segment.resize((target_width, target_height), resample)
+    return segment
+
+
+class JpegReader:
+    """内存中的 JPEG 数据，JPEG 直通模式下由 embed_jpeg 原样嵌入，不解码"""
+    
+    def __init__(self, data):
+        self.data = data
+
+
+def embed_jpeg(c, jpeg_source):
+    """
+    把 JPEG 原始数据作为图片对象嵌入 PDF（同一个 canvas 中只嵌入一次），返回可用于 doForm 的名称
+    
+    DCT 数据按原样以二进制写入，体积与原图一致。reportlab 的 drawImage 是否使用 ASCII85 编码
+    取决于全局的 rl_config.useA85，多个线程同时转换时临时修改它会互相影响，
+    所以这里直接构造图片对象，只对这一张图生效。
+    
+    参数:
+        jpeg_source: JPEG 文件名或 JpegReader
+    """
+    if isinstance(jpeg_source, JpegReader):
+        data = jpeg_source.data
+    else:
+        data = Path(jpeg_source).read_bytes()
+    name = f"jpeg{hashlib.md5(data).hexdigest()}"
+    reg_name = c._doc.getXObjectName(name)
+    if reg_name not in c._doc.idToObject:
+        width, height, components = readJPEGInfo(BytesIO(data))[:3]
+        image = pdfdoc.PDFImageXObject(name)
+        image.width, image.height = width, height
+        image.bitsPerComponent = 8
+        image.colorSpace = {1: 'DeviceGray', 3: 'DeviceRGB'}.get(components, 'DeviceCMYK')
+        if image.colorSpace == 'DeviceCMYK':
+            # 与 reportlab 相同：Adobe 的 CMYK JPEG 是反相存储的
+            image._dotrans = 1
+        image.streamContent = data
+        image._filters = ('DCTDecode',)
+        image.mask = None
+        c._doc.Reference(image, reg_name)
+        c._doc.addForm(name, image)
+    # 让页面资源中声明图片 ProcSet（drawImage 也会设置）
+    c._currentPageHasImages = 1
+    return name
+
+
+def plan_layout(img_width, img_height, num_columns=3, orientation='landscape', margin=10,
+                overlap=0, column_gap=3, mcu_height=None, variance=None, cut_tolerance=None):
+    """
+    计算页面布局和每列在原图中的位置，只用到图片尺寸，不需要解码像素
+    
+    参数同 split_image_to_pdf，另外:
+        mcu_height: JPEG 直通模式的 MCU 行高，列高和重叠对齐到它的整数倍
+        variance: row_variance 的结果，传入时把切线移到附近的空白行
+    
+    返回：dict，包含 page_size、column_width_pts、available_height、column_height_px、
+          overlap（调整后）、cut_tolerance、segments（[{'start_y', 'end_y'}, ...]）、
+          smart_cuts、total_pages、effective_dpi
+    """
+    page_size = landscape(A4) if orientation == 'landscape' else A4
+    page_width, page_height = page_size
+    
+    # 可用区域（减去边距和列间隔）
+    available_width = page_width - (2 * margin * mm) - ((num_columns - 1) * column_gap * mm)
+    available_height = page_height - (2 * margin * mm)
+    
+    # 每列宽度（点）
+    column_width_pts = available_width / num_columns
+    
+    # 计算每列应包含的图片高度（像素）
+    # 图片会按宽度缩放以适应列宽，然后计算能放多高
+    scale_for_width = column_width_pts / (img_width * 72 / 96)
+    column_height_px = int(available_height / scale_for_width / 72 * 96)
+    
+    if mcu_height:
+        # 列高向下、重叠向上取整到 MCU 行高的整数倍，使每个切线都落在 MCU 行边界上
+        column_height_px = max(mcu_height, column_height_px // mcu_height * mcu_height)
+        if overlap > 0:
+            overlap = -(-overlap // mcu_height) * mcu_height
+        if overlap >= column_height_px:
+            overlap = 0
+    
+    # 列高至少 1 像素，重叠必须小于列高，否则分段无法向前推进
+    column_height_px = max(1, column_height_px)
+    if overlap >= column_height_px:
+        overlap = column_height_px // 3
+    
+    if variance is not None and cut_tolerance is None:
+        cut_tolerance = int(column_height_px * DEFAULT_TOLERANCE_RATIO)
+    
+    # 将长图分成多个段，每个段作为一列，每页显示 num_columns 列
+    segments = []
+    current_y = 0
+    smart_cuts = 0
+    
+    while current_y < img_height:
+        start_y = current_y
+        end_y = min(current_y + column_height_px, img_height)
+        
+        # 移动到下一段（考虑重叠）
+        next_y = end_y - overlap if overlap > 0 else end_y
+        
+        # 切线落在空白行上时不需要重叠
+        if variance is not None and end_y < img_height:
+            cut = find_cut(variance, end_y, max(start_y + 1, end_y - cut_tolerance))
+            if cut is not None:
+                end_y = next_y = cut
+                smart_cuts += 1
+        
+        segments.append({
+            'start_y': start_y,
+            'end_y': end_y
+        })
+        
+        if end_y >= img_height:
+            break
+        current_y = next_y
+    
+    return {
+        'page_size': page_size,
+        'column_width_pts': column_width_pts,
+        'available_height': available_height,
+        'column_height_px': column_height_px,
+        'overlap': overlap,
+        'cut_tolerance': cut_tolerance,
+        'segments': segments,
+        'smart_cuts': smart_cuts,
+        'total_pages': (len(segments) + num_columns - 1) // num_columns,
+        # 有效打印 DPI：图片宽度铺满列宽时每英寸的像素数
+        'effective_dpi': img_width / (column_width_pts / 72),
+        'num_columns': num_columns,
+    }
+
+
+def iter_pages(layout, read_segment, img_width, target_dpi=None):
+    """
+    按页生成要绘制的列段，取下一页时才裁剪（流式解码时才读取）下一页的行
+    
+    参数:
+        layout: plan_layout 的返回值
+        read_segment: read_segment(start_y, end_y) 返回该段的 PIL 图片；为 None 时不读取图片（JPEG 直通）
+        target_dpi: 列段超过该 DPI 时先缩小
+    
+    产出：(页码, [(列段位置, 显示宽度, 显示高度, 列段图片), ...])，单位为点，不读取图片时列段图片为 None
+    """
+    num_columns = layout['num_columns']
+    segments = layout['segments']
+    column_width_pts = layout['column_width_pts']
+    available_height = layout['available_height']
+    
+    for page_start in range(0, len(segments), num_columns):
+        page = []
+        for seg_info in segments[page_start:page_start + num_columns]:
+            segment_height = seg_info['end_y'] - seg_info['start_y']
+            
+            # 计算显示尺寸（保持宽高比，适应列宽）
+            display_width = column_width_pts
+            display_height = (segment_height / img_width) * display_width
+            
+            # 确保不超过可用高度
+            if display_height > available_height:
+                display_height = available_height
+                display_width = (img_width / segment_height) * display_height
+            
+            segment = None
+            if read_segment is not None:
+                with profiling.stage('crop'):
+                    segment = read_segment(seg_info['start_y'], seg_info['end_y'])
+                if target_dpi:
+                    with profiling.stage('resample'):
+                        segment = resample_to_dpi(segment, display_width, target_dpi)
+            page.append((seg_info, display_width, display_height, segment))
+        yield page_start // num_columns + 1, page
+
+
+def prefetch(iterable):
+    """
+    在后台线程中提前生成下一项
+    
+    绘制当前页（reportlab 计算摘要、压缩）的同时，下一页的解码、裁剪和缩放在另一个线程中进行，
+    两边的主要耗时都在释放 GIL 的 C 代码里，多核时可以并行；内存中最多有两页的列段。
+    """
+    iterator = iter(iterable)
+    end = object()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(next, iterator, end)
+        while True:
+            item = future.result()
+            if item is end:
+                return
+            future = pool.submit(next, iterator, end)
+            yield item
+
+
+def draw_pages(c, layout, read_segment, img_width, img_height, margin=10, column_gap=3,
+               target_dpi=None, jpeg_source=None, on_page=None, prefetch_pages=False):
+    """
+    按 plan_layout 的结果逐页绘制列段（每页的列段画完即释放）
+    
+    参数:
+        c: reportlab Canvas
+        layout: plan_layout 的返回值
+        read_segment: read_segment(start_y, end_y) 返回该段的 PIL 图片
+        target_dpi: 列段超过该 DPI 时先缩小再嵌入
+        jpeg_source: JPEG 直通模式下的原图（文件名或 JpegReader），整张图只嵌入一次，
+                     每列通过裁剪区域显示对应部分，此时不调用 read_segment
+        on_page: 每页开始时调用 on_page(页码, 本页的列段)
+        prefetch_pages: 绘制当前页时在后台线程中准备下一页，适合 read_segment 需要解码的流式读取
+    
+    返回：页数
+    """
+    column_width_pts = layout['column_width_pts']
+    page_height = layout['page_size'][1]
+    
+    if jpeg_source is not None:
+        pages = iter_pages(layout, None, img_width)
+    else:
+        pages = iter_pages(layout, read_segment, img_width, target_dpi)
+        if prefetch_pages:
+            pages = prefetch(pages)
+    
+    if jpeg_source is not None:
+        with profiling.stage('draw'):
+            jpeg_name = embed_jpeg(c, jpeg_source)
+    
+    page_num = 0
+    for page_num, page in pages:
+        if page_num > 1:
+            c.showPage()
+        if on_page:
+            on_page(page_num, [seg_info for seg_info, *_ in page])
+        
+        for col_idx, (seg_info, display_width, display_height, segment) in enumerate(page):
+            # 计算在PDF中的位置
+            x_pos = margin * mm + col_idx * (column_width_pts + column_gap * mm)
+            y_pos = page_height - margin * mm - display_height  # 从顶部开始
+            
+            if jpeg_source is not None:
+                # 直通模式：整张 JPEG 只嵌入一次（embed_jpeg），
+                # 每列用裁剪路径只显示 start_y-end_y 这一段
+                pts_per_px = display_width / img_width
+                c.saveState()
+                clip = c.beginPath()
+                clip.rect(x_pos, y_pos, display_width, display_height)
+                c.clipPath(clip, stroke=0, fill=0)
+                image_top = y_pos + display_height + seg_info['start_y'] * pts_per_px
+                with profiling.stage('draw'):
+                    c.translate(x_pos, image_top - img_height * pts_per_px)
+                    c.scale(display_width, img_height * pts_per_px)
+                    c.doForm(jpeg_name)
+                c.restoreState()
+            else:
+                # 绘制图片（直接传入内存中的裁剪结果，不经过临时文件）
+                with profiling.stage('draw'):
+                    c.drawImage(ImageReader(segment), x_pos, y_pos, 
+                               width=display_width, height=display_height,
+                               preserveAspectRatio=True)
+        # 本页的列段已写入 PDF，释放后再取下一页
+        page = segment = None
+    
+    return page_num
+
+
+@profiling.profiled
 def split_image_to_pdf(input_path, output_pdf=None, num_columns=3, 
-                       orientation='landscape', margin=10, overlap=0, column_gap=3):
+                       orientation='landscape', margin=10, overlap=0, column_gap=3,
+                       jpeg_passthrough=False, streaming=False, image=None,
+                       smart_cut=False, cut_tolerance=None, target_dpi=None):
     """
     将长图分割并转换成多列 A4 PDF
     
@@ -70,14 +383,42 @@ def split_image_to_pdf(input_path, output_pdf=None, num_columns=3,
         margin: 页边距（单位：mm）
         overlap: 列之间重叠的像素数
         column_gap: 列之间的间隔（单位：mm）
+        jpeg_passthrough: JPEG 直通模式，原始 DCT 数据只嵌入一次，
+                          每列通过裁剪区域显示对应部分，不解码也不重新压缩
+        streaming: 按条带流式解码（PNG/BMP 等），内存只保留当前列段，适合超长图
+        image: 已打开的 PIL 图片（可选），传入时直接使用，不再重新打开 input_path
+        smart_cut: 按内容切分，把每列的切线移到附近的空白行（找不到空白行时仍使用 overlap）
+        cut_tolerance: 切线最多向上移动的像素数，默认列高的 20%
+        target_dpi: 目标打印 DPI，列段超过该 DPI 时先缩小再嵌入（打印建议 300）
     """
+    reader = None
     try:
         # 打开图片
-        img = Image.open(input_path)
+        img = image if image is not None else Image.open(input_path)
         img_width, img_height = img.size
         print(f"原图尺寸: {img_width} x {img_height} 像素")
         
-        # 计算最优布局
+        # JPEG 直通模式：分段边界对齐到 MCU 行
+        mcu_height = None
+        if jpeg_passthrough:
+            mcu_height = jpeg_mcu_height(img)
+            if mcu_height is None:
+                print("⚠️  输入不是 JPEG（或色彩模式不支持），直通模式已忽略")
+            else:
+                print(f"JPEG 直通模式: MCU 行高 {mcu_height} 像素")
+        
+        # 流式解码：按列段顺序逐条带读取，不解码整张图
+        if streaming and image is None and not mcu_height:
+            reader = StripReader(input_path)
+            if reader.streaming:
+                print("流式解码模式: 按条带读取，内存只保留当前列段")
+            else:
+                print("⚠️  该格式不支持流式解码，已改为整图解码")
+        elif not mcu_height:
+            # Image.open 只读取文件头，这里提前解码，便于单独统计解码耗时
+            with profiling.stage('decode'):
+                img.load()
+        
         page_size = landscape(A4) if orientation == 'landscape' else A4
         page_width, page_height = page_size
         
@@ -87,33 +428,47 @@ def split_image_to_pdf(input_path, output_pdf=None, num_columns=3,
         print(f"列间隔: {column_gap} mm")
         print(f"列数: {num_columns}")
         
-        # 可用区域（减去边距和列间隔）
-        available_width = page_width - (2 * margin * mm) - ((num_columns - 1) * column_gap * mm)
-        available_height = page_height - (2 * margin * mm)
-        
-        # 每列宽度（点）
-        column_width_pts = available_width / num_columns
+        # 按内容切分：逐行计算亮度方差，用于寻找空白行
+        variance = None
+        if smart_cut:
+            if mcu_height:
+                print("⚠️  JPEG 直通模式下切线需对齐 MCU 行，按内容切分已忽略")
+            else:
+                with profiling.stage('analyze'):
+                    if reader is not None and reader.streaming:
+                        # 流式模式下用单独的读取器扫描一遍，不影响后面按顺序读取列段
+                        with StripReader(input_path) as scan_reader:
+                            variance = row_variance(scan_reader)
+                    else:
+                        # 不能流式解码时读取器已整图解码，直接使用，不再解码第二遍
+                        variance = row_variance(reader.full_image if reader is not None else img)
         
-        # 计算每列应包含的图片高度（像素）
-        # 图片会按宽度缩放以适应列宽，然后计算能放多高
-        scale_for_width = column_width_pts / (img_width * 72 / 96)
-        column_height_px = int(available_height / scale_for_width / 72 * 96)
+        # 计算最优布局和各列段位置
+        # 这里只记录位置（绘制时再裁剪，直通模式下完全不解码）
+        layout = plan_layout(img_width, img_height, num_columns, orientation, margin, overlap,
+                             column_gap, mcu_height, variance, cut_tolerance)
+        segments = layout['segments']
         
-        # 计算总共需要多少列（考虑重叠）
-        total_segments = 0
-        current_pos = 0
-        while current_pos < img_height:
-            total_segments += 1
-            current_pos += column_height_px
-            if current_pos < img_height and overlap > 0:
-                current_pos -= overlap
+        if mcu_height:
+            print(f"对齐后: 列高 {layout['column_height_px']} 像素, 重叠 {layout['overlap']} 像素")
+        elif layout['overlap'] != overlap:
+            print(f"⚠️  重叠像素过大，已调整为 {layout['overlap']} 像素")
+        if variance is not None:
+            print(f"按内容切分: 切线最多上移 {layout['cut_tolerance']} 像素")
         
-        # 计算页数
-        total_pages = (total_segments + num_columns - 1) // num_columns
+        # 有效打印 DPI：图片宽度铺满列宽时每英寸的像素数
+        effective_dpi = layout['effective_dpi']
+        print(f"有效打印DPI: {effective_dpi:.0f}")
+        if target_dpi and mcu_height:
+            print("⚠️  JPEG 直通模式不重新采样，--target-dpi 已忽略")
+        elif target_dpi and effective_dpi > target_dpi:
+            print(f"嵌入前缩小到: {target_dpi} DPI")
         
-        print(f"每列高度: {column_height_px} 像素")
-        print(f"总共分成: {total_segments} 列")
-        print(f"预计页数: {total_pages} 页")
+        print(f"每列高度: {layout['column_height_px']} 像素")
+        print(f"总共分成: {len(segments)} 列")
+        if variance is not None:
+            print(f"切在空白行: {layout['smart_cuts']}/{max(len(segments) - 1, 0)} 处")
+        print(f"预计页数: {layout['total_pages']} 页")
         
         # 输出PDF路径
         if output_pdf is None:
@@ -124,77 +479,25 @@ def split_image_to_pdf(input_path, output_pdf=None, num_columns=3,
         # 创建PDF
         c = canvas.Canvas(str(output_pdf), pagesize=page_size)
         
-        # 分割图片并添加到PDF
-        # 将长图分成多个段，每个段作为一列，每页显示 num_columns 列
-        segments = []
-        current_y = 0
-        
-        # 先生成所有列段
-        while current_y < img_height:
-            start_y = current_y
-            end_y = min(current_y + column_height_px, img_height)
-            
-            # 裁剪列段
-            segment = img.crop((0, start_y, img_width, end_y))
-            segments.append({
-                'image': segment,
-                'start_y': start_y,
-                'end_y': end_y
-            })
-            
-            # 移动到下一段（考虑重叠）
-            current_y = end_y
-            if current_y < img_height and overlap > 0:
-                current_y -= overlap
-        
-        print(f"\n已分割成 {len(segments)} 个列段")
+        def read_segment(start_y, end_y):
+            if reader is not None:
+                return reader.read(start_y, end_y)
+            return img.crop((0, start_y, img_width, end_y))
         
-        # 按页面排列列段
-        page_num = 1
-        for page_start in range(0, len(segments), num_columns):
+        def show_page(page_num, page_segments):
             print(f"\n生成第 {page_num} 页...")
-            page_segments = segments[page_start:page_start + num_columns]
-            
             for col_idx, seg_info in enumerate(page_segments):
-                segment = seg_info['image']
-                
-                # 保存临时图片（使用全局索引避免重名）
-                global_idx = page_start + col_idx
-                temp_path = output_pdf.parent / f"temp_seg_{global_idx}.png"
-                segment.save(temp_path, dpi=(96, 96))
-                
-                # 计算在PDF中的位置
-                x_pos = margin * mm + col_idx * (column_width_pts + column_gap * mm)
-                y_pos = page_height - margin * mm  # 从顶部开始
-                
-                # 计算显示尺寸（保持宽高比，适应列宽）
-                display_width = column_width_pts
-                display_height = (segment.height / img_width) * display_width
-                
-                # 确保不超过可用高度
-                if display_height > available_height:
-                    display_height = available_height
-                    display_width = (img_width / segment.height) * display_height
-                
-                y_pos = y_pos - display_height
-                
-                # 绘制图片
-                c.drawImage(str(temp_path), x_pos, y_pos, 
-                           width=display_width, height=display_height,
-                           preserveAspectRatio=True)
-                
                 print(f"  列 {col_idx + 1}: 原图像素 {seg_info['start_y']}-{seg_info['end_y']}")
-                
-                # 删除临时文件
-                temp_path.unlink()
-            
-            # 如果还有更多段，添加新页
-            if page_start + num_columns < len(segments):
-                c.showPage()
-                page_num += 1
+        
+        page_num = draw_pages(c, layout, read_segment, img_width, img_height, margin, column_gap,
+                              target_dpi=None if mcu_height else target_dpi,
+                              jpeg_source=str(input_path) if mcu_height else None,
+                              on_page=show_page,
+                              prefetch_pages=reader is not None and reader.streaming)
         
         # 保存PDF
-        c.save()
+        with profiling.stage('save', output=output_pdf):
+            c.save()
         
         print(f"\n✅ 成功！PDF 已保存: {output_pdf.absolute()}")
         print(f"共生成 {page_num} 页")
@@ -211,12 +514,20 @@ def split_image_to_pdf(input_path, output_pdf=None, num_columns=3,
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        if reader is not None:
+            reader.close()
 
 
 def process_directory(input_dir, output_dir=None, num_columns=3, 
-                      orientation='landscape', margin=10, overlap=0, column_gap=3):
+                      orientation='landscape', margin=10, overlap=0, column_gap=3,
+                      jpeg_passthrough=False, jobs=None, streaming=False,
+                      smart_cut=False, cut_tolerance=None, target_dpi=None, force=False):
     """
     批量处理目录中的所有图片
+    
+    jobs: 并行进程数，默认 CPU 核数，1 表示顺序处理
+    force: 忽略输出目录中的缓存清单，全部重新生成（默认跳过原图和参数都没变的文件）
     """
     input_path = Path(input_dir)
     image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
@@ -232,31 +543,73 @@ def process_directory(input_dir, output_dir=None, num_columns=3,
     print(f"找到 {len(image_files)} 个图片文件")
     print("=" * 60)
     
-    success_count = 0
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    
+    # 影响输出内容的全部参数，任何一项变化都会重新生成
+    cache = OutputCache(output_dir or input_path)
+    params = {
+        'tool': 'export_to_pdf',
+        'num_columns': num_columns,
+        'orientation': orientation,
+        'margin': margin,
+        'overlap': overlap,
+        'column_gap': column_gap,
+        'jpeg_passthrough': jpeg_passthrough,
+        'smart_cut': smart_cut,
+        'cut_tolerance': cut_tolerance,
+        'target_dpi': target_dpi,
+    }
+    
+    tasks = []
+    pending = []  # [(原图, 输出PDF), ...]
+    skipped = 0
     for img_file in image_files:
-        print(f"\n处理: {img_file.name}")
-        
         # 确定输出路径
         if output_dir:
             output_pdf = Path(output_dir) / f"{img_file.stem}_多列打印.pdf"
         else:
             output_pdf = img_file.parent / f"{img_file.stem}_多列打印.pdf"
         
-        if split_image_to_pdf(
+        if not force and cache.is_fresh(img_file, output_pdf, params):
+            skipped += 1
+            continue
+        pending.append((img_file, output_pdf))
+        
+        tasks.append(((
             str(img_file), 
             str(output_pdf),
             num_columns,
             orientation,
             margin,
             overlap,
-            column_gap
-        ):
-            success_count += 1
-        
-        print("=" * 60)
+            column_gap,
+            jpeg_passthrough,
+            streaming
+        ), {'smart_cut': smart_cut, 'cut_tolerance': cut_tolerance, 'target_dpi': target_dpi}))
+    
+    if skipped:
+        print(f"⏭️  跳过 {skipped} 个原图和参数都未变化的文件（使用 --force 全部重新生成）")
     
-    print(f"\n✅ 批量处理完成！成功处理 {success_count}/{len(image_files)} 个文件")
-    return success_count > 0
+    results = run_tasks(
+        split_image_to_pdf,
+        tasks,
+        jobs,
+        before_each=lambda i: print(f"\n处理: {pending[i][0].name}"),
+        after_each=lambda i, ok: print("=" * 60)
+    )
+    success_count = sum(1 for ok in results if ok)
+    
+    for (img_file, output_pdf), ok in zip(pending, results):
+        if ok:
+            cache.record(img_file, output_pdf, params, [output_pdf])
+        else:
+            cache.forget(output_pdf)
+    cache.save()
+    
+    print(f"\n✅ 批量处理完成！成功处理 {success_count}/{len(pending)} 个文件，跳过 {skipped} 个")
+    print_summary([img_file.name for img_file, _ in pending], results)
+    return success_count + skipped > 0
 
 
 def main():
@@ -277,6 +630,9 @@ def main():
   # 批量处理并指定输出目录
   python export_to_pdf.py ./images/ --output-dir ./pdfs/
   
+  # 批量处理，使用4个进程并行
+  python export_to_pdf.py ./images/ -j 4
+  
   # 2列布局
   python export_to_pdf.py target.jpg -c 2
   
@@ -286,6 +642,24 @@ def main():
   # 自定义页边距和重叠
   python export_to_pdf.py target.jpg --margin 5 --overlap 50
   
+  # JPEG 直通模式（输出体积接近原图，速度快）
+  python export_to_pdf.py target.jpg --jpeg-passthrough
+  
+  # 超长 PNG 截图，流式解码以节省内存
+  python export_to_pdf.py long.png --stream
+  
+  # 按内容切分，不需要重叠
+  python export_to_pdf.py target.jpg --smart-cut --overlap 0
+  
+  # 缩小到 300 DPI 再嵌入，减小 PDF 体积
+  python export_to_pdf.py target.jpg --target-dpi 300
+  
+  # 记录各阶段耗时和内存
+  python export_to_pdf.py ./images/ --profile-report report.json
+  
+  # 只预估页数和 PDF 大小，不实际转换
+  python export_to_pdf.py ./images/ --dry-run
+  
   # 批量处理（先用 split_long_image.py 生成列图片）
   python export_to_pdf.py output/target_列1.png -c 1 --orientation portrait
         """
@@ -307,8 +681,27 @@ def main():
                         help='列之间重叠的像素数（默认: 0）')
     parser.add_argument('--column-gap', type=float, default=3,
                         help='列之间的间隔（单位：mm），默认: 3')
+    parser.add_argument('--jpeg-passthrough', action='store_true',
+                        help='JPEG 直通模式：直接嵌入原始 JPEG 数据，不重新压缩，'
+                             '列高和重叠对齐到 8/16 像素（仅对 JPEG 输入生效）')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='批量处理时的并行进程数（默认: CPU 核数）')
+    parser.add_argument('--stream', action='store_true',
+                        help='按条带流式解码（PNG/BMP/TGA/PPM），内存只保留当前列段，适合超长图')
+    parser.add_argument('--smart-cut', action='store_true',
+                        help='按内容切分：把切线移到附近的空白行，避免切断文字（可配合 --overlap 0 使用，需要 numpy）')
+    parser.add_argument('--cut-tolerance', type=int, default=None,
+                        help='按内容切分时切线最多上移的像素数（默认: 列高的20%%）')
+    parser.add_argument('--target-dpi', type=int, default=None,
+                        help='目标打印DPI，超过时先缩小再嵌入，减小PDF体积（打印建议 300，默认: 不缩小）')
+    parser.add_argument('--force', action='store_true',
+                        help='批量处理时忽略缓存，全部重新生成（默认跳过原图和参数都没变的文件）')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只读取图片文件头，预估每个文件的列段数、页数和 PDF 大小，不实际转换')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    profiling.start(args, 'export_to_pdf')
     
     # 检查输入路径
     input_path = Path(args.input)
@@ -317,6 +710,31 @@ def main():
         print(f"❌ 错误: 路径不存在: {args.input}")
         sys.exit(1)
     
+    if args.dry_run:
+        from dry_run import plan_files, print_plan
+        
+        if input_path.is_dir():
+            image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+            image_files = sorted(f for f in input_path.iterdir()
+                                 if f.is_file() and f.suffix.lower() in image_extensions)
+        else:
+            image_files = [input_path]
+        
+        plans, elapsed = plan_files(
+            image_files,
+            num_columns=args.columns,
+            orientation=args.orientation,
+            margin=args.margin,
+            overlap=args.overlap,
+            column_gap=args.column_gap,
+            jpeg_passthrough=args.jpeg_passthrough,
+            target_dpi=args.target_dpi
+        )
+        print_plan(plans, elapsed)
+        if args.smart_cut:
+            print("⚠️  按内容切分需要解码像素，预估按未切分计算")
+        return
+    
     # 判断是文件还是目录
     if input_path.is_file():
         # 处理单个文件
@@ -330,7 +748,12 @@ def main():
             args.orientation,
             args.margin,
             args.overlap,
-            args.column_gap
+            args.column_gap,
+            args.jpeg_passthrough,
+            args.stream,
+            smart_cut=args.smart_cut,
+            cut_tolerance=args.cut_tolerance,
+            target_dpi=args.target_dpi
         )
         
         if not success:
@@ -348,7 +771,14 @@ def main():
             args.orientation,
             args.margin,
             args.overlap,
-            args.column_gap
+            args.column_gap,
+            args.jpeg_passthrough,
+            args.jobs,
+            args.stream,
+            args.smart_cut,
+            args.cut_tolerance,
+            args.target_dpi,
+            args.force
         )
         
         if not success:
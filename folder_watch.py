@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视文件夹中新增或修改的图片
+Linux 上使用 inotify，其他系统（或 inotify 不可用时）定时扫描目录。
+文件在 settle 秒内没有再变化、大小稳定且能打开时才算写入完成，避免处理写了一半的文件。
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+from pathlib import Path
+
+
+# inotify 事件（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class _InotifyBackend:
+    """通过 ctypes 调用 libc 的 inotify 接口"""
+    
+    name = 'inotify'
+    
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+        
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(folder)), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, 'inotify_add_watch 失败')
+        self.folder = Path(folder)
+    
+    def poll(self, timeout):
+        """等待最多 timeout 秒，返回有变化的文件名列表；队列溢出时返回 None（需要全量扫描）"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        
+        names = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """定时扫描目录，比较文件大小和修改时间"""
+    
+    name = 'polling'
+    
+    def __init__(self, folder, interval=1.0):
+        self.folder = Path(folder)
+        self.interval = interval
+        self.snapshot = self._scan()
+    
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass
+        return snapshot
+    
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = [name for name, state in snapshot.items() if self.snapshot.get(name) != state]
+        self.snapshot = snapshot
+        return changed
+    
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """
+    监视一个文件夹（不含子文件夹）中指定扩展名的文件
+    
+    用法:
+        watcher = FolderWatcher(folder, {'.jpg', '.png'})
+        while True:
+            for path in watcher.wait(0.5):
+                ...  # path 已写入完成
+    """
+    
+    def __init__(self, folder, extensions, settle=1.0, poll_interval=1.0, use_inotify=True):
+        self.folder = Path(folder)
+        self.extensions = {ext.lower() for ext in extensions}
+        self.settle = settle
+        self._pending = {}  # 文件名 -> (最后一次变化的时间, 当时的大小)
+        
+        self.backend = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.backend = _InotifyBackend(self.folder)
+            except (OSError, AttributeError):
+                self.backend = None
+        if self.backend is None:
+            self.backend = _PollingBackend(self.folder, poll_interval)
+    
+    def add(self, path):
+        """手动加入待处理队列（例如处理期间文件又被修改）"""
+        self._mark(Path(path).name)
+    
+    def _mark(self, name):
+        if Path(name).suffix.lower() not in self.extensions:
+            return
+        try:
+            size = (self.folder / name).stat().st_size
+        except OSError:
+            self._pending.pop(name, None)
+            return
+        self._pending[name] = (time.monotonic(), size)
+    
+    def wait(self, timeout=0.5):
+        """等待最多 timeout 秒，返回已写入完成的文件路径列表"""
+        names = self.backend.poll(timeout)
+        if names is None:
+            # inotify 事件丢失，全部重新检查一遍
+            names = [entry.name for entry in os.scandir(self.folder) if entry.is_file()]
+        for name in names:
+            self._mark(name)
+        
+        now = time.monotonic()
+        ready = []
+        for name, (changed_at, size) in list(self._pending.items()):
+            if now - changed_at < self.settle:
+                continue
+            path = self.folder / name
+            try:
+                current_size = path.stat().st_size
+                if current_size != size or current_size == 0:
+                    # 还在写入，重新计时
+                    self._pending[name] = (now, current_size)
+                    continue
+                # Windows 上正在写入的文件无法打开
+                with open(path, 'rb'):
+                    pass
+            except OSError:
+                if not path.exists():
+                    del self._pending[name]
+                continue
+            del self._pending[name]
+            ready.append(path)
+        return sorted(ready)
+    
+    def close(self):
+        self.backend.close()
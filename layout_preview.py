@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面布局预览
+把长图缩小成一份很窄的副本（只解码一次），之后每次调整参数只重新计算布局，
+按 export_to_pdf.draw_pages 相同的几何关系把列段贴到屏幕分辨率的页面上，几十毫秒内完成。
+"""
+
+from PIL import Image, ImageDraw
+from reportlab.lib.units import mm
+
+from export_to_pdf import plan_layout
+
+
+# 缩小副本的宽度（像素）；预览中一列最宽不到 200 像素，再宽没有意义
+SOURCE_WIDTH = 240
+# 预览页面高度（像素）和显示的页数
+PAGE_HEIGHT = 160
+PREVIEW_PAGES = 3
+PAGE_SPACING = 8
+BACKGROUND = (160, 160, 160)
+MARGIN_COLOR = (220, 220, 220)
+
+
+def load_source(path, width=SOURCE_WIDTH):
+    """
+    读取用于预览的缩小副本
+    
+    返回：(缩小后的 RGB 图片, 原图尺寸 (宽, 高))
+    """
+    with Image.open(path) as img:
+        size = img.size
+        if img.format == 'JPEG':
+            # 按 1/2~1/8 比例解码，省去大部分解码时间
+            img.draft('RGB', (width, round(size[1] * width / size[0])))
+        img = img.convert('RGB')
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.BILINEAR)
+    return img, size
+
+
+def render_pages(source, img_size, layout, margin=10, column_gap=3, pages=PREVIEW_PAGES,
+                 page_height=PAGE_HEIGHT):
+    """
+    把 plan_layout 的前几页画成一张图片（各页横向排列）
+    
+    参数:
+        source: load_source 得到的缩小副本
+        img_size: 原图尺寸，layout 中的列段位置以原图像素为单位
+        layout: plan_layout 的返回值
+        margin, column_gap: 与计算 layout 时相同（毫米）
+    
+    返回：PIL 图片
+    """
+    img_width, img_height = img_size
+    page_width_pts, page_height_pts = layout['page_size']
+    scale = page_height / page_height_pts
+    page_width = round(page_width_pts * scale)
+    ratio = source.height / img_height
+    
+    num_columns = layout['num_columns']
+    segments = layout['segments'][:pages * num_columns]
+    page_count = max(1, -(-len(segments) // num_columns))
+    
+    canvas = Image.new('RGB', (page_count * page_width + (page_count - 1) * PAGE_SPACING, page_height),
+                       BACKGROUND)
+    for page in range(page_count):
+        left = page * (page_width + PAGE_SPACING)
+        page_img = Image.new('RGB', (page_width, page_height), (255, 255, 255))
+        # 页边距以内的可用区域用浅灰色框出
+        inset = margin * mm * scale
+        ImageDraw.Draw(page_img).rectangle((inset, inset, page_width - inset, page_height - inset),
+                                           outline=MARGIN_COLOR)
+        
+        page_segments = segments[page * num_columns:(page + 1) * num_columns]
+        for col_idx, seg_info in enumerate(page_segments):
+            segment_height = seg_info['end_y'] - seg_info['start_y']
+            
+            # 与 draw_pages 相同：按列宽缩放，超过可用高度时按高度缩放
+            display_width = layout['column_width_pts']
+            display_height = (segment_height / img_width) * display_width
+            if display_height > layout['available_height']:
+                display_height = layout['available_height']
+                display_width = (img_width / segment_height) * display_height
+            
+            x_pos = (margin * mm + col_idx * (layout['column_width_pts'] + column_gap * mm)) * scale
+            size = (max(1, round(display_width * scale)), max(1, round(display_height * scale)))
+            
+            top = int(seg_info['start_y'] * ratio)
+            bottom = max(top + 1, round(seg_info['end_y'] * ratio))
+            column = source.crop((0, top, source.width, bottom)).resize(size, Image.BILINEAR)
+            page_img.paste(column, (round(x_pos), round(inset)))
+        
+        canvas.paste(page_img, (left, 0))
+    return canvas
+
+
+def preview_layout(source, img_size, num_columns=3, orientation='landscape', margin=10, overlap=0,
+                   column_gap=3, pages=PREVIEW_PAGES, page_height=PAGE_HEIGHT):
+    """
+    按转换参数计算布局并画出前几页（只用缩小副本，不重新解码原图）
+    
+    返回：(预览图片, plan_layout 的结果)
+    """
+    layout = plan_layout(img_size[0], img_size[1], num_columns, orientation, margin, overlap,
+                         column_gap)
+    if layout['column_width_pts'] <= 0 or layout['available_height'] <= 0:
+        raise ValueError("页边距或列间隔过大，页面上没有可用空间")
+    return render_pages(source, img_size, layout, margin, column_gap, pages, page_height), layout
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出缓存清单
+在输出目录中记录每个输出文件对应的原图内容哈希和转换参数，
+重新运行时原图和参数都没有变化、输出文件也还在的，直接跳过。
+"""
+
+import json
+import hashlib
+from pathlib import Path
+
+
+MANIFEST_NAME = '.picutil_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """
+    输出目录中的缓存清单，以输出文件名为键
+    
+    原图的大小和修改时间都没变时沿用记录的哈希，不再重新读取文件内容。
+    """
+    
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.entries = {}
+        self._digests = {}  # 本次运行中计算过的原图哈希：路径 -> (大小, 修改时间, 哈希)
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            if data.get('version') == MANIFEST_VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+    
+    def _source_digest(self, source, entry=None):
+        source = Path(source)
+        stat = source.stat()
+        key = str(source)
+        cached = self._digests.get(key)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            digest = entry['sha256']
+        else:
+            digest = file_digest(source)
+        self._digests[key] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+    
+    def is_fresh(self, source, output, params):
+        """原图内容、参数和输出文件都与记录一致时返回 True"""
+        entry = self.entries.get(Path(output).name)
+        if not entry or entry.get('params') != params:
+            return False
+        try:
+            if self._source_digest(source, entry) != entry.get('sha256'):
+                return False
+            # 只是修改时间变了（内容相同），更新记录，下次不必再计算哈希
+            stat = Path(source).stat()
+            entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            # 输出文件被删除或改动过时重新生成
+            for name, size in entry.get('outputs', {}).items():
+                if (self.path.parent / name).stat().st_size != size:
+                    return False
+        except OSError:
+            return False
+        return bool(entry.get('outputs'))
+    
+    def record(self, source, output, params, output_files):
+        """记录一次成功的转换"""
+        source = Path(source)
+        stat = source.stat()
+        self.entries[Path(output).name] = {
+            'source': source.name,
+            'sha256': self._source_digest(source),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'params': params,
+            'outputs': {Path(f).name: Path(f).stat().st_size for f in output_files},
+        }
+    
+    def forget(self, output):
+        self.entries.pop(Path(output).name, None)
+    
+    def save(self):
+        """写入清单（先写临时文件再替换，中途中断不会留下损坏的清单）"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps({'version': MANIFEST_VERSION, 'entries': self.entries},
+                                  ensure_ascii=False, indent=1), encoding='utf-8')
+        tmp.replace(self.path)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 PDF 转换服务
+常驻进程 + 预热的进程池，其他工具通过 HTTP 上传图片即可拿到 PDF，
+不必每次启动 Python、导入 Pillow 和 reportlab。
+"""
+
+import json
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from batch_pool import default_jobs, warm_up
+from export_to_pdf import plan_layout
+
+
+# 查询参数 -> (split_image_to_pdf 参数名, 类型)
+PARAMS = {
+    'columns': ('num_columns', int),
+    'orientation': ('orientation', str),
+    'margin': ('margin', float),
+    'overlap': ('overlap', int),
+    'column_gap': ('column_gap', float),
+    'jpeg_passthrough': ('jpeg_passthrough', bool),
+    'smart_cut': ('smart_cut', bool),
+    'cut_tolerance': ('cut_tolerance', int),
+    'target_dpi': ('target_dpi', int),
+}
+
+CHUNK_SIZE = 256 * 1024
+# 拒绝请求时最多读取并丢弃这么多请求体数据，超过后直接关闭连接
+DRAIN_LIMIT = 64 * 2**20
+
+
+def parse_params(query):
+    """把查询字符串转换成 split_image_to_pdf 的参数，参数不合法时抛出 ValueError"""
+    kwargs = {}
+    for key, values in parse_qs(query).items():
+        if key not in PARAMS:
+            raise ValueError(f"未知参数: {key}")
+        name, kind = PARAMS[key]
+        value = values[-1]
+        if kind is bool:
+            kwargs[name] = value.lower() in ('1', 'true', 'yes', 'on')
+        else:
+            try:
+                kwargs[name] = kind(value)
+            except ValueError:
+                raise ValueError(f"参数 {key} 的值无效: {value}")
+    if kwargs.get('orientation', 'landscape') not in ('landscape', 'portrait'):
+        raise ValueError("orientation 只能是 landscape 或 portrait")
+    if kwargs.get('num_columns', 3) < 1:
+        raise ValueError("columns 至少为 1")
+    if kwargs.get('margin', 10) < 0 or kwargs.get('column_gap', 3) < 0:
+        raise ValueError("margin 和 column_gap 不能为负数")
+    # 页面几何只取决于这几个参数，用 1x1 的尺寸计算布局即可检查页面上是否还有可用空间
+    layout = plan_layout(1, 1, kwargs.get('num_columns', 3), kwargs.get('orientation', 'landscape'),
+                         kwargs.get('margin', 10), 0, kwargs.get('column_gap', 3))
+    if layout['column_width_pts'] <= 0 or layout['available_height'] <= 0:
+        raise ValueError("页边距或列间隔过大，页面上没有可用空间")
+    return kwargs
+
+
+def convert(image_data, kwargs):
+    """
+    子进程中执行：直接在内存中转换，不落临时文件
+    
+    返回：(是否成功, PDF 数据, 错误信息)
+    """
+    from picutil import image_to_pdf
+    
+    try:
+        return True, image_to_pdf(image_data, **kwargs)['data'], ''
+    except Exception as e:
+        return False, b'', f"❌ 错误: {str(e)}"
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """持有进程池和排队上限的 HTTP 服务"""
+    
+    daemon_threads = True
+    
+    def __init__(self, address, jobs, queue_size, max_upload):
+        super().__init__(address, ConversionHandler)
+        self.jobs = jobs
+        self.executor = ProcessPoolExecutor(max_workers=jobs)
+        # 同时处理和排队的请求总数上限，超过时直接返回 503
+        self.slots = threading.BoundedSemaphore(jobs + queue_size)
+        self.capacity = jobs + queue_size
+        self.max_upload = max_upload
+        self.lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+    
+    def restart_pool(self, broken):
+        """子进程异常退出（例如大图内存不足）后进程池不可再用，换一个新的"""
+        with self.lock:
+            if self.executor is broken:
+                print("⚠️  转换进程异常退出，重新启动进程池")
+                self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+                broken.shutdown(wait=False, cancel_futures=True)
+    
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    server_version = 'PicUtil/1.0'
+    
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}")
+    
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def reject(self, status, data, length, headers=None):
+        """
+        在读取请求体之前返回错误
+        
+        请求体没有读完就关闭连接时，客户端可能只看到连接被重置而收不到状态码，
+        所以回复后把请求体读完丢弃；超过 DRAIN_LIMIT 的部分不再读取，回复中声明关闭连接。
+        """
+        headers = dict(headers or {})
+        if length > DRAIN_LIMIT:
+            headers['Connection'] = 'close'
+            self.close_connection = True
+        self.send_json(status, data, headers)
+        remaining = min(length, DRAIN_LIMIT)
+        while remaining > 0:
+            chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+    
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self.send_json(404, {'error': '未知路径，可用: POST /convert, GET /health'})
+            return
+        server = self.server
+        with server.lock:
+            self.send_json(200, {
+                'workers': server.jobs,
+                'capacity': server.capacity,
+                'active': server.active,
+                'completed': server.completed,
+                'failed': server.failed,
+                'rejected': server.rejected,
+            })
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/convert':
+            self.send_json(404, {'error': '未知路径，可用: POST /convert, GET /health'})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            # 长度未知，无法读完请求体
+            self.close_connection = True
+            self.send_json(400, {'error': 'Content-Length 无效'}, {'Connection': 'close'})
+            return
+        if length <= 0:
+            self.send_json(400, {'error': '请在请求体中上传图片数据'})
+            return
+        try:
+            kwargs = parse_params(url.query)
+        except ValueError as e:
+            self.reject(400, {'error': str(e)}, length)
+            return
+        if length > self.server.max_upload:
+            self.reject(413, {'error': f'图片超过 {self.server.max_upload // 2**20} MB 上限'}, length)
+            return
+        
+        server = self.server
+        if not server.slots.acquire(blocking=False):
+            with server.lock:
+                server.rejected += 1
+            self.reject(503, {'error': '服务繁忙，请稍后重试'}, length, {'Retry-After': '1'})
+            return
+        
+        status = 422
+        try:
+            with server.lock:
+                server.active += 1
+            image_data = self.rfile.read(length)
+            executor = server.executor
+            future = executor.submit(convert, image_data, kwargs)
+            ok, pdf_data, log = future.result()
+        except BrokenProcessPool:
+            server.restart_pool(executor)
+            status = 500
+            ok, pdf_data, log = False, b'', "❌ 错误: 转换进程异常退出（可能是图片过大、内存不足）"
+        except Exception as e:
+            ok, pdf_data, log = False, b'', f"❌ 错误: {str(e)}"
+        finally:
+            with server.lock:
+                server.active -= 1
+            server.slots.release()
+        
+        with server.lock:
+            if ok:
+                server.completed += 1
+            else:
+                server.failed += 1
+        
+        if not ok:
+            self.send_json(status, {'error': '转换失败', 'log': log})
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(pdf_data)))
+        self.end_headers()
+        view = memoryview(pdf_data)
+        for offset in range(0, len(view), CHUNK_SIZE):
+            self.wfile.write(view[offset:offset + CHUNK_SIZE])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='本地 PDF 转换服务：上传图片，返回多列 A4 PDF',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 启动服务（默认 127.0.0.1:8765，进程数为 CPU 核数）
+  python pdf_server.py
+  
+  # 转换一张图片（参数与 export_to_pdf.py 相同，通过查询字符串传入）
+  curl --data-binary @target.jpg -o target.pdf "http://127.0.0.1:8765/convert?columns=3&overlap=50"
+  
+  # JPEG 直通模式
+  curl --data-binary @target.jpg -o target.pdf "http://127.0.0.1:8765/convert?jpeg_passthrough=1"
+  
+  # 查看服务状态
+  curl http://127.0.0.1:8765/health
+
+可用参数: columns, orientation, margin, overlap, column_gap, jpeg_passthrough,
+         smart_cut, cut_tolerance, target_dpi
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='监听地址（默认: 127.0.0.1，只允许本机访问）')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='监听端口（默认: 8765）')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='转换进程数（默认: CPU 核数）')
+    parser.add_argument('--queue-size', type=int, default=16,
+                        help='最多排队的请求数，超过时返回 503（默认: 16）')
+    parser.add_argument('--max-upload', type=int, default=200,
+                        help='单张图片大小上限，单位 MB（默认: 200）')
+    
+    args = parser.parse_args()
+    jobs = args.jobs or default_jobs()
+    
+    server = ConversionServer((args.host, args.port), jobs, args.queue_size,
+                              args.max_upload * 2**20)
+    print(f"启动 {jobs} 个转换进程...")
+    warm_up(server.executor, jobs, 'picutil')
+    print(f"✅ 服务已启动: http://{args.host}:{args.port}/convert（按 Ctrl+C 停止）")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止服务...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # 打包成 exe 后，子进程需要这一步才能正常启动
+    multiprocessing.freeze_support()
+    main()
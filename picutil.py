@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PicUtil 内存接口
+输入可以是图片数据（bytes）、二进制流、PIL 图片或文件路径，结果直接以 bytes 返回
+或写入任意二进制流，全程不落临时文件。返回值是字典（页数、列段位置、各阶段耗时等），
+出错时抛出异常、不打印任何内容，方便在其他程序或服务中调用。
+
+示例:
+    from picutil import image_to_pdf
+    
+    result = image_to_pdf(open('长截图.jpg', 'rb').read(), num_columns=3)
+    Path('长截图.pdf').write_bytes(result['data'])
+    print(result['pages'], result['timings'])
+"""
+
+import io
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from export_to_pdf import plan_layout, draw_pages, jpeg_mcu_height, JpegReader
+from split_long_image import plan_columns
+from export_to_excel import build_workbook, DEFAULT_DPI
+from cut_lines import row_variance
+
+
+class _Timer:
+    """按阶段累计耗时（秒）"""
+    
+    def __init__(self):
+        self.timings = {}
+    
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _open_image(source):
+    """
+    打开输入图片
+    
+    返回：(PIL 图片, 原始数据)；输入本身是 PIL 图片时原始数据为 None
+    """
+    if isinstance(source, Image.Image):
+        return source, None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    elif isinstance(source, (str, Path)):
+        data = Path(source).read_bytes()
+    elif hasattr(source, 'read'):
+        data = source.read()
+    else:
+        raise TypeError(f"不支持的输入类型: {type(source).__name__}")
+    return Image.open(io.BytesIO(data)), data
+
+
+def _open_output(output):
+    """output 为 None 时写入内存；为路径时写入文件；否则视为可写的二进制流"""
+    if output is None:
+        return io.BytesIO()
+    if isinstance(output, (str, Path)):
+        return str(output)
+    return output
+
+
+def _result_data(target, output):
+    """写入内存时返回数据，写入文件或流时返回 None"""
+    return target.getvalue() if output is None else None
+
+
+def image_to_pdf(source, output=None, num_columns=3, orientation='landscape', margin=10,
+                 overlap=0, column_gap=3, jpeg_passthrough=False, smart_cut=False,
+                 cut_tolerance=None, target_dpi=None):
+    """
+    将长图转换成多列 A4 PDF（参数含义同 export_to_pdf.split_image_to_pdf）
+    
+    参数:
+        source: 图片数据（bytes）、二进制流、PIL 图片或文件路径
+        output: None 时返回 PDF 数据；也可以是文件路径或可写的二进制流
+    
+    返回：dict
+        data: PDF 数据（output 为 None 时），否则为 None
+        pages: 页数
+        segments: 各列在原图中的位置 [(start_y, end_y), ...]
+        size: 原图尺寸 (宽, 高)
+        effective_dpi: 有效打印 DPI
+        jpeg_passthrough: 是否实际使用了 JPEG 直通（输入不是 JPEG 时自动关闭）
+        smart_cuts: 切在空白行上的切线数
+        timings: 各阶段耗时（秒）
+    """
+    timer = _Timer()
+    img, data = _open_image(source)
+    img_width, img_height = img.size
+    
+    # 直通模式需要原始 JPEG 数据，PIL 图片输入时不可用
+    mcu_height = jpeg_mcu_height(img) if jpeg_passthrough and data is not None else None
+    if not mcu_height:
+        with timer.stage('decode'):
+            img.load()
+    
+    variance = None
+    if smart_cut and not mcu_height:
+        with timer.stage('analyze'):
+            variance = row_variance(img)
+    
+    layout = plan_layout(img_width, img_height, num_columns, orientation, margin, overlap,
+                         column_gap, mcu_height, variance, cut_tolerance)
+    
+    target = _open_output(output)
+    c = canvas.Canvas(target, pagesize=layout['page_size'])
+    with timer.stage('draw'):
+        pages = draw_pages(c, layout, lambda start_y, end_y: img.crop((0, start_y, img_width, end_y)),
+                           img_width, img_height, margin, column_gap,
+                           target_dpi=None if mcu_height else target_dpi,
+                           jpeg_source=JpegReader(data) if mcu_height else None)
+    with timer.stage('save'):
+        c.save()
+    
+    return {
+        'data': _result_data(target, output),
+        'pages': pages,
+        'segments': [(seg['start_y'], seg['end_y']) for seg in layout['segments']],
+        'size': (img_width, img_height),
+        'effective_dpi': layout['effective_dpi'],
+        'jpeg_passthrough': bool(mcu_height),
+        'smart_cuts': layout['smart_cuts'],
+        'timings': timer.timings,
+    }
+
+
+def image_to_columns(source, num_columns=2, overlap=0, dpi=300, column_gap=20, combined=True):
+    """
+    将长图分割成多列 PNG（参数含义同 split_long_image.split_image_to_columns）
+    
+    参数:
+        source: 图片数据（bytes）、二进制流、PIL 图片或文件路径
+        combined: 是否同时生成各列并排的合并图
+    
+    返回：dict
+        columns: 每列的 PNG 数据列表
+        combined: 合并图的 PNG 数据（combined=False 时为 None）
+        ranges: 各列在原图中的位置 [(start_y, end_y), ...]
+        size: 原图尺寸 (宽, 高)
+        timings: 各阶段耗时（秒）
+    """
+    timer = _Timer()
+    img, _ = _open_image(source)
+    width, height = img.size
+    with timer.stage('decode'):
+        img.load()
+    
+    ranges = plan_columns(height, num_columns, overlap)
+    
+    merged = None
+    if combined:
+        total_width = width * num_columns + column_gap * (num_columns - 1)
+        max_height = max(end_y - start_y for start_y, end_y in ranges)
+        merged = Image.new('RGB', (total_width, max_height), (255, 255, 255))
+    
+    columns = []
+    for i, (start_y, end_y) in enumerate(ranges):
+        with timer.stage('crop'):
+            column = img.crop((0, start_y, width, end_y))
+        with timer.stage('encode'):
+            buffer = io.BytesIO()
+            column.save(buffer, format='PNG', dpi=(dpi, dpi))
+            columns.append(buffer.getvalue())
+        if merged is not None:
+            with timer.stage('combine'):
+                merged.paste(column, (i * (width + column_gap), 0))
+        del column
+    
+    merged_data = None
+    if merged is not None:
+        with timer.stage('encode'):
+            buffer = io.BytesIO()
+            merged.save(buffer, format='PNG', dpi=(dpi, dpi))
+            merged_data = buffer.getvalue()
+    
+    return {
+        'columns': columns,
+        'combined': merged_data,
+        'ranges': ranges,
+        'size': (width, height),
+        'timings': timer.timings,
+    }
+
+
+def columns_to_xlsx(image_groups, output=None, num_columns=3, column_width=25, row_height=150,
+                    page_break_rows=None, dpi=DEFAULT_DPI, image_format='jpeg'):
+    """
+    将分好的列图片导出到 Excel（参数含义同 export_to_excel.export_to_excel）
+    
+    参数:
+        image_groups: [(组名, [列图片, ...]), ...]，列图片可以是 PNG/JPEG 数据（bytes）、
+                      二进制流、PIL 图片或文件路径；image_to_columns 的 columns 可直接传入，
+                      PIL 图片直接缩小嵌入，不经过 PNG 编码
+        output: None 时返回 XLSX 数据；也可以是文件路径或可写的二进制流
+    
+    返回：dict
+        data: XLSX 数据（output 为 None 时），否则为 None
+        rows: 写入的行数（每组一行）
+        timings: 各阶段耗时（秒）
+    """
+    timer = _Timer()
+    
+    def as_stream(item):
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            return io.BytesIO(item)
+        if isinstance(item, str):
+            return Path(item)
+        return item
+    
+    with timer.stage('read'):
+        groups = [(name, [as_stream(item) for item in images]) for name, images in image_groups]
+        wb = build_workbook(groups, num_columns, column_width, row_height, page_break_rows,
+                            verbose=False, dpi=dpi, image_format=image_format)
+    
+    target = _open_output(output)
+    with timer.stage('save'):
+        wb.save(target)
+    
+    return {
+        'data': _result_data(target, output),
+        'rows': len(groups),
+        'timings': timer.timings,
+    }
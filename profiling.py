@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段记录耗时和内存，输出 JSON 报告
+每个文件的解码、裁剪、编码、绘制、保存等阶段分别统计墙钟时间、CPU 时间、
+写出的字节数，以及可选的 Python 内存峰值（tracemalloc，相对阶段/文件开始时增加的字节数）。
+阶段的 CPU 时间只计执行该阶段的线程，多个线程同时执行的阶段不会重复计算。
+进程内存峰值（process_rss_peak_bytes）是进程启动以来的最高值，不能按文件区分：
+进程池中同一个子进程处理的后续文件会沿用前面文件的峰值，因此只在文件记录中作为进程级数据给出。
+未启用时各接口几乎没有开销。
+"""
+
+import os
+import sys
+import json
+import atexit
+import functools
+import time
+import platform
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# 当前进程的记录器，未启用时为 None
+_profiler = None
+
+
+def _peak_rss():
+    """进程启动以来的内存峰值（字节），无法获取时返回 None"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+            
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [
+                    ('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t),
+                ]
+            
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return None
+            return counters.PeakWorkingSetSize
+        
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位是 KB，macOS 是字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+class Profiler:
+    """按文件、按阶段累计统计数据"""
+    
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._current = None
+        self._file_py_base = 0
+        # 编码线程池、预取线程等会在多个线程中同时调用 stage()
+        self._lock = threading.Lock()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+    
+    @contextmanager
+    def file(self, name):
+        # 嵌套调用（例如 export_all 内部调用 split_image_to_pdf）时记到外层文件上
+        if self._current is not None:
+            yield
+            return
+        
+        record = {
+            'file': str(name),
+            'pid': os.getpid(),
+            'wall_s': 0.0,
+            'cpu_s': 0.0,
+            'py_peak_bytes': None,
+            'process_rss_peak_bytes': None,
+            'bytes_written': 0,
+            'stages': {},
+        }
+        self._current = record
+        self._file_py_base = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            # 文件的 CPU 时间包括所有线程
+            record['cpu_s'] = time.process_time() - cpu
+            record['process_rss_peak_bytes'] = _peak_rss()
+            self._current = None
+            self.records.append(record)
+    
+    @contextmanager
+    def stage(self, name, output=None):
+        record = self._current
+        if record is None:
+            yield
+            return
+        
+        py_base = None
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            py_base = tracemalloc.get_traced_memory()[0]
+        # 阶段可能在编码线程池、预取线程中执行，CPU 时间只计当前线程
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            py_peak = tracemalloc.get_traced_memory()[1] if py_base is not None else None
+            written = 0
+            if output is not None and hasattr(output, 'getbuffer'):
+                written = output.getbuffer().nbytes
+            elif output is not None and Path(output).exists():
+                written = Path(output).stat().st_size
+            
+            with self._lock:
+                stats = record['stages'].setdefault(name, {
+                    'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                    'py_peak_bytes': None, 'bytes_written': 0,
+                })
+                stats['calls'] += 1
+                stats['wall_s'] += wall
+                stats['cpu_s'] += cpu
+                if py_peak is not None:
+                    # 记录相对阶段开始时、文件开始时增加的字节数
+                    stats['py_peak_bytes'] = max(stats['py_peak_bytes'] or 0, py_peak - py_base)
+                    record['py_peak_bytes'] = max(record['py_peak_bytes'] or 0,
+                                                  py_peak - self._file_py_base)
+                stats['bytes_written'] += written
+                record['bytes_written'] += written
+
+
+def enable(trace_memory=False):
+    """
+    在当前进程启用统计
+    
+    trace_memory: 用 tracemalloc 统计 Python 对象的内存峰值。
+                  Pillow 的像素数据不在统计范围内，且会让 reportlab 等纯 Python 代码明显变慢
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(trace_memory)
+    return _profiler
+
+
+def is_enabled():
+    return _profiler is not None
+
+
+def options():
+    """当前进程的统计选项，传给子进程用"""
+    return {'trace_memory': _profiler.trace_memory} if _profiler is not None else None
+
+
+def file_record(name):
+    """统计一个文件的处理过程，内部用 stage() 划分阶段"""
+    if _profiler is None:
+        return _nothing()
+    return _profiler.file(name)
+
+
+def stage(name, output=None):
+    """
+    统计一个阶段，同名阶段累加
+    
+    output: 该阶段写出的文件路径或 BytesIO，结束时计入写出字节数
+    """
+    if _profiler is None:
+        return _nothing()
+    return _profiler.stage(name, output)
+
+
+@contextmanager
+def _nothing():
+    yield
+
+
+def profiled(func):
+    """装饰器：把 func(input_path, ...) 的一次调用记为一个文件"""
+    @functools.wraps(func)
+    def wrapper(input_path, *args, **kwargs):
+        if _profiler is None:
+            return func(input_path, *args, **kwargs)
+        with _profiler.file(input_path):
+            return func(input_path, *args, **kwargs)
+    return wrapper
+
+
+def take_records():
+    """取出并清空当前进程的记录（子进程用于把结果交给主进程）"""
+    if _profiler is None:
+        return []
+    records, _profiler.records = _profiler.records, []
+    return records
+
+
+def add_records(records):
+    """合并子进程返回的记录"""
+    if _profiler is not None and records:
+        _profiler.records.extend(records)
+
+
+def summarize(records):
+    """按阶段汇总所有文件"""
+    totals = {}
+    for record in records:
+        for name, stats in record['stages'].items():
+            total = totals.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                             'bytes_written': 0})
+            total['calls'] += stats['calls']
+            total['wall_s'] += stats['wall_s']
+            total['cpu_s'] += stats['cpu_s']
+            total['bytes_written'] += stats['bytes_written']
+    return totals
+
+
+def write_report(path, tool, wall_s):
+    """把记录写成 JSON 报告"""
+    records = _profiler.records if _profiler is not None else []
+    report = {
+        'tool': tool,
+        'argv': sys.argv[1:],
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'wall_s': wall_s,
+        'process_rss_peak_bytes': _peak_rss(),  # 主进程；子进程的见各文件记录
+        'files': records,
+        'stages': summarize(records),
+    }
+    Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"📊 性能报告已保存: {path}")
+
+
+def add_arguments(parser):
+    """给命令行工具添加 --profile-report 和 --cprofile 参数"""
+    parser.add_argument('--profile-report', default=None, metavar='REPORT.json',
+                        help='记录每个文件各阶段的耗时、内存和写出字节数，保存为 JSON')
+    parser.add_argument('--trace-malloc', action='store_true',
+                        help='性能报告中加入 Python 内存峰值（tracemalloc），会明显变慢')
+    parser.add_argument('--cprofile', default=None, metavar='OUT.prof',
+                        help='用 cProfile 分析主进程，保存为 .prof 文件（可用 snakeviz 等查看）')
+
+
+def start(args, tool):
+    """
+    根据命令行参数（--profile-report / --cprofile）启用统计，进程退出时（包括 sys.exit）写出报告
+    """
+    report_path = getattr(args, 'profile_report', None)
+    cprofile_path = getattr(args, 'cprofile', None)
+    if not report_path and not cprofile_path:
+        return
+    
+    if report_path:
+        enable(getattr(args, 'trace_malloc', False))
+    profile = None
+    if cprofile_path:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+    
+    start_time = time.perf_counter()
+    
+    def finish():
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(cprofile_path)
+            print(f"📊 cProfile 数据已保存: {cprofile_path}")
+        if report_path:
+            write_report(report_path, tool, time.perf_counter() - start_time)
+    
+    atexit.register(finish)
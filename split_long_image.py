@@ -10,9 +10,134 @@ import sys
 from PIL import Image
 import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import profiling
+from batch_pool import run_tasks, print_summary, default_jobs
+from strip_reader import StripReader
+from strip_writer import PngStripWriter
 
-def split_image_to_columns(input_path, output_dir=None, num_columns=2, overlap=0, dpi=300, column_gap=20):
+
+# 输出格式和压缩力度：格式 -> (扩展名, {力度: save 参数})
+# PNG 的 default 与 Pillow 默认相同；WebP 为无损压缩；JPEG 为高质量、不做色度抽样，文字边缘不发虚
+OUTPUT_FORMATS = {
+    'png': ('.png', {
+        'fast': {'format': 'PNG', 'compress_level': 1},
+        'default': {'format': 'PNG', 'compress_level': 6},
+        'small': {'format': 'PNG', 'optimize': True},
+    }),
+    'webp': ('.webp', {
+        'fast': {'format': 'WEBP', 'lossless': True, 'quality': 0, 'method': 0},
+        'default': {'format': 'WEBP', 'lossless': True, 'quality': 25, 'method': 2},
+        'small': {'format': 'WEBP', 'lossless': True, 'quality': 50, 'method': 4},
+    }),
+    'jpeg': ('.jpg', {
+        'fast': {'format': 'JPEG', 'quality': 95, 'subsampling': 0},
+        'default': {'format': 'JPEG', 'quality': 95, 'subsampling': 0, 'optimize': True},
+        'small': {'format': 'JPEG', 'quality': 95, 'subsampling': 0, 'optimize': True, 'progressive': True},
+    }),
+}
+EFFORTS = ('fast', 'default', 'small')
+# 格式支持的最大边长（像素），超过时改存 PNG
+MAX_DIMENSIONS = {'webp': 16383, 'jpeg': 65535}
+# 合并图按条带写出时每个条带的行数
+COMBINE_STRIP_HEIGHT = 64
+
+
+def plan_columns(height, num_columns=2, overlap=0):
+    """
+    计算每列在原图中的起止位置
+    
+    返回：[(start_y, end_y), ...]，共 num_columns 项
+    """
+    # 计算每列的高度
+    column_height = height // num_columns
+    
+    # 如果有重叠，需要调整高度
+    if overlap > 0:
+        column_height = (height + overlap * (num_columns - 1)) // num_columns
+    
+    ranges = []
+    for i in range(num_columns):
+        # 计算当前列的起始和结束位置
+        start_y = i * column_height - (i * overlap if i > 0 else 0)
+        end_y = min(start_y + column_height, height)
+        
+        # 如果是最后一列，确保包含所有剩余内容
+        if i == num_columns - 1:
+            end_y = height
+        
+        ranges.append((start_y, end_y))
+    
+    return ranges
+
+
+def combine_columns(columns, column_gap=20):
+    """
+    将各列横向拼接成一张图（所有列并排显示，带间隔）
+    """
+    width = max(col.width for col in columns)
+    total_width = width * len(columns) + column_gap * (len(columns) - 1)
+    max_height = max(col.height for col in columns)
+    
+    combined = Image.new('RGB', (total_width, max_height), (255, 255, 255))
+    
+    for i, col in enumerate(columns):
+        x_position = i * (width + column_gap)
+        combined.paste(col, (x_position, 0))
+    
+    return combined
+
+
+def output_format_for(size, output_format):
+    """图片尺寸超过该格式的上限时改用 PNG"""
+    limit = MAX_DIMENSIONS.get(output_format)
+    if limit and max(size) > limit:
+        return 'png'
+    return output_format
+
+
+def save_image(image, path, output_format='png', effort='default', dpi=300):
+    """按格式和压缩力度保存图片（在线程池中调用，Pillow 编码时释放 GIL）"""
+    options = OUTPUT_FORMATS[output_format][1][effort]
+    if output_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    with profiling.stage('encode', output=path):
+        image.save(path, dpi=(dpi, dpi), **options)
+
+
+def write_combined(path, read_rows, ranges, width, column_gap=20, dpi=300, effort='default',
+                   strip_height=COMBINE_STRIP_HEIGHT):
+    """
+    按条带写出合并图（PNG）：每个条带从各列对应的行拼成，写完即释放，
+    不需要整张合并图的画布
+    
+    参数:
+        read_rows: read_rows(列序号, start_y, end_y) 返回原图这些行的图片，
+                   同一列的 start_y 单调递增
+        ranges: plan_columns 的结果
+    """
+    total_width = width * len(ranges) + column_gap * (len(ranges) - 1)
+    max_height = max(end_y - start_y for start_y, end_y in ranges)
+    compress_level = OUTPUT_FORMATS['png'][1][effort].get('compress_level', 9)
+    
+    with profiling.stage('encode', output=path), \
+            PngStripWriter(path, total_width, max_height, 'RGB', compress_level, dpi) as writer:
+        for top in range(0, max_height, strip_height):
+            rows = min(strip_height, max_height - top)
+            strip = Image.new('RGB', (total_width, rows), (255, 255, 255))
+            for i, (start_y, end_y) in enumerate(ranges):
+                # 较短的列（最后一列）下方留白
+                bottom = min(end_y, start_y + top + rows)
+                if start_y + top < bottom:
+                    strip.paste(read_rows(i, start_y + top, bottom), (i * (width + column_gap), 0))
+            writer.write(strip)
+
+
+@profiling.profiled
+def split_image_to_columns(input_path, output_dir=None, num_columns=2, overlap=0, dpi=300, column_gap=20,
+                           streaming=False, output_format='png', effort='default', threads=None,
+                           combined=True):
     """
     将长图分割成多列
     
@@ -23,19 +148,29 @@ def split_image_to_columns(input_path, output_dir=None, num_columns=2, overlap=0
         overlap: 列之间的重叠像素数，默认0
         dpi: 输出图片的DPI，默认300（适合打印）
         column_gap: 合并图片时列之间的间隔像素，默认20
+        streaming: 按条带流式解码（PNG/BMP 等），不一次性解码整张图
+        output_format: 输出格式，'png'、'webp'（无损）或 'jpeg'（高质量）
+        effort: 压缩力度，'fast'（快、文件大）、'default' 或 'small'（慢、文件小）
+        threads: 同时编码的线程数，默认 min(列数 + 1, CPU 核数)
+        combined: 是否生成各列并排的合并图；PNG 合并图按条带写出，不占用整张图的内存
     """
     try:
         # 打开图片
         img = Image.open(input_path)
         width, height = img.size
+        reader = None
+        if streaming:
+            reader = StripReader(input_path)
+            if not reader.streaming:
+                print("⚠️  该格式不支持流式解码，已改为整图解码")
+        else:
+            with profiling.stage('decode'):
+                img.load()
         print(f"原图尺寸: {width} x {height} 像素")
         
-        # 计算每列的高度
-        column_height = height // num_columns
-        
-        # 如果有重叠，需要调整高度
-        if overlap > 0:
-            column_height = (height + overlap * (num_columns - 1)) // num_columns
+        # 计算每列的起止位置
+        ranges = plan_columns(height, num_columns, overlap)
+        column_height = ranges[0][1] - ranges[0][0]
         
         print(f"分割成 {num_columns} 列，每列高度约: {column_height} 像素")
         
@@ -49,42 +184,78 @@ def split_image_to_columns(input_path, output_dir=None, num_columns=2, overlap=0
         # 获取原文件名（不含扩展名）
         input_filename = Path(input_path).stem
         
-        # 分割图片
-        columns = []
-        for i in range(num_columns):
-            # 计算当前列的起始和结束位置
-            start_y = i * column_height - (i * overlap if i > 0 else 0)
-            end_y = min(start_y + column_height, height)
-            
-            # 如果是最后一列，确保包含所有剩余内容
-            if i == num_columns - 1:
-                end_y = height
-            
-            # 裁剪图片
-            column = img.crop((0, start_y, width, end_y))
-            columns.append(column)
-            
-            # 保存单独的列
-            output_path = output_dir / f"{input_filename}_列{i+1}.png"
-            column.save(output_path, dpi=(dpi, dpi))
-            print(f"已保存: {output_path}")
+        # 横向拼接的版本（所有列并排显示，带间隔）
+        total_width = width * num_columns + column_gap * (num_columns - 1)
+        max_height = max(end_y - start_y for start_y, end_y in ranges)
         
-        # 创建横向拼接的版本（所有列并排显示，带间隔）
-        gap = column_gap  # 列之间的间隔（像素）
-        total_width = width * num_columns + gap * (num_columns - 1)
-        max_height = max(col.height for col in columns)
+        # 裁剪在主线程中依次进行，编码交给线程池并行执行
+        threads = threads or min(num_columns + 1, default_jobs())
+        column_format = output_format_for((width, max_height), output_format)
+        combined_format = output_format_for((total_width, max_height), output_format)
+        if output_format != 'png' and (column_format, combined_format) != (output_format, output_format):
+            print(f"⚠️  图片超过 {output_format.upper()} 的最大尺寸 {MAX_DIMENSIONS[output_format]} 像素，这些图片改存 PNG")
         
-        combined = Image.new('RGB', (total_width, max_height), (255, 255, 255))
+        # PNG 合并图在各列保存后按条带写出；WebP/JPEG 编码器需要整张图，仍在内存中拼接
+        canvas = None
+        if combined and combined_format != 'png':
+            canvas = Image.new('RGB', (total_width, max_height), (255, 255, 255))
         
-        for i, col in enumerate(columns):
-            x_position = i * (width + gap)
-            combined.paste(col, (x_position, 0))
+        saves = []
+        column_readers = []
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                # 分割图片
+                for i, (start_y, end_y) in enumerate(ranges):
+                    # 同时等待编码的列不超过线程数，内存中最多保留这么多列
+                    if i >= threads:
+                        saves[i - threads][0].result()
+                    
+                    # 裁剪图片
+                    with profiling.stage('crop'):
+                        if reader is not None:
+                            column = reader.read(start_y, end_y)
+                        else:
+                            column = img.crop((0, start_y, width, end_y))
+                    
+                    # 保存单独的列
+                    output_path = output_dir / f"{input_filename}_列{i+1}{OUTPUT_FORMATS[column_format][0]}"
+                    saves.append((pool.submit(save_image, column, output_path, column_format, effort, dpi),
+                                  f"已保存: {output_path}"))
+                    
+                    if canvas is not None:
+                        with profiling.stage('combine'):
+                            canvas.paste(column, (i * (width + column_gap), 0))
+                    del column
+                
+                if combined:
+                    combined_path = output_dir / f"{input_filename}_合并_{num_columns}列{OUTPUT_FORMATS[combined_format][0]}"
+                    if canvas is not None:
+                        future = pool.submit(save_image, canvas, combined_path, combined_format, effort, dpi)
+                        del canvas
+                    else:
+                        if reader is not None and reader.streaming:
+                            # 流式解码只能顺序读取，每列用一个读取器各自从该列起点顺序读
+                            column_readers = [StripReader(input_path) for _ in ranges]
+                            read_rows = lambda i, start_y, end_y: column_readers[i].read(start_y, end_y)
+                        elif reader is not None:
+                            read_rows = lambda i, start_y, end_y: reader.read(start_y, end_y)
+                        else:
+                            read_rows = lambda i, start_y, end_y: img.crop((0, start_y, width, end_y))
+                        future = pool.submit(write_combined, combined_path, read_rows, ranges, width,
+                                             column_gap, dpi, effort)
+                    saves.append((future, f"已保存合并版本: {combined_path}"))
+                
+                # 按顺序等待并报告，编码出错时在这里抛出
+                for future, message in saves:
+                    future.result()
+                    print(message)
+        finally:
+            for column_reader in column_readers:
+                column_reader.close()
+            if reader is not None:
+                reader.close()
         
-        combined_path = output_dir / f"{input_filename}_合并_{num_columns}列.png"
-        combined.save(combined_path, dpi=(dpi, dpi))
-        print(f"已保存合并版本: {combined_path}")
-        
-        print(f"\n✅ 处理完成！共生成 {num_columns + 1} 个文件")
+        print(f"\n✅ 处理完成！共生成 {len(saves)} 个文件")
         print(f"输出目录: {output_dir.absolute()}")
         
         return True
@@ -94,9 +265,14 @@ def split_image_to_columns(input_path, output_dir=None, num_columns=2, overlap=0
         return False
 
 
-def process_directory(input_dir, output_dir=None, num_columns=2, overlap=0, dpi=300, column_gap=20):
+def process_directory(input_dir, output_dir=None, num_columns=2, overlap=0, dpi=300, column_gap=20,
+                      jobs=None, streaming=False, output_format='png', effort='default', threads=None,
+                      combined=True):
     """
     批量处理目录中的所有图片
+    
+    jobs: 并行进程数，默认 CPU 核数，1 表示顺序处理
+    threads: 每个进程内的编码线程数，默认按 CPU 核数平均分给各进程
     """
     input_path = Path(input_dir)
     image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
@@ -112,14 +288,25 @@ def process_directory(input_dir, output_dir=None, num_columns=2, overlap=0, dpi=
     print(f"找到 {len(image_files)} 个图片文件")
     print("=" * 50)
     
-    success_count = 0
-    for img_file in image_files:
-        print(f"\n处理: {img_file.name}")
-        if split_image_to_columns(str(img_file), output_dir, num_columns, overlap, dpi, column_gap):
-            success_count += 1
-        print("=" * 50)
+    # 多个进程同时处理时，每个进程的编码线程数相应减少，避免线程数远超 CPU 核数
+    if threads is None:
+        processes = max(1, min(jobs or default_jobs(), len(image_files)))
+        threads = max(1, default_jobs() // processes)
+    
+    tasks = [((str(img_file), output_dir, num_columns, overlap, dpi, column_gap, streaming,
+               output_format, effort, threads, combined), {})
+             for img_file in image_files]
+    results = run_tasks(
+        split_image_to_columns,
+        tasks,
+        jobs,
+        before_each=lambda i: print(f"\n处理: {image_files[i].name}"),
+        after_each=lambda i, ok: print("=" * 50)
+    )
+    success_count = sum(1 for ok in results if ok)
     
     print(f"\n✅ 批量处理完成！成功处理 {success_count}/{len(image_files)} 个文件")
+    print_summary([f.name for f in image_files], results)
 
 
 def main():
@@ -142,6 +329,13 @@ def main():
   
   # 指定输出目录和DPI
   python split_long_image.py screenshot.png -o ./output -d 150
+  
+  # 批量处理，使用4个进程并行
+  python split_long_image.py ./screenshots/ -j 4
+  
+  # 输出无损 WebP（比 PNG 小约 40%），或最快的 PNG 压缩
+  python split_long_image.py screenshot.png -c 3 --format webp
+  python split_long_image.py screenshot.png -c 3 --effort fast
         """
     )
     
@@ -156,8 +350,22 @@ def main():
                         help='输出图片DPI，用于打印（默认: 300）')
     parser.add_argument('--column-gap', type=int, default=20,
                         help='合并图片时列之间的间隔像素（默认: 20）')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='批量处理时的并行进程数（默认: CPU 核数）')
+    parser.add_argument('--stream', action='store_true',
+                        help='按条带流式解码（PNG/BMP/TGA/PPM），不一次性解码整张图')
+    parser.add_argument('--format', choices=list(OUTPUT_FORMATS), default='png', dest='output_format',
+                        help='输出格式：png、webp（无损）、jpeg（高质量有损）（默认: png）')
+    parser.add_argument('--effort', choices=EFFORTS, default='default',
+                        help='压缩力度：fast 速度优先，small 体积优先（默认: default）')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='每张图同时编码的线程数（默认: 列数+1，不超过 CPU 核数）')
+    parser.add_argument('--no-combined', action='store_false', dest='combined',
+                        help='不生成各列并排的合并图')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    profiling.start(args, 'split_long_image')
     
     # 检查输入是文件还是目录
     input_path = Path(args.input)
@@ -174,7 +382,12 @@ def main():
             args.columns, 
             args.overlap,
             args.dpi,
-            args.column_gap
+            args.column_gap,
+            streaming=args.stream,
+            output_format=args.output_format,
+            effort=args.effort,
+            threads=args.threads,
+            combined=args.combined
         )
     elif input_path.is_dir():
         # 批量处理目录
@@ -184,7 +397,13 @@ def main():
             args.columns,
             args.overlap,
             args.dpi,
-            args.column_gap
+            args.column_gap,
+            args.jobs,
+            args.stream,
+            args.output_format,
+            args.effort,
+            args.threads,
+            args.combined
         )
     else:
         print(f"❌ 错误: 无效的输入路径: {args.input}")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按水平条带顺序解码超长图片
+只在内存中保留当前列段所需的行，峰值内存与图片总高度无关
+"""
+
+import struct
+import zlib
+from io import BytesIO
+from PIL import Image
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# 8 位深度 PNG 的颜色类型 -> (每像素字节数, PIL 模式)
+PNG_COLOR_TYPES = {
+    0: (1, 'L'),
+    2: (3, 'RGB'),
+    3: (1, 'P'),
+    4: (2, 'LA'),
+    6: (4, 'RGBA'),
+}
+
+# 使用通用加载流程、可以按行偏移读取的未压缩格式
+RAW_FORMATS = {'BMP', 'DIB', 'TGA', 'PPM'}
+
+# 原始数据（raw）格式每像素的位数，用于 stride 为 0 时计算行字节数
+RAW_BITS = {
+    '1': 1, 'L': 8, 'P': 8, 'LA': 16,
+    'RGB': 24, 'BGR': 24, 'RGBA': 32, 'BGRA': 32, 'RGBX': 32, 'BGRX': 32,
+    'BGR;15': 16, 'BGR;16': 16, 'CMYK': 32,
+}
+
+
+def _png_chunk(chunk_type, data):
+    """生成一个 PNG 数据块（含长度和 CRC）"""
+    return (struct.pack('>I', len(data)) + chunk_type + data +
+            struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def _read_png_header(path):
+    """
+    读取 PNG 头部信息，不可流式解码时返回 None
+    
+    返回：(宽, 高, 颜色类型, 每像素字节数, 调色板等需要保留的数据块, 第一个 IDAT 的偏移)
+    """
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        extra_chunks = []
+        header = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                return None
+            length, chunk_type = struct.unpack('>I4s', head)
+            if chunk_type == b'IDAT':
+                if header is None:
+                    return None
+                width, height, color_type, bpp = header
+                return width, height, color_type, bpp, extra_chunks, f.tell() - 8
+            data = f.read(length)
+            f.seek(4, 1)  # CRC
+            if chunk_type == b'IHDR':
+                width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+                # 只支持 8 位、非隔行扫描（解码后的像素与原始行数据一一对应）
+                if depth != 8 or interlace != 0 or color_type not in PNG_COLOR_TYPES:
+                    return None
+                header = (width, height, color_type, PNG_COLOR_TYPES[color_type][0])
+            elif chunk_type in (b'PLTE', b'tRNS'):
+                extra_chunks.append(_png_chunk(chunk_type, data))
+
+
+def _iter_png_strips(path, strip_height):
+    """
+    逐条带解码 PNG
+    
+    zlib 解压后的每行数据仍带有 PNG 行过滤器，过滤器可能引用上一行。
+    因此每个条带会把上一条带最后一行（已还原的像素，使用无过滤）放在最前面，
+    再接上本条带的原始过滤数据，封装成一个小 PNG 交给 Pillow 解码，最后去掉第一行。
+    小 PNG 的 IDAT 用 zlib 0 级（只存储不压缩），封装的开销只有一次内存复制。
+    """
+    width, height, color_type, bpp, extra_chunks, idat_offset = _read_png_header(path)
+    row_bytes = width * bpp + 1  # 每行前有 1 字节过滤类型
+    
+    decompressor = zlib.decompressobj()
+    pending = bytearray()
+    previous_row = None
+    y = 0
+    
+    def make_strip(rows_data, rows):
+        data = rows_data
+        total_rows = rows
+        if previous_row is not None:
+            data = b'\x00' + previous_row + rows_data
+            total_rows += 1
+        ihdr = struct.pack('>IIBBBBB', width, total_rows, 8, color_type, 0, 0, 0)
+        png = (PNG_SIGNATURE + _png_chunk(b'IHDR', ihdr) + b''.join(extra_chunks) +
+               _png_chunk(b'IDAT', zlib.compress(data, 0)) + _png_chunk(b'IEND', b''))
+        strip = Image.open(BytesIO(png))
+        strip.load()
+        if previous_row is not None:
+            strip = strip.crop((0, 1, width, total_rows))
+        return strip
+    
+    with open(path, 'rb') as f:
+        f.seek(idat_offset)
+        while y < height:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', head)
+            if chunk_type == b'IEND':
+                break
+            data = f.read(length)
+            f.seek(4, 1)  # CRC
+            if chunk_type != b'IDAT':
+                continue
+            pending += decompressor.decompress(data)
+            
+            # 凑够一个条带就解码输出
+            while y < height and len(pending) >= min(strip_height, height - y) * row_bytes:
+                rows = min(strip_height, height - y)
+                strip = make_strip(bytes(pending[:rows * row_bytes]), rows)
+                del pending[:rows * row_bytes]
+                previous_row = strip.crop((0, rows - 1, width, rows)).tobytes()
+                yield y, strip
+                y += rows
+    
+    if y < height:
+        raise ValueError(f"PNG 数据不完整：只解码到第 {y} 行（共 {height} 行）")
+
+
+def _raw_tile_layout(img):
+    """
+    检查图片是否由未压缩的整行数据组成（BMP、TGA、PPM 等）
+    
+    返回：[(起始行, 结束行, 偏移, 原始模式, 行字节数, 方向), ...]，不支持时返回 None
+    """
+    if img.format not in RAW_FORMATS:
+        return None
+    width, height = img.size
+    layout = []
+    for decoder, extents, offset, args in img.tile:
+        if decoder != 'raw':
+            return None
+        x0, y0, x1, y1 = extents
+        if x0 != 0 or x1 != width:
+            return None
+        if isinstance(args, str):
+            args = (args, 0, 1)
+        rawmode, stride, orientation = (tuple(args) + (0, 1))[:3]
+        if not stride:
+            if rawmode not in RAW_BITS:
+                return None
+            stride = (width * RAW_BITS[rawmode] + 7) // 8
+        layout.append((y0, y1, offset, rawmode, stride, orientation))
+    # 自下而上存储的格式（BMP、TGA）只支持单个数据块
+    if any(entry[5] < 0 for entry in layout) and len(layout) > 1:
+        return None
+    return layout if layout else None
+
+
+def _iter_raw_strips(path, layout, strip_height):
+    """通过调整数据块偏移，让 Pillow 每次只读取一个条带的行"""
+    with Image.open(path) as probe:
+        width, height = probe.size
+    
+    for y0 in range(0, height, strip_height):
+        y1 = min(y0 + strip_height, height)
+        tiles = []
+        for tile_y0, tile_y1, offset, rawmode, stride, orientation in layout:
+            r0, r1 = max(y0, tile_y0), min(y1, tile_y1)
+            if r0 >= r1:
+                continue
+            if orientation < 0:
+                # 自下而上：第 y 行位于 offset + (高度 - 1 - y) * stride
+                row_offset = offset + (tile_y1 - r1) * stride
+            else:
+                row_offset = offset + (r0 - tile_y0) * stride
+            tiles.append(('raw', (0, r0 - y0, width, r1 - y0), row_offset,
+                          (rawmode, stride, orientation)))
+        
+        strip = Image.open(path)
+        strip._size = (width, y1 - y0)
+        strip.tile = tiles
+        strip.load()
+        yield y0, strip
+
+
+def supports_streaming(path):
+    """判断图片能否按条带流式解码"""
+    try:
+        if _read_png_header(path) is not None:
+            return True
+        with Image.open(path) as img:
+            return _raw_tile_layout(img) is not None
+    except Exception:
+        return False
+
+
+class StripReader:
+    """
+    按顺序读取长图的行区间
+    
+    read(start_y, end_y) 的 start_y 必须单调不减（允许与上一次有重叠）。
+    PNG（8 位、非隔行）和未压缩格式按条带流式解码，其他格式退回整图解码。
+    """
+    
+    def __init__(self, path, strip_height=256):
+        self.path = path
+        self.strip_height = strip_height
+        self._strips = []  # [(起始行, 条带图片), ...]
+        self._full_image = None
+        
+        with Image.open(path) as probe:
+            self.size = probe.size
+            self.mode = probe.mode
+            self.format = probe.format
+            layout = _raw_tile_layout(probe)
+        
+        if _read_png_header(path) is not None:
+            self._source = _iter_png_strips(path, strip_height)
+            self.streaming = True
+        elif layout is not None:
+            self._source = _iter_raw_strips(path, layout, strip_height)
+            self.streaming = True
+        else:
+            self._full_image = Image.open(path)
+            self._full_image.load()
+            self._source = None
+            self.streaming = False
+    
+    @property
+    def full_image(self):
+        """不能流式解码时已整图解码的图片，流式解码时为 None"""
+        return self._full_image
+    
+    @property
+    def width(self):
+        return self.size[0]
+    
+    @property
+    def height(self):
+        return self.size[1]
+    
+    def read(self, start_y, end_y):
+        """返回原图 start_y 到 end_y 行的图片"""
+        width = self.size[0]
+        if self._full_image is not None:
+            return self._full_image.crop((0, start_y, width, end_y))
+        
+        # 丢弃已经用不到的条带
+        self._strips = [(y, strip) for y, strip in self._strips if y + strip.height > start_y]
+        
+        # 解码新条带，直到覆盖 end_y
+        loaded_end = self._strips[-1][0] + self._strips[-1][1].height if self._strips else start_y
+        while loaded_end < end_y:
+            y, strip = next(self._source)
+            if y + strip.height <= start_y:
+                continue
+            self._strips.append((y, strip))
+            loaded_end = y + strip.height
+        
+        if self._strips[0][0] > start_y:
+            raise ValueError(f"StripReader 只能顺序读取：第 {start_y} 行已被释放")
+        
+        result = Image.new(self._strips[0][1].mode, (width, end_y - start_y))
+        if self._strips[0][1].mode == 'P':
+            result.putpalette(self._strips[0][1].getpalette())
+            if 'transparency' in self._strips[0][1].info:
+                result.info['transparency'] = self._strips[0][1].info['transparency']
+        for y, strip in self._strips:
+            if y >= end_y:
+                break
+            result.paste(strip, (0, y - start_y))
+        return result
+    
+    def close(self):
+        self._strips = []
+        self._full_image = None
+        self._source = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
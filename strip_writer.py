@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按水平条带顺序写出 PNG
+每写入一个条带立即滤波、压缩并写入文件，内存中只有当前条带，峰值内存与图片总高度无关
+"""
+
+import os
+import struct
+import zlib
+
+from strip_reader import PNG_SIGNATURE, _png_chunk
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# PIL 模式 -> (PNG 颜色类型, 每像素字节数)
+PNG_MODES = {
+    'L': (0, 1),
+    'RGB': (2, 3),
+    'LA': (4, 2),
+    'RGBA': (6, 4),
+}
+
+# 压缩数据攒到这么多字节再写一个 IDAT 块
+IDAT_SIZE = 64 * 1024
+
+
+def _paeth(a, b, c):
+    """PNG Paeth 预测（a 左、b 上、c 左上），参数为 int16 数组"""
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+def _filter_rows(rows, prev, bpp):
+    """
+    对一个条带的各行做自适应滤波（与 Pillow、libpng 相同的启发式：
+    每行选绝对值之和最小的滤波方式）
+    
+    参数:
+        rows: (行数, 行字节数) 的 uint8 数组
+        prev: 条带上方一行（第一个条带为全 0）
+        bpp: 每像素字节数
+    
+    返回：每行前面加上滤波类型字节后的数据
+    """
+    height, stride = rows.shape
+    cur = rows.astype(np.int16)
+    up = np.vstack([prev[None, :], rows[:-1]]).astype(np.int16)
+    left = np.zeros_like(cur)
+    left[:, bpp:] = cur[:, :-bpp]
+    up_left = np.zeros_like(cur)
+    up_left[:, bpp:] = up[:, :-bpp]
+    
+    # 顺序与 PNG 滤波类型编号一致：None、Sub、Up、Average、Paeth
+    # 逐个计算并打分，避免同时保留多份 int16/int32 的中间结果
+    candidates = np.empty((5, height, stride), dtype=np.uint8)
+    predictions = (0, left, up, (left + up) >> 1, _paeth(left, up, up_left))
+    for kind, prediction in enumerate(predictions):
+        candidates[kind] = (cur - prediction).astype(np.uint8)
+    scores = np.stack([np.abs(candidate.view(np.int8).astype(np.int16)).sum(axis=1)
+                       for candidate in candidates])
+    best = scores.argmin(axis=0)
+    
+    out = np.empty((height, stride + 1), dtype=np.uint8)
+    out[:, 0] = best
+    out[:, 1:] = candidates[best, np.arange(height)]
+    return out.tobytes()
+
+
+class PngStripWriter:
+    """
+    按顺序写入条带（宽度相同、模式相同的 PIL 图片），生成一张 PNG
+    
+    用法:
+        with PngStripWriter(path, 宽, 高) as writer:
+            writer.write(条带1)
+            writer.write(条带2)
+            ...
+    
+    有 numpy 时按行自适应滤波，压缩率与 Pillow 相当；没有时不滤波，文件会大一些。
+    先写入同目录的临时文件，全部行写完后才改名为 path；中途出错时删除临时文件，
+    不会留下看起来正常、实际不完整的 PNG。
+    """
+    
+    def __init__(self, path, width, height, mode='RGB', compress_level=6, dpi=None):
+        if mode not in PNG_MODES:
+            raise ValueError(f"不支持的模式: {mode}")
+        self.path = path
+        self.size = (width, height)
+        self.mode = mode
+        color_type, self.bpp = PNG_MODES[mode]
+        self.stride = width * self.bpp
+        self.rows_written = 0
+        self._prev = np.zeros(self.stride, dtype=np.uint8) if np is not None else None
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_size = 0
+        
+        self._tmp_path = f"{os.fspath(path)}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        self._file.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)))
+        if dpi:
+            # pHYs：每米像素数
+            ppm = int(dpi / 0.0254 + 0.5)
+            self._file.write(_png_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+    
+    def write(self, strip):
+        """写入下一个条带"""
+        if strip.width != self.size[0]:
+            raise ValueError(f"条带宽度 {strip.width} 与图片宽度 {self.size[0]} 不一致")
+        if self.rows_written + strip.height > self.size[1]:
+            raise ValueError("写入的行数超过图片高度")
+        if strip.mode != self.mode:
+            strip = strip.convert(self.mode)
+        
+        data = strip.tobytes()
+        if np is not None:
+            rows = np.frombuffer(data, dtype=np.uint8).reshape(strip.height, self.stride)
+            filtered = _filter_rows(rows, self._prev, self.bpp)
+            self._prev = rows[-1].copy()
+        else:
+            filtered = b''.join(b'\x00' + data[y * self.stride:(y + 1) * self.stride]
+                                for y in range(strip.height))
+        self.rows_written += strip.height
+        self._add(self._compressor.compress(filtered))
+    
+    def _add(self, data):
+        if not data:
+            return
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= IDAT_SIZE:
+            self._flush()
+    
+    def _flush(self):
+        if self._pending:
+            self._file.write(_png_chunk(b'IDAT', b''.join(self._pending)))
+            self._pending = []
+            self._pending_size = 0
+    
+    def close(self):
+        """写完所有行后结束文件（行数不足时删除文件并抛出 ValueError）"""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.size[1]:
+                raise ValueError(f"只写入了 {self.rows_written}/{self.size[1]} 行")
+            self._add(self._compressor.flush())
+            self._flush()
+            self._file.write(_png_chunk(b'IEND', b''))
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+    
+    def abort(self):
+        """放弃写入，删除未完成的文件"""
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
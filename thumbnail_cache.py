@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片缩略图及其磁盘缓存
+JPEG 用 draft 模式按 1/2~1/8 比例解码，PNG 只解码顶部需要的几行，
+生成的缩略图按 路径 + 修改时间 + 大小 缓存在用户缓存目录中，超过容量时删除最久未用的。
+"""
+
+import os
+import sys
+import hashlib
+import threading
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+
+
+# 缩略图最大尺寸（像素）；长截图只显示顶部一段
+THUMB_WIDTH = 180
+THUMB_HEIGHT = 320
+# 缓存目录默认容量上限
+DEFAULT_MAX_BYTES = 100 * 2**20
+
+
+def default_cache_dir():
+    """按系统习惯选择用户缓存目录"""
+    if sys.platform == 'win32':
+        base = Path(os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local')
+        return base / 'PicUtil' / 'thumbnails'
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'PicUtil' / 'thumbnails'
+    base = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    return base / 'picutil' / 'thumbnails'
+
+
+def make_thumbnail(path, width=THUMB_WIDTH, height=THUMB_HEIGHT):
+    """
+    生成缩略图，返回 PNG 数据
+    
+    图片比例比 width:height 更长时只取顶部，宽度缩放到 width
+    """
+    with Image.open(path) as img:
+        img_width, img_height = img.size
+        # 原图中需要的行数（顶部一段）
+        rows = min(img_height, max(1, round(img_width * height / width)))
+        
+        if img.format == 'JPEG':
+            # draft 选择不小于请求尺寸的最大缩小比例（最多 1/8），只解码这么多数据
+            img.draft('RGB', (width, round(img_height * width / img_width)))
+            scale = img.size[0] / img_width
+            top = img.crop((0, 0, img.size[0], max(1, round(rows * scale))))
+        elif img.format == 'PNG' and not img.info.get('interlace') and len(img.tile) == 1:
+            # 非隔行 PNG 自上而下解码，把图片高度和解码区域改成 rows 行，解码器到此为止
+            img._size = (img_width, rows)
+            codec, _, *rest = img.tile[0]
+            img.tile = [(codec, (0, 0, img_width, rows), *rest)]
+            img.load()
+            top = img
+        else:
+            top = img.crop((0, 0, img_width, rows))
+        
+        if top.mode not in ('RGB', 'RGBA', 'L'):
+            top = top.convert('RGBA' if 'transparency' in top.info or 'A' in top.mode else 'RGB')
+        top.thumbnail((width, height), Image.BILINEAR)
+        
+        buffer = BytesIO()
+        top.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+
+class ThumbnailCache:
+    """
+    缩略图磁盘缓存
+    
+    以原图的绝对路径、修改时间和大小为键，原图改动后自动失效。
+    读取时刷新缓存文件的修改时间，超过容量时按修改时间删除最久未用的缓存。
+    可以在多个线程中同时使用。
+    """
+    
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes
+        self._total = None  # 缓存目录总大小，首次写入时统计
+        self._lock = threading.Lock()
+    
+    def _key_path(self, path):
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return self.dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.png"
+    
+    def get(self, path):
+        """返回缓存的缩略图 PNG 数据，没有时返回 None"""
+        try:
+            cache_file = self._key_path(path)
+            data = cache_file.read_bytes()
+            os.utime(cache_file)
+            return data
+        except OSError:
+            return None
+    
+    def put(self, path, data):
+        """写入缓存，超过容量时清理"""
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            cache_file = self._key_path(path)
+            tmp = cache_file.with_name(f"{cache_file.stem}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(cache_file)
+        except OSError:
+            return
+        
+        with self._lock:
+            if self._total is None:
+                self._total = sum(entry.stat().st_size for entry in os.scandir(self.dir) if entry.is_file())
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+    
+    def load(self, path):
+        """返回缩略图 PNG 数据：有缓存时直接读取，否则生成并写入缓存"""
+        data = self.get(path)
+        if data is None:
+            data = make_thumbnail(path)
+            self.put(path, data)
+        return data
+    
+    def _evict(self):
+        """按最近使用时间删除缓存，直到总大小降到容量的 80% 以下（调用时需持有锁）"""
+        entries = []
+        with os.scandir(self.dir) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                except OSError:
+                    pass
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total = total